@@ -2,7 +2,11 @@ import streamlit as st
 from streamlit_agraph import agraph, Node, Edge, Config
 from pydantic import BaseModel
 from enum import Enum
-from typing import Optional, List
+from typing import Optional, List, Dict, Set, Tuple
+from collections import defaultdict
+import copy
+from label_index import LabelIndex
+from tree_layout import TreeLayout
 import logging
 import datetime
 
@@ -35,16 +39,30 @@ class DecisionEdge(BaseModel):
     target_id: str
     condition: Optional[str]
 
+class DecisionTreeUpdate(BaseModel):
+    """Model representing the nodes and edges to add to the decision tree for one conversation."""
+    nodes: List[DecisionNode]
+    edges: List[DecisionEdge]
+
 class DecisionTree:
     """
     A class to represent and manage a decision tree structure.
 
+    Nodes are indexed by id and edges by (source, target, condition), so duplicates are rejected in O(1),
+    and adjacency lists answer parent, child and frontier queries without scanning the lists.
+    Labels are kept in a LabelIndex, so near-duplicates of new nodes are found without the LLM.
+    Rendering is incremental: each label is wrapped once, only nodes and edges added since the last
+    display are prepared, and the graph is redrawn in place in one Streamlit placeholder.
+    Node positions come from a TreeLayout computed in Python, which also collapses explored subtrees.
+
     Attributes:
-        nodes (List[Node]): List of nodes in the tree.
-        edges (List[Edge]): List of edges connecting the nodes.
+        nodes (List[Node]): List of nodes in the tree, in insertion order.
+        edges (List[Edge]): List of edges connecting the nodes, in insertion order.
         nodes_kwargs (dict): Additional keyword arguments for node styling.
         edges_kwargs (dict): Additional keyword arguments for edge styling.
         config (Config): Configuration for the agraph visualization.
+        label_index (LabelIndex): Similarity index over the node labels.
+        layout (TreeLayout): Positions of the nodes and the collapsed subtrees.
     """
 
     def __init__(self):
@@ -54,6 +72,21 @@ class DecisionTree:
         """
         self.nodes: List[Node] = []
         self.edges: List[Edge] = []
+        self._nodes_by_id: Dict[str, Node] = {}
+        self._node_types: Dict[str, str] = {}
+        self._edge_keys: Set[Tuple[str, str, Optional[str]]] = set()
+        self._edge_ends: List[Tuple[str, str]] = []  # (source, target) of every edge, in the order of self.edges
+        self._children: Dict[str, List[str]] = defaultdict(list)
+        self._parents: Dict[str, List[str]] = defaultdict(list)
+        self._conditions: Dict[str, List[Optional[str]]] = defaultdict(list)
+        self._frontier: Dict[str, None] = {}  # Insertion-ordered set of decision nodes with unexplored branches
+        self.label_index = LabelIndex()
+        self._wrapped_labels: Dict[str, str] = {}  # Render cache, raw label -> wrapped label
+        self.layout = TreeLayout()
+        self._render_nodes: Dict[str, Node] = {}
+        self._render_edges: List[Tuple[str, str, Edge]] = []
+        self._drawn_state: Optional[Tuple[int, int, int]] = None
+        self._placeholder = None
         self.nodes_kwargs = {
             "font": {"color": 'white'}
         }
@@ -63,59 +96,89 @@ class DecisionTree:
             height=750,
             directed=True, 
             physics=False, 
-            hierarchical={"enabled": True, "direction": "UD"},
-            improvedLayout=True,
-            nodeSpacing=5000,
-            levelSeparation=500
+            # Positions are precomputed by self.layout, the browser does not lay the graph out
+            hierarchical=False,
+            improvedLayout=False
         )
         logger.info("Initialized DecisionTree.")
 
-    def add_node(self, id: str, label: str):
+    FRONTIER_MIN_BRANCHES = 2  # Decision nodes with fewer outgoing edges are on the frontier
+
+    def _add_node(self, id: str, label: str, node_type: str, shape: str, color: str) -> bool:
+        if id in self._nodes_by_id:
+            logger.debug(f"Duplicate node id {id} rejected")
+            return False
+        node = Node(id=id, label=label, size=25, shape=shape, color=color, **self.nodes_kwargs)
+        self.nodes.append(node)
+        self._nodes_by_id[id] = node
+        self._node_types[id] = node_type
+        self.label_index.add(id, label, node_type)
+        if node_type == "question" and len(self._children[id]) < self.FRONTIER_MIN_BRANCHES:
+            self._frontier[id] = None
+        self.layout.add_node(id, frontier=id in self._frontier)
+        return True
+
+    def add_node(self, id: str, label: str) -> bool:
         """
         Adds a standard node to the decision tree.
 
         Args:
             id (str): Unique identifier for the node.
             label (str): Display label for the node.
+
+        Returns:
+            bool: True if the node was added, False if its id is already in the tree.
         """
         try:
-            node = Node(id=id, label=label, size=25, shape="dot", color="red", **self.nodes_kwargs)
-            self.nodes.append(node)
-            logger.info(f"Added node: {id} with label: {label}")
+            added = self._add_node(id, label, "action", "dot", "red")
+            if added:
+                logger.info(f"Added node: {id} with label: {label}")
+            return added
         except Exception as e:
             logger.error(f"Error adding node {id}: {e}")
+            return False
 
-    def add_inquiry_node(self, id: str, label: str):
+    def add_inquiry_node(self, id: str, label: str) -> bool:
         """
         Adds an inquiry node to the decision tree.
 
         Args:
             id (str): Unique identifier for the inquiry node.
             label (str): Display label for the inquiry node.
+
+        Returns:
+            bool: True if the node was added, False if its id is already in the tree.
         """
         try:
-            node = Node(id=id, label=label, size=25, shape="dot", color="green", **self.nodes_kwargs)
-            self.nodes.append(node)
-            logger.info(f"Added inquiry node: {id} with label: {label}")
+            added = self._add_node(id, label, "inquiry", "dot", "green")
+            if added:
+                logger.info(f"Added inquiry node: {id} with label: {label}")
+            return added
         except Exception as e:
             logger.error(f"Error adding inquiry node {id}: {e}")
+            return False
 
-    def add_decision_node(self, id: str, label: str):
+    def add_decision_node(self, id: str, label: str) -> bool:
         """
         Adds a decision node to the decision tree.
 
         Args:
             id (str): Unique identifier for the decision node.
             label (str): Display label for the decision node.
+
+        Returns:
+            bool: True if the node was added, False if its id is already in the tree.
         """
         try:
-            node = Node(id=id, label=label, size=25, shape="diamond", color="blue", **self.nodes_kwargs)
-            self.nodes.append(node)
-            logger.info(f"Added decision node: {id} with label: {label}")
+            added = self._add_node(id, label, "question", "diamond", "blue")
+            if added:
+                logger.info(f"Added decision node: {id} with label: {label}")
+            return added
         except Exception as e:
             logger.error(f"Error adding decision node {id}: {e}")
+            return False
 
-    def add_edge(self, source: str, target: str, label: str):
+    def add_edge(self, source: str, target: str, label: str) -> bool:
         """
         Adds an edge between two nodes in the decision tree.
 
@@ -123,13 +186,64 @@ class DecisionTree:
             source (str): ID of the source node.
             target (str): ID of the target node.
             label (str): Label for the edge condition.
+
+        Returns:
+            bool: True if the edge was added, False if the same edge is already in the tree.
         """
         try:
+            key = (source, target, label)
+            if key in self._edge_keys:
+                logger.debug(f"Duplicate edge from {source} to {target} rejected")
+                return False
             edge = Edge(source=source, target=target, label=label, type="CURVE_SMOOTH", **self.edges_kwargs)
             self.edges.append(edge)
+            self._edge_keys.add(key)
+            self._edge_ends.append((source, target))
+            self._conditions[source].append(label)
+            if target not in self._children[source]:
+                self._children[source].append(target)
+                self._parents[target].append(source)
+                if len(self._children[source]) >= self.FRONTIER_MIN_BRANCHES and source in self._frontier:
+                    del self._frontier[source]
+                    self.layout.set_frontier(source, False)
+                self.layout.add_edge(source, target)
             logger.info(f"Added edge from {source} to {target} with label: {label}")
+            return True
         except Exception as e:
             logger.error(f"Error adding edge from {source} to {target}: {e}")
+            return False
+
+    def has_node(self, id: str) -> bool:
+        """Returns whether a node with this id is in the tree."""
+        return id in self._nodes_by_id
+
+    def get_node(self, id: str) -> Optional[Node]:
+        """Returns the node with this id, or None."""
+        return self._nodes_by_id.get(id)
+
+    def get_node_type(self, id: str) -> Optional[str]:
+        """Returns the type of the node with this id ("question", "action" or "inquiry"), or None."""
+        return self._node_types.get(id)
+
+    def has_edge(self, source: str, target: str, label: Optional[str]) -> bool:
+        """Returns whether this exact edge is in the tree."""
+        return (source, target, label) in self._edge_keys
+
+    def get_children(self, id: str) -> List[str]:
+        """Returns the ids of the nodes this node has edges to, in insertion order."""
+        return list(self._children.get(id, ()))
+
+    def get_parents(self, id: str) -> List[str]:
+        """Returns the ids of the nodes with edges to this node, in insertion order."""
+        return list(self._parents.get(id, ()))
+
+    def get_edge_conditions(self, id: str) -> List[Optional[str]]:
+        """Returns the conditions of the edges leaving this node, in insertion order."""
+        return list(self._conditions.get(id, ()))
+
+    def get_frontier(self) -> List[str]:
+        """Returns the ids of the decision nodes with fewer than FRONTIER_MIN_BRANCHES outgoing edges."""
+        return list(self._frontier)
 
     def get_nodes_as_dict(self) -> List[dict]:
         """
@@ -154,7 +268,11 @@ class DecisionTree:
             List[dict]: List containing edge information.
         """
         try:
-            edges_dict = [{"source": edge.source, "target": edge.target, "label": edge.label} for edge in self.edges]
+            # agraph's Edge keeps the target as "to", the indexed ends are read instead
+            edges_dict = [
+                {"source": source, "target": target, "label": edge.label}
+                for (source, target), edge in zip(self._edge_ends, self.edges)
+            ]
             logger.debug(f"Edges as dict: {edges_dict}")
             return edges_dict
         except Exception as e:
@@ -193,22 +311,96 @@ class DecisionTree:
             logger.error(f"Error wrapping label '{label}': {e}")
             return label
 
-    def display(self):
+    def _wrapped_label(self, label: Optional[str]) -> Optional[str]:
+        if not label:
+            return label
+        wrapped = self._wrapped_labels.get(label)
+        if wrapped is None:
+            wrapped = self._wrapped_labels[label] = self.wrap_label(label)
+        return wrapped
+
+    def _render_copy(self, item):
+        rendered = copy.copy(item)
+        rendered.label = self._wrapped_label(item.label)
+        return rendered
+
+    def _aggregate_copy(self, node: Node, hidden: int) -> Node:
+        aggregate = copy.copy(node)
+        aggregate.label = f"{node.label}\n[+{hidden} explored]"
+        return aggregate
+
+    def _visible_graph(self) -> tuple[list[Node], list[Edge], dict[str, int]]:
+        # The render copies of the visible nodes at their layout positions, the edges between them with edges
+        # to hidden nodes redirected to their collapsed node, and the visible collapsed nodes
+        positions = self.layout.positions()
+        aggregates = self.layout.aggregates()
+        render_nodes = []
+        for node_id, (x, y) in positions.items():
+            node = self._render_nodes[node_id]
+            node.x, node.y = x, y
+            render_nodes.append(self._aggregate_copy(node, aggregates[node_id]) if node_id in aggregates else node)
+        render_edges = []
+        redirected = set()
+        for source, target, edge in self._render_edges:
+            visible_source, visible_target = self.layout.visible_id(source), self.layout.visible_id(target)
+            if visible_source == source and visible_target == target:
+                render_edges.append(edge)
+            elif visible_source != visible_target and (visible_source, visible_target, edge.label) not in redirected:
+                redirected.add((visible_source, visible_target, edge.label))
+                render_edges.append(Edge(
+                    source=visible_source, target=visible_target, label=edge.label, type="CURVE_SMOOTH", **self.edges_kwargs
+                ))
+        return render_nodes, render_edges, aggregates
+
+    def display(self) -> bool:
         """
         Displays the decision tree using Streamlit's agraph component.
+
+        Only the nodes and edges added since the last call are prepared for rendering, as copies with
+        wrapped labels, so the tree's own nodes and edges keep their raw labels. Nodes are drawn at the
+        positions of self.layout. A collapsed subtree is drawn as its root with the number of hidden nodes,
+        and edges to hidden nodes go to the collapsed node instead. Clicking a collapsed node expands it,
+        and the graph is drawn again with its subtree at once. The graph is drawn into the same placeholder
+        every time, and not redrawn if nothing changed.
+
+        Returns:
+            bool: True if the graph was redrawn.
         """
         try:
-            temp_nodes = self.nodes.copy()
-            for node in temp_nodes:
-                node.label = self.wrap_label(node.label)
-            temp_edges = self.edges.copy()
-            for edge in temp_edges:
-                if edge.label:
-                    edge.label = self.wrap_label(edge.label)
-            agraph(nodes=temp_nodes, edges=temp_edges, config=self.config)
-            logger.info("Displayed the decision tree.")
+            state = (len(self.nodes), len(self.edges), self.layout.version)
+            if self._placeholder is not None and state == self._drawn_state:
+                logger.debug("Decision tree unchanged, not redrawn.")
+                return False
+            new_nodes = self.nodes[len(self._render_nodes):]
+            new_edges = self.edges[len(self._render_edges):]
+            for node in new_nodes:
+                self._render_nodes[node.id] = self._render_copy(node)
+            self._render_edges.extend(
+                (source, target, self._render_copy(edge))
+                for (source, target), edge in zip(self._edge_ends[len(self._render_edges):], new_edges)
+            )
+
+            if self._placeholder is None:
+                self._placeholder = st.empty()
+            render_nodes, render_edges, aggregates = self._visible_graph()
+            with self._placeholder.container():
+                selected = agraph(nodes=render_nodes, edges=render_edges, config=self.config)
+            # A click on a collapsed node arrives with the rerun it triggers, so it is expanded and drawn
+            # again right away rather than on the next display
+            while selected in aggregates:
+                self.layout.expand(selected)
+                render_nodes, render_edges, aggregates = self._visible_graph()
+                with self._placeholder.container():
+                    selected = agraph(nodes=render_nodes, edges=render_edges, config=self.config)
+            self._drawn_state = (len(self.nodes), len(self.edges), self.layout.version)
+            logger.info(
+                f"Displayed the decision tree, {len(new_nodes)} new nodes and {len(new_edges)} new edges, "
+                f"{len(render_nodes)} nodes visible."
+            )
+            return True
         except Exception as e:
             logger.error(f"Error displaying the decision tree: {e}")
+            return False
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,357 @@
+import bisect, contextlib, datetime, logging, os, wave
+from typing import Optional
+import numpy as np
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/audio_preprocessing_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+UNKNOWN_CONTENT_TYPE = "audio/*"  # Lets DeepGram detect the format itself
+
+def detect_audio_format(head: bytes) -> tuple[str, str]:
+    """
+    Detects the container of an audio file from its first bytes.
+
+    Args:
+        head (bytes): The first bytes of the file, at least 12.
+
+    Returns:
+        tuple[str, str]: The format name, e.g. "wav", and its Content-Type, ("unknown", "audio/*") if not recognized.
+    """
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav", "audio/wav"
+    if head[:4] == b"fLaC":
+        return "flac", "audio/flac"
+    if head[:4] == b"OggS":
+        return ("opus" if b"OpusHead" in head[:64] else "ogg"), "audio/ogg"
+    if head[4:8] == b"ftyp":
+        return "mp4", "audio/mp4"
+    if head[:4] == b"\x1aE\xdf\xa3":
+        return "webm", "audio/webm"
+    if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3", "audio/mpeg"
+    return "unknown", UNKNOWN_CONTENT_TYPE
+
+def detect_file_format(path: str) -> tuple[str, str]:
+    """
+    Detects the container of an audio file.
+
+    Args:
+        path (str): The audio file.
+
+    Returns:
+        tuple[str, str]: The format name and its Content-Type.
+    """
+    with open(path, "rb") as f:
+        return detect_audio_format(f.read(64))
+
+class SegmentMap:
+    """
+    Maps times in a preprocessed recording back to the original recording.
+
+    Attributes:
+        segments (list[tuple[float, float, float]]): (processed start, original start, length) in seconds
+            of every kept stretch of audio, in order.
+    """
+
+    def __init__(self, segments: list[tuple[float, float, float]]):
+        self.segments = segments
+        self._starts = [processed_start for processed_start, _, _ in segments]
+
+    def to_original(self, seconds: float) -> float:
+        """
+        Converts a time in the preprocessed recording to the original recording.
+
+        Args:
+            seconds (float): Time in the preprocessed recording.
+
+        Returns:
+            float: The same moment in the original recording.
+        """
+        if not self.segments:
+            return seconds
+        index = max(0, bisect.bisect_right(self._starts, seconds) - 1)
+        processed_start, original_start, length = self.segments[index]
+        return original_start + min(max(0.0, seconds - processed_start), length)
+
+    def remap(self, transcription: dict) -> dict:
+        """
+        Moves the utterance and word times of a DeepGram response to the original recording, in place.
+
+        Args:
+            transcription (dict): The DeepGram response for the preprocessed recording.
+
+        Returns:
+            dict: The same response.
+        """
+        results = transcription.get("results", {})
+        timed = list(results.get("utterances", []))
+        for utterance in results.get("utterances", []):
+            timed.extend(utterance.get("words", []))
+        for channel in results.get("channels", []):
+            for alternative in channel.get("alternatives", []):
+                timed.extend(alternative.get("words", []))
+        for item in timed:
+            for key in ("start", "end"):
+                if key in item:
+                    item[key] = self.to_original(item[key])
+        return transcription
+
+class PreprocessedAudio:
+    """
+    A recording prepared for upload.
+
+    Attributes:
+        path (str): The preprocessed file.
+        content_type (str): Its Content-Type.
+        segments (SegmentMap): Maps its times back to the original recording.
+        original_seconds (float): Length of the original recording.
+        processed_seconds (float): Length of the preprocessed recording, the seconds DeepGram bills.
+    """
+
+    def __init__(self, path: str, content_type: str, segments: SegmentMap, original_seconds: float, processed_seconds: float):
+        self.path = path
+        self.content_type = content_type
+        self.segments = segments
+        self.original_seconds = original_seconds
+        self.processed_seconds = processed_seconds
+
+    def remap(self, transcription: dict) -> dict:
+        """
+        Moves a DeepGram response for this recording to the original recording's times, in place.
+        Its duration becomes the original length, the billed length is kept as processed_duration.
+
+        Args:
+            transcription (dict): The DeepGram response.
+
+        Returns:
+            dict: The same response.
+        """
+        self.segments.remap(transcription)
+        metadata = transcription.setdefault("metadata", {})
+        metadata["processed_duration"] = metadata.get("duration", self.processed_seconds)
+        metadata["duration"] = self.original_seconds
+        return transcription
+
+def _read_wav(path: str) -> tuple[np.ndarray, int, int]:
+    # Returns the samples as (length, channels) 16 or 32-bit integers, the sample rate and the sample width in bytes
+    with wave.open(path, "rb") as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif width == 3:
+        # 24-bit samples are widened to 32 bits by putting them in the upper three bytes
+        padded = np.zeros((len(raw) // 3, 4), dtype=np.uint8)
+        padded[:, 1:] = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        samples = padded.view("<i4").reshape(-1)
+    else:
+        samples = np.frombuffer(raw, dtype={2: "<i2", 4: "<i4"}[width])
+    return samples.reshape(-1, channels), rate, samples.dtype.itemsize
+
+class AudioPreprocessor:
+    """
+    Shrinks a call recording before it is uploaded to DeepGram, so fewer bytes are sent and fewer seconds billed.
+
+    PCM WAV recordings are decoded with NumPy and split into frames. A frame holds speech if the RMS energy
+    of any channel is above silence_dbfs, extended by pad_seconds on both sides. The silence before the first
+    and after the last speech is cut, and any stretch of silence longer than max_silence_seconds is shortened
+    to keep_silence_seconds. Channels stay separate, as DeepGram transcribes them one by one to tell
+    the speakers apart, unless they are identical and can be downmixed to mono. The result is written as
+    FLAC if soundfile and libsndfile are installed, else as WAV, together with the map from its times to the original ones.
+    A recording that cannot be written as FLAC is written as WAV, and one that cannot be written at all is uploaded unchanged.
+
+    Other formats are uploaded unchanged, with their detected Content-Type.
+
+    Attributes:
+        frame_seconds (float): Length of the energy frames.
+        silence_dbfs (float): Energy below which a frame is silence, in dB relative to full scale.
+        pad_seconds (float): Audio kept around speech so word edges are not cut.
+        max_silence_seconds (float): Longest silence kept as it is.
+        keep_silence_seconds (float): What longer silences are shortened to.
+        output_format (str): "flac" or "wav".
+    """
+
+    def __init__(
+        self,
+        frame_seconds: float = 0.02,
+        silence_dbfs: float = -45.0,
+        pad_seconds: float = 0.3,
+        max_silence_seconds: float = 2.0,
+        keep_silence_seconds: float = 0.5,
+        output_format: str = "flac"
+    ):
+        self.frame_seconds = frame_seconds
+        self.silence_dbfs = silence_dbfs
+        self.pad_seconds = pad_seconds
+        self.max_silence_seconds = max_silence_seconds
+        self.keep_silence_seconds = keep_silence_seconds
+        self.output_format = output_format
+
+    def speech_frames(self, samples: np.ndarray, rate: int, full_scale: float) -> np.ndarray:
+        """
+        Finds the frames holding speech.
+
+        Args:
+            samples (np.ndarray): Samples of shape (length, channels).
+            rate (int): Sample rate.
+            full_scale (float): Largest sample magnitude.
+
+        Returns:
+            np.ndarray: One bool per frame, True for speech, padded by pad_seconds.
+        """
+        frame_length = max(1, int(rate * self.frame_seconds))
+        frames = len(samples) // frame_length
+        if frames == 0:
+            return np.zeros(0, dtype=bool)
+        framed = samples[:frames * frame_length].astype(np.float32).reshape(frames, frame_length, -1) / full_scale
+        rms = np.sqrt(np.mean(framed * framed, axis=1))
+        speech = (20 * np.log10(rms + 1e-10) > self.silence_dbfs).any(axis=1)
+        pad = int(self.pad_seconds / self.frame_seconds)
+        if pad and speech.any():
+            speech = np.convolve(speech, np.ones(2 * pad + 1), mode="same") > 0
+        return speech
+
+    def kept_frames(self, speech: np.ndarray) -> list[tuple[int, int]]:
+        """
+        Decides which frames to keep.
+
+        Args:
+            speech (np.ndarray): One bool per frame, True for speech.
+
+        Returns:
+            list[tuple[int, int]]: The [start, end) frame ranges to keep, in order.
+        """
+        if not speech.any():
+            return []
+        max_silence = int(self.max_silence_seconds / self.frame_seconds)
+        keep_half = int(self.keep_silence_seconds / self.frame_seconds) // 2
+        # Boundaries of the runs of equal frames
+        changes = np.flatnonzero(np.diff(speech.astype(np.int8))) + 1
+        starts = np.concatenate(([0], changes))
+        ends = np.concatenate((changes, [len(speech)]))
+        ranges: list[tuple[int, int]] = []
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            if speech[start]:
+                pieces = [(start, end)]
+            elif start == 0 or end == len(speech):
+                continue
+            elif end - start > max_silence:
+                pieces = [(start, start + keep_half), (end - keep_half, end)]
+            else:
+                pieces = [(start, end)]
+            for piece_start, piece_end in pieces:
+                if piece_end <= piece_start:
+                    continue
+                if ranges and ranges[-1][1] == piece_start:
+                    ranges[-1] = (ranges[-1][0], piece_end)
+                else:
+                    ranges.append((piece_start, piece_end))
+        return ranges
+
+    def _write(self, samples: np.ndarray, rate: int, width: int, output_dir: str) -> tuple[str, str]:
+        if self.output_format == "flac":
+            try:
+                import soundfile
+            except (ImportError, OSError) as e:
+                # soundfile raises OSError when libsndfile is missing. Warned once, every later recording
+                # is written as WAV without asking again
+                logger.warning(f"soundfile is not usable (see requirements.txt), writing preprocessed recordings as WAV: {e}")
+                self.output_format = "wav"
+            else:
+                path = os.path.join(output_dir, "call_recording_preprocessed.flac")
+                try:
+                    # FLAC holds at most 24 bits, 32-bit samples are scaled down by soundfile
+                    soundfile.write(path, samples, rate, format="FLAC", subtype="PCM_16" if width == 2 else "PCM_24")
+                    return path, "audio/flac"
+                except Exception as e:
+                    logger.warning(f"Writing {path} failed, writing the recording as WAV: {e}")
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
+        path = os.path.join(output_dir, "call_recording_preprocessed.wav")
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(samples.shape[1])
+            wav.setsampwidth(width)
+            wav.setframerate(rate)
+            wav.writeframes(np.ascontiguousarray(samples).astype(f"<i{width}").tobytes())
+        return path, "audio/wav"
+
+    def process(self, path: str, output_dir: Optional[str] = None) -> Optional[PreprocessedAudio]:
+        """
+        Trims a recording and writes it next to the original.
+
+        Args:
+            path (str): The recording.
+            output_dir (Optional[str]): Where to write the preprocessed file, the recording's directory by default.
+
+        Returns:
+            Optional[PreprocessedAudio]: The preprocessed recording, or None if it should be uploaded unchanged:
+            it is not PCM WAV, it holds no speech, nothing could be cut, or the result could not be written.
+        """
+        audio_format, _ = detect_file_format(path)
+        if audio_format != "wav":
+            logger.info(f"{path} is {audio_format}, uploading it unchanged")
+            return None
+        try:
+            samples, rate, width = _read_wav(path)
+        except (wave.Error, KeyError, ValueError) as e:
+            logger.info(f"{path} is not a PCM WAV file ({e}), uploading it unchanged")
+            return None
+        channels = samples.shape[1]
+        if channels > 1 and all(np.array_equal(samples[:, 0], samples[:, channel]) for channel in range(1, samples.shape[1])):
+            samples = samples[:, :1]
+
+        full_scale = float(2 ** (8 * width - 1))
+        speech = self.speech_frames(samples, rate, full_scale)
+        ranges = self.kept_frames(speech)
+        if not ranges:
+            logger.info(f"No speech found in {path}, uploading it unchanged")
+            return None
+        if ranges == [(0, len(speech))] and samples.shape[1] == channels and self.output_format == "wav":
+            logger.info(f"Nothing to cut from {path}, uploading it unchanged")
+            return None
+        frame_length = max(1, int(rate * self.frame_seconds))
+        original_seconds = len(samples) / rate
+
+        segments, pieces, processed = [], [], 0
+        for start, end in ranges:
+            # The last range runs to the end of the recording if it ends at the last frame
+            sample_end = len(samples) if end == len(speech) else end * frame_length
+            pieces.append(samples[start * frame_length:sample_end])
+            segments.append((processed / rate, start * frame_length / rate, (sample_end - start * frame_length) / rate))
+            processed += sample_end - start * frame_length
+        trimmed = np.concatenate(pieces)
+        try:
+            output_path, content_type = self._write(trimmed, rate, width, output_dir or os.path.dirname(path))
+        except (OSError, wave.Error) as e:
+            logger.error(f"Writing the preprocessed recording of {path} failed ({e}), uploading it unchanged")
+            return None
+        logger.info(
+            f"Preprocessed {path}: {original_seconds:.1f} s to {processed / rate:.1f} s, {trimmed.shape[1]} channels, "
+            f"{os.path.getsize(path)} to {os.path.getsize(output_path)} bytes"
+        )
+        return PreprocessedAudio(output_path, content_type, SegmentMap(segments), original_seconds, processed / rate)
+
+def audio_preprocessor_from_env() -> Optional[AudioPreprocessor]:
+    """
+    Builds the preprocessor used by main.py. AUDIO_PREPROCESSING (default false) turns it on,
+    AUDIO_SILENCE_DBFS sets the silence level, AUDIO_MAX_SILENCE_SECONDS the longest silence kept
+    and AUDIO_FORMAT the upload format, "flac" (needs soundfile) or "wav".
+
+    Returns:
+        Optional[AudioPreprocessor]: The preprocessor, or None if disabled.
+    """
+    if os.environ.get("AUDIO_PREPROCESSING", "false").lower() != "true":
+        return None
+    return AudioPreprocessor(
+        silence_dbfs=float(os.environ.get("AUDIO_SILENCE_DBFS", "-45")),
+        max_silence_seconds=float(os.environ.get("AUDIO_MAX_SILENCE_SECONDS", "2")),
+        output_format=os.environ.get("AUDIO_FORMAT", "flac")
+    )
@@ -0,0 +1,172 @@
+import argparse, json, logging, os, resource, shutil, sys, tempfile, time, tracemalloc
+from fake_services import FakeServices, FakeHamming, FakeOpenAI
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/bench_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Returns the q-quantile of values by linear interpolation.
+
+    Args:
+        values (list[float]): The samples, not empty.
+        q (float): The quantile, between 0 and 1.
+
+    Returns:
+        float: The quantile.
+    """
+    values = sorted(values)
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def stage_latencies(events_path: str) -> dict[str, dict[str, float]]:
+    """
+    Summarizes the wall times in a telemetry JSONL file per service and operation.
+
+    Args:
+        events_path (str): The telemetry events file.
+
+    Returns:
+        dict[str, dict[str, float]]: Count, p50, p90, p99 and max wall seconds per "service/operation".
+    """
+    samples: dict[str, list[float]] = {}
+    if os.path.exists(events_path):
+        with open(events_path) as f:
+            for line in f:
+                event = json.loads(line)
+                samples.setdefault(f"{event['service']}/{event['operation']}", []).append(event["wall_seconds"])
+    return {
+        stage: {
+            "count": len(values),
+            "p50": round(percentile(values, 0.5), 4),
+            "p90": round(percentile(values, 0.9), 4),
+            "p99": round(percentile(values, 0.99), 4),
+            "max": round(max(values), 4)
+        }
+        for stage, values in sorted(samples.items())
+    }
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Runs the exploration loop against fake_services and reports its throughput.")
+    parser.add_argument("--mode", choices=("pipeline", "rounds"), default="pipeline", help="Exploration mode, as EXPLORATION_MODE in main.py.")
+    parser.add_argument("--rounds", type=int, default=3, help="Maximum number of rounds, of calls-per-round calls each.")
+    parser.add_argument("--calls-per-round", type=int, default=3)
+    parser.add_argument("--max-concurrent-calls", type=int, default=3)
+    parser.add_argument("--call-seconds", type=float, nargs=2, default=(1.0, 3.0), metavar=("MIN", "MAX"), help="Range of the fake call durations.")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds every fake LLM request takes.")
+    parser.add_argument("--extraction-mode", choices=("single", "chain"), default="single")
+    parser.add_argument("--parse-window-turns", type=int, default=None, help="Parse the transcripts in windows of this many turns, as PARSE_WINDOW_TURNS in main.py.")
+    parser.add_argument("--no-normalize", action="store_true", help="Parse the transcripts as DeepGram returned them.")
+    parser.add_argument("--no-speaker-roles", action="store_true", help="Parse the transcripts with numbered speakers instead of callee and caller.")
+    parser.add_argument("--preprocess-audio", action="store_true", help="Trim the silence of the recordings before they are uploaded.")
+    parser.add_argument("--no-webhook", action="store_true", help="Only poll for the recordings.")
+    parser.add_argument("--output", help="Where to save the report as JSON.")
+    return parser.parse_args(argv)
+
+def run_bench(args: argparse.Namespace) -> dict:
+    """
+    Runs main.py's exploration loop, explore, against fake_services in a scratch directory.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+
+    Returns:
+        dict: The report with rounds per minute, per-stage latency percentiles and peak memory.
+    """
+    services = FakeServices(
+        hamming=FakeHamming(call_seconds=tuple(args.call_seconds)),
+        openai=FakeOpenAI(default_latency=args.llm_latency)
+    )
+    services.hamming.transcript_count = len(services.deepgram.transcripts)
+    services.start()
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    os.chdir(workdir)
+    os.makedirs("logs", exist_ok=True)
+    os.environ.update(services.env())
+    os.environ.update({
+        "TELEMETRY_DIR": os.path.join(workdir, "telemetry"),
+        "TRANSCRIPTION_CACHE_DIR": os.path.join(workdir, "cache", "transcriptions"),
+        "LLM_CACHE_MODE": "off",
+    })
+
+    # The modules read their configuration from the environment on import, so they are imported once it is set
+    from DecisionTree import DecisionTree
+    from exploration import explore
+    from webhook_server import CallWebhookServer
+    from polling import PollingPolicy, CallDurationHistory
+    from http_sessions import http_sessions
+    from transcript import TranscriptArchive
+    from telemetry import get_telemetry
+    from transcript_normalizer import TranscriptNormalizer
+    from speaker_roles import SpeakerRoleResolver
+    from audio_preprocessing import AudioPreprocessor
+
+    webhook_server = None if args.no_webhook else CallWebhookServer(host="127.0.0.1", port=0).start()
+    polling_policy = PollingPolicy(
+        CallDurationHistory(path=None), default_initial_delay=args.call_seconds[0],
+        min_initial_delay=0.1, base_delay=0.25, max_delay=1.0, deadline=60
+    )
+    archive = TranscriptArchive(enabled=False)
+    normalizer = None if args.no_normalize else TranscriptNormalizer()
+    role_resolver = None if args.no_speaker_roles else SpeakerRoleResolver()
+    preprocessor = AudioPreprocessor(output_format="wav") if args.preprocess_audio else None
+    tree, nodes, edges = DecisionTree(), [], []
+
+    tracemalloc.start()
+    started = time.monotonic()
+    try:
+        nodes, edges, tree, calls, stop_reason = explore(
+            "fake", "fake", "fake", "+10000000000", "Air Conditioning and Plumbing Company",
+            tree, nodes, edges, mode=args.mode, calls_per_round=args.calls_per_round,
+            max_concurrent_calls=args.max_concurrent_calls, max_calls=args.rounds * args.calls_per_round,
+            webhook_server=webhook_server, polling_policy=polling_policy, archive=archive,
+            extraction_mode=args.extraction_mode, parse_window_turns=args.parse_window_turns,
+            normalizer=normalizer, role_resolver=role_resolver, preprocessor=preprocessor
+        )
+        rounds = calls / args.calls_per_round
+        elapsed = time.monotonic() - started
+        _, peak_traced = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        if webhook_server:
+            webhook_server.stop()
+        http_sessions.close()
+        archive.close()
+        get_telemetry().close()
+        services.stop()
+
+    report = {
+        "mode": args.mode,
+        "elapsed_seconds": round(elapsed, 2),
+        "rounds": rounds,
+        "calls": calls,
+        "stop_reason": stop_reason,
+        "rounds_per_minute": round(rounds / elapsed * 60, 2) if elapsed else None,
+        "nodes": len(nodes),
+        "edges": len(edges),
+        "stages": stage_latencies(get_telemetry().jsonl_path),
+        "peak_traced_mb": round(peak_traced / 1024 / 1024, 2),
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 2),
+    }
+    shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    output = os.path.abspath(args.output) if args.output else None
+    report = run_bench(args)
+    print(json.dumps(report, indent=2))
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
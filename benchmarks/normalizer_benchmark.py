@@ -0,0 +1,166 @@
+import argparse, datetime, glob, json, logging, os, platform, re, sys, time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from transcript import Transcript, Utterance
+from transcript_normalizer import TranscriptNormalizer
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+SECONDS_PER_WORD = 0.4  # About 150 words per minute
+PAUSE_SECONDS = 0.5
+_LINE = re.compile(r"\[Speaker (\d+)\] (.*)")
+
+# (name, [(channel, transcript)], transcripts the normalizer must keep, transcripts it must drop)
+REGRESSION_CASES = [
+    (
+        "yes/no answers before longer answers starting the same way",
+        [
+            (0, "Are you an existing customer with us?"), (1, "No."),
+            (0, "Is this an emergency?"), (1, "No, it is not urgent."),
+            (0, "Would you like to book a visit?"), (1, "Yes."),
+            (0, "Is Monday morning okay?"), (1, "Yes, Monday works."),
+        ],
+        ["No.", "No, it is not urgent.", "Yes.", "Yes, Monday works."],
+        []
+    ),
+    (
+        "unpunctuated one-word answers",
+        [(0, "Do you have an account?"), (1, "No"), (0, "Is it urgent?"), (1, "No not really")],
+        ["No", "No not really"],
+        []
+    ),
+    (
+        "cut-off question repeated in full",
+        [(0, "Are you an existing"), (0, "Are you an existing customer with us?"), (1, "Yes.")],
+        ["Are you an existing customer with us?", "Yes."],
+        ["Are you an existing"]
+    ),
+    (
+        "sentence said again later on purpose",
+        [(0, "Could I have your name?"), (1, "John."), (0, "Could I have your name please, spelled out?")],
+        ["Could I have your name?", "Could I have your name please, spelled out?"],
+        []
+    ),
+]
+
+def load_example(path: str) -> Transcript:
+    """
+    Reads a transcript saved in the "[Speaker <channel>] <text>" format. The text files have no timestamps,
+    so every utterance is given a duration from its word count and follows the previous one after a short pause.
+
+    Args:
+        path (str): The transcript file.
+
+    Returns:
+        Transcript: The transcript with estimated timestamps.
+    """
+    utterances, clock = [], 0.0
+    with open(path) as f:
+        for line in f:
+            match = _LINE.match(line.strip())
+            if not match:
+                continue
+            duration = SECONDS_PER_WORD * max(1, len(match.group(2).split()))
+            utterances.append(Utterance(channel=int(match.group(1)), start=clock, end=clock + duration, transcript=match.group(2)))
+            clock += duration + PAUSE_SECONDS
+    return Transcript(utterances=utterances, channels=len({utterance.channel for utterance in utterances}) or 1, duration=clock)
+
+def check_regressions() -> list[str]:
+    """
+    Runs the filler-free passes of the normalizer over REGRESSION_CASES, whose utterances are one second
+    apart so none of them are merged.
+
+    Returns:
+        list[str]: A description of every failed expectation, empty if all hold.
+    """
+    normalizer = TranscriptNormalizer(filler_phrases=(), merge_gap_seconds=0.0)
+    failures = []
+    for name, lines, kept, dropped in REGRESSION_CASES:
+        utterances = [
+            Utterance(channel=channel, start=2.0 * index, end=2.0 * index + 1.0, transcript=text)
+            for index, (channel, text) in enumerate(lines)
+        ]
+        transcript = Transcript(utterances=utterances, channels=2, duration=2.0 * len(lines))
+        result = [utterance.transcript for utterance in normalizer.normalize(transcript).utterances]
+        failures.extend(f"{name}: dropped '{text}'" for text in kept if text not in result)
+        failures.extend(f"{name}: kept '{text}'" for text in dropped if text in result)
+    return failures
+
+def token_counter():
+    """
+    Returns a function counting the tokens of a text, with o1-preview's encoding if tiktoken is installed,
+    otherwise estimated as one token per four characters.
+    """
+    if tiktoken is None:
+        return lambda text: round(len(text) / 4), "estimated"
+    encoding = tiktoken.get_encoding("o200k_base")
+    return lambda text: len(encoding.encode(text)), "o200k_base"
+
+def run(paths: list[str], repeat: int = 100) -> dict:
+    """
+    Normalizes every example transcript and measures how much smaller it gets and how long it takes.
+
+    Args:
+        paths (list[str]): The transcript files.
+        repeat (int): Number of times each transcript is normalized for the timing.
+
+    Returns:
+        dict: The environment, the results per transcript and the totals.
+    """
+    normalizer = TranscriptNormalizer()
+    count_tokens, encoding = token_counter()
+    results = {
+        "benchmark": "normalizer",
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "encoding": encoding,
+        "transcripts": {}
+    }
+    totals = {"tokens_before": 0, "tokens_after": 0}
+    for path in paths:
+        transcript = load_example(path)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            normalized = normalizer.normalize(transcript)
+        seconds = (time.perf_counter() - started) / repeat
+        before, after = transcript.to_text(), normalized.to_text()
+        result = {
+            "utterances_before": len(transcript.utterances),
+            "utterances_after": len(normalized.utterances),
+            "characters_before": len(before),
+            "characters_after": len(after),
+            "tokens_before": count_tokens(before),
+            "tokens_after": count_tokens(after),
+            "normalize_seconds": seconds
+        }
+        result["token_reduction"] = 1 - result["tokens_after"] / result["tokens_before"] if result["tokens_before"] else 0.0
+        results["transcripts"][os.path.basename(path)] = result
+        totals["tokens_before"] += result["tokens_before"]
+        totals["tokens_after"] += result["tokens_after"]
+    totals["token_reduction"] = 1 - totals["tokens_after"] / totals["tokens_before"] if totals["tokens_before"] else 0.0
+    results["total"] = totals
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the transcript normalizer on the example transcripts.")
+    parser.add_argument("paths", nargs="*", default=sorted(glob.glob(os.path.join(REPO_DIR, "examples", "transcription_*.txt"))))
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--output", default=None, help="Where to save the results as JSON.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    failures = check_regressions()
+    if failures:
+        print("Normalizer regressions:\n" + "\n".join(failures), file=sys.stderr)
+        sys.exit(1)
+    results = run(args.paths, args.repeat)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,228 @@
+import argparse, datetime, gc, json, logging, os, platform, random, subprocess, sys, time, tracemalloc
+from typing import Callable
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import DecisionTree as decision_tree_module
+from DecisionTree import DecisionTree
+from tree_helpers import parse_tree
+
+SIZES = (1_000, 10_000, 100_000)
+
+QUESTION_LABELS = [
+    "Existing customer?",
+    "Is this an emergency that needs a technician today?",
+    "Air conditioning or plumbing issue?",
+    "Which day and time slot works best for the service appointment?",
+    "Does the unit make any unusual noise or smell when it is running?",
+    "Would the customer like to sign up for the annual maintenance plan?",
+    "Residential or commercial property?",
+    "Has the customer been charged a call-out fee before?",
+]
+ACTION_LABELS = [
+    "Ask for name and address",
+    "Transfer the call to the emergency line",
+    "Book a technician visit and confirm the time slot by text message",
+    "Explain the pricing of the standard servicing package",
+    "Take a message for the billing department",
+    "End the call",
+]
+INQUIRY_LABELS = [
+    "Caller asks about opening hours",
+    "Caller asks whether the company services heat pumps as well as air conditioners",
+    "Caller asks for a quote",
+]
+SYLLABLES = ["ka", "lo", "mi", "nu", "pe", "ra", "si", "to", "va", "ze", "bri", "dor", "fen", "gul", "hax", "jor", "kel", "mun", "pyr", "tev"]
+CONDITIONS = ["yes", "no", "emergency", "not sure", "caller wants to speak to a human", "weekday morning", None]
+
+def _pseudo_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+def synthetic_tree(size: int, seed: int = 0) -> tuple[list[dict], list[dict]]:
+    """
+    Builds a synthetic decision tree in the node and edge format returned by the LLM.
+    Question nodes branch two to four ways, action and inquiry nodes continue the conversation
+    with at most one follow-up, and labels get a suffix of random pseudo-words so they are not
+    near-duplicates that parse_tree would merge.
+
+    Args:
+        size (int): Number of nodes.
+        seed (int): Random seed.
+
+    Returns:
+        tuple[list[dict], list[dict]]: The nodes and edges.
+    """
+    rng = random.Random(seed)
+    nodes = [{"id": "1", "label": rng.choice(QUESTION_LABELS), "type": "question"}]
+    edges = []
+    open_nodes = ["1"]
+    types = {"1": "question"}
+    next_id = 2
+    while next_id <= size:
+        parent = open_nodes.pop(0) if open_nodes else str(rng.randint(1, next_id - 1))
+        children = rng.randint(2, 4) if types[parent] == "question" else rng.randint(0, 1)
+        for _ in range(children):
+            if next_id > size:
+                break
+            node_type = rng.choices(("question", "action", "inquiry"), weights=(5, 4, 1))[0]
+            labels = {"question": QUESTION_LABELS, "action": ACTION_LABELS, "inquiry": INQUIRY_LABELS}[node_type]
+            node_id = str(next_id)
+            nodes.append({"id": node_id, "label": f"{rng.choice(labels)} ({_pseudo_word(rng)} {_pseudo_word(rng)} {_pseudo_word(rng)})", "type": node_type})
+            edges.append({"source_id": parent, "target_id": node_id, "condition": rng.choice(CONDITIONS)})
+            types[node_id] = node_type
+            open_nodes.append(node_id)
+            next_id += 1
+    return nodes, edges
+
+def _timed(function: Callable[[], object]) -> tuple[float, object]:
+    gc.collect()
+    started = time.perf_counter()
+    result = function()
+    return time.perf_counter() - started, result
+
+def benchmark_size(size: int, seed: int = 0) -> dict:
+    """
+    Measures the DecisionTree operations on a synthetic tree.
+
+    Args:
+        size (int): Number of nodes.
+        seed (int): Random seed of the synthetic tree.
+
+    Returns:
+        dict: Seconds, throughput and memory figures for this size.
+    """
+    nodes, edges = synthetic_tree(size, seed)
+    result = {"nodes": len(nodes), "edges": len(edges)}
+
+    seconds, tree = _timed(lambda: parse_tree(DecisionTree(), nodes, edges))
+    result["parse_tree_seconds"] = seconds
+    result["parse_tree_nodes_per_second"] = len(nodes) / seconds
+
+    # Memory is measured on a second build, tracing allocations would distort the timings
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    traced_tree = parse_tree(DecisionTree(), nodes, edges)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result["bytes_per_node"] = (after - before) / len(nodes)
+    del traced_tree
+
+    def insert():
+        tree = DecisionTree()
+        for node in nodes:
+            tree.add_decision_node(node["id"], node["label"])
+        for edge in edges:
+            tree.add_edge(edge["source_id"], edge["target_id"], edge["condition"])
+        return tree
+    seconds, _ = _timed(insert)
+    result["insert_seconds"] = seconds
+    result["inserts_per_second"] = (len(nodes) + len(edges)) / seconds
+
+    seconds, (nodes_dict, edges_dict) = _timed(lambda: (tree.get_nodes_as_dict(), tree.get_edges_as_dict()))
+    # The exports log and swallow their errors, an empty export would time nothing
+    if len(nodes_dict) != len(nodes) or len(edges_dict) != len(edges):
+        raise RuntimeError(f"Dict export returned {len(nodes_dict)} nodes and {len(edges_dict)} edges, expected {len(nodes)} and {len(edges)}")
+    result["dict_export_seconds"] = seconds
+
+    labels = [node["label"] for node in nodes]
+    seconds, _ = _timed(lambda: [tree.wrap_label(label) for label in labels])
+    result["wrap_label_seconds"] = seconds
+    result["wrap_labels_per_second"] = len(labels) / seconds
+
+    # Everything display() does before handing the graph to the Streamlit component
+    agraph = decision_tree_module.agraph
+    decision_tree_module.agraph = lambda **kwargs: None
+    try:
+        seconds, _ = _timed(tree.display)
+        result["render_preparation_seconds"] = seconds
+        # A redraw after one more node and edge, which only prepares the delta
+        tree.add_decision_node(str(len(nodes) + 1), QUESTION_LABELS[0])
+        tree.add_edge(nodes[-1]["id"], str(len(nodes) + 1), CONDITIONS[0])
+        seconds, _ = _timed(tree.display)
+        result["render_delta_seconds"] = seconds
+    finally:
+        decision_tree_module.agraph = agraph
+    return result
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def run(sizes: list[int], seed: int = 0) -> dict:
+    """
+    Runs the benchmark for every size.
+
+    Args:
+        sizes (list[int]): Tree sizes in nodes.
+        seed (int): Random seed of the synthetic trees.
+
+    Returns:
+        dict: The environment and the results per size.
+    """
+    results = {
+        "benchmark": "tree",
+        "revision": git_revision(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "log_level": logging.getLevelName(logging.getLogger().level),
+        "sizes": {}
+    }
+    for size in sizes:
+        print(f"Benchmarking {size} nodes...", file=sys.stderr)
+        results["sizes"][str(size)] = benchmark_size(size, seed)
+    return results
+
+def compare(baseline: dict, current: dict, tolerance: float = 1.2) -> list[str]:
+    """
+    Lists the timings that got slower than the baseline by more than the tolerance.
+
+    Args:
+        baseline (dict): Results of an earlier run.
+        current (dict): Results of this run.
+        tolerance (float): Allowed ratio of current to baseline seconds.
+
+    Returns:
+        list[str]: One line per regression, empty if there are none.
+    """
+    regressions = []
+    for size, metrics in current["sizes"].items():
+        for name, value in metrics.items():
+            old = baseline.get("sizes", {}).get(size, {}).get(name)
+            if name.endswith("_seconds") and old and value / old > tolerance:
+                regressions.append(f"{size} nodes {name}: {old:.4f} s -> {value:.4f} s ({value / old:.2f}x)")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks DecisionTree and parse_tree on synthetic trees.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default=None, help="Root log level, e.g. INFO, to measure without DEBUG records.")
+    parser.add_argument("--output", default=None, help="Where to save the results, benchmarks/results/tree_<timestamp>.json by default.")
+    parser.add_argument("--baseline", default=None, help="Results of an earlier run; exits with 1 if any timing regressed.")
+    parser.add_argument("--tolerance", type=float, default=1.2, help="Allowed slowdown against the baseline.")
+    args = parser.parse_args()
+    if args.log_level:
+        logging.getLogger().setLevel(args.log_level)
+
+    results = run(args.sizes, args.seed)
+    output = args.output or os.path.join(
+        REPO_DIR, "benchmarks", "results", f"tree_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Saved results to {output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
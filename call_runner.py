@@ -0,0 +1,377 @@
+import asyncio, datetime, logging, os
+from typing import AsyncIterator, Optional
+from DecisionTree import DecisionTree
+from helpers import call_hamming_and_transcribe_async, prompt_creator_async
+from llm_clients import llm_clients
+from tree_helpers import parse_nodes_and_edges_async, get_nodes_async, get_edges_async, extract_tree_async, parse_tree
+from webhook_server import CallWebhookServer
+from polling import PollingPolicy
+from transcript import CallResult, Transcript, TranscriptArchive
+from chunked_parse import TurnWindow, parse_windows
+from transcript_normalizer import TranscriptNormalizer
+from speaker_roles import SpeakerRoleResolver
+from audio_preprocessing import AudioPreprocessor
+from label_index import LabelIndex
+from tree_store import TreeStore
+from frontier_scheduler import FrontierScheduler, ExplorationGoal
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/call_runner_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+async def generate_prompts(
+    api_key: str,
+    model_name: str,
+    business_description: str,
+    nodes: list[dict],
+    edges: list[dict],
+    count: int,
+    goals: Optional[list[Optional[ExplorationGoal]]] = None
+) -> list[tuple[Optional[ExplorationGoal], str]]:
+    """
+    Generates one caller prompt per call of the round, all from the same snapshot of the tree.
+
+    Args:
+        api_key (str): OpenAI API key.
+        model_name (str): Name of the OpenAI model to use.
+        business_description (str): Description of the business being tested.
+        nodes (list[dict]): Current nodes of the decision tree.
+        edges (list[dict]): Current edges of the decision tree.
+        count (int): Number of prompts to generate.
+        goals (Optional[list[Optional[ExplorationGoal]]]): The goal of every call, None for untargeted calls.
+
+    Returns:
+        list[tuple[Optional[ExplorationGoal], str]]: The goal and generated prompt of every call, failed generations are left out.
+    """
+    goals = goals or [None] * count
+    results = await asyncio.gather(
+        *(
+            prompt_creator_async(
+                api_key, model_name, business_description, nodes, edges, i, count, goals[i].describe() if goals[i] else None
+            )
+            for i in range(count)
+        ),
+        return_exceptions=True
+    )
+    prompts = []
+    for goal, result in zip(goals, results):
+        if isinstance(result, Exception):
+            logger.error(f"Prompt generation failed: {result}")
+        else:
+            prompts.append((goal, result))
+    return prompts
+
+async def run_calls(
+    hamming_api_key: str,
+    deepgram_api_key: str,
+    number_to_call: str,
+    prompts: list[str],
+    max_concurrent_calls: int,
+    round_dir: str,
+    webhook_server: Optional[CallWebhookServer] = None,
+    polling_policy: Optional[PollingPolicy] = None,
+    archive: Optional[TranscriptArchive] = None,
+    preprocessor: Optional[AudioPreprocessor] = None
+) -> list[Optional[CallResult]]:
+    """
+    Places one call per prompt, at most max_concurrent_calls at a time.
+    Every call gets its own directory under round_dir so recordings and transcriptions never overwrite each other.
+
+    Args:
+        hamming_api_key (str): Hamming API key.
+        deepgram_api_key (str): DeepGram API key.
+        number_to_call (str): The phone number to call.
+        prompts (list[str]): One caller prompt per call.
+        max_concurrent_calls (int): Maximum number of calls in flight.
+        round_dir (str): Directory holding the per-call directories of this round.
+        webhook_server (Optional[CallWebhookServer]): Server receiving the call completion webhooks.
+        polling_policy (Optional[PollingPolicy]): Polling delays and per-call deadline, shared by all calls
+            so every finished call refines the initial delay of the next ones.
+        archive (Optional[TranscriptArchive]): Sink the transcripts are written to in the background.
+        preprocessor (Optional[AudioPreprocessor]): Trims and compresses the recordings before they are uploaded.
+
+    Returns:
+        list[Optional[CallResult]]: The transcribed calls, in prompt order, None for failed calls.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrent_calls))
+
+    async def run_one(index: int, prompt: str) -> Optional[CallResult]:
+        call_dir = os.path.join(round_dir, f"call_{index}")
+        os.makedirs(call_dir, exist_ok=True)
+        async with semaphore:
+            logger.info(f"Placing call {index + 1} of {len(prompts)}")
+            return await call_hamming_and_transcribe_async(
+                hamming_api_key, deepgram_api_key, number_to_call, prompt,
+                output_dir=call_dir, webhook_server=webhook_server, polling_policy=polling_policy, archive=archive,
+                preprocessor=preprocessor
+            )
+
+    results = await asyncio.gather(*(run_one(i, p) for i, p in enumerate(prompts)), return_exceptions=True)
+    calls = []
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.error(f"Call {index + 1} failed: {result}")
+            calls.append(None)
+        else:
+            calls.append(result)
+    return calls
+
+async def extract_nodes_and_edges(
+    openai_api_key: str,
+    call: CallResult,
+    nodes: list[dict],
+    edges: list[dict],
+    parse_model: str = "o1-preview",
+    extract_model: str = "gpt-4o",
+    archive: Optional[TranscriptArchive] = None,
+    extraction_mode: str = "single",
+    label_index: Optional[LabelIndex] = None,
+    context: Optional[str] = None,
+    fillers_removed: bool = False
+) -> tuple[Optional[list[dict]], Optional[list[dict]]]:
+    """
+    Parses one call's transcript against the current tree and extracts its new nodes and edges.
+
+    In "single" mode this is one structured-output request with extract_model. If that fails, or in
+    "chain" mode, the transcript is parsed to text with parse_model and the nodes and edges are then
+    extracted from that text with extract_model.
+
+    Args:
+        openai_api_key (str): OpenAI API key.
+        call (CallResult): The transcribed call.
+        nodes (list[dict]): Nodes found so far.
+        edges (list[dict]): Edges found so far.
+        parse_model (str): Model used to parse the transcript.
+        extract_model (str): Model used for the structured extraction, or to extract nodes and edges from the parsed text.
+        archive (Optional[TranscriptArchive]): Sink the parsed text is written to in the background.
+        extraction_mode (str): "single" for one structured-output request, "chain" for the three-request chain.
+        label_index (Optional[LabelIndex]): The tree's label index, to show the parse the existing labels most similar to the transcript.
+        context (Optional[str]): Where the conversation stands, when the transcript is one part of a longer call.
+        fillers_removed (bool): Whether the transcript's filler phrases were already removed, so the prompt need not list them.
+
+    Returns:
+        tuple[Optional[list[dict]], Optional[list[dict]]]: The new nodes and edges, None where nothing was found.
+    """
+    conversation = call.transcript.to_text()
+    if extraction_mode == "single":
+        result = await extract_tree_async(
+            openai_api_key, extract_model, conversation, nodes, edges, label_index, context, fillers_removed
+        )
+        if result is not None:
+            new_nodes, new_edges = result
+            print('new_nodes', new_nodes)
+            print('new_edges', new_edges)
+            return new_nodes, new_edges
+        logger.warning(f"Structured extraction failed for call {call.call_id}, falling back to the parse chain.")
+    text = await parse_nodes_and_edges_async(
+        openai_api_key, parse_model, conversation, nodes, edges, label_index, context, fillers_removed
+    )
+    if archive:
+        archive.save_text(os.path.join(call.output_dir, "parsed_text_output.txt"), str(text))
+    # Nodes and edges are extracted independently from the same text, so both requests run at once
+    new_nodes, new_edges = await asyncio.gather(
+        get_nodes_async(openai_api_key, extract_model, text),
+        get_edges_async(openai_api_key, extract_model, text)
+    )
+    print('new_nodes', new_nodes)
+    print('new_edges', new_edges)
+    return new_nodes, new_edges
+
+async def tree_updates(
+    openai_api_key: str,
+    call: CallResult,
+    tree: DecisionTree,
+    nodes: list[dict],
+    edges: list[dict],
+    parse_model: str = "o1-preview",
+    extract_model: str = "gpt-4o",
+    archive: Optional[TranscriptArchive] = None,
+    extraction_mode: str = "single",
+    window_turns: Optional[int] = None,
+    overlap_turns: int = 3,
+    max_concurrent_windows: int = 3,
+    normalizer: Optional[TranscriptNormalizer] = None,
+    role_resolver: Optional[SpeakerRoleResolver] = None
+) -> AsyncIterator[tuple[list[dict], list[dict]]]:
+    """
+    Parses one call and merges what it found into the tree.
+
+    Without window_turns the whole transcript is parsed at once. With it, the transcript is split into
+    overlapping windows of turns that are parsed concurrently and merged in call order, so the time to the
+    first update follows the window size rather than the call length.
+
+    Args:
+        openai_api_key (str): OpenAI API key.
+        call (CallResult): The transcribed call.
+        tree (DecisionTree): The decision tree to update.
+        nodes (list[dict]): Nodes found so far.
+        edges (list[dict]): Edges found so far.
+        parse_model (str): Model used to parse the transcript.
+        extract_model (str): Model used for the structured extraction, or to extract nodes and edges from the parsed text.
+        archive (Optional[TranscriptArchive]): Sink the parsed texts are written to in the background.
+        extraction_mode (str): "single" for one structured-output request, "chain" for the three-request chain.
+        window_turns (Optional[int]): Turns per window, None or 0 to parse the whole transcript at once.
+        overlap_turns (int): Turns every window repeats from the previous one.
+        max_concurrent_windows (int): Maximum number of windows parsed at once.
+        normalizer (Optional[TranscriptNormalizer]): Clean-up applied to the transcript before it is parsed.
+        role_resolver (Optional[SpeakerRoleResolver]): Tags the utterances with the callee and caller roles.
+
+    Yields:
+        tuple[list[dict], list[dict]]: The nodes and edges added to the tree, once for the whole transcript
+        or once per window.
+    """
+    if role_resolver:
+        call = call.model_copy(update={"transcript": role_resolver.tag(call.transcript, call.number)})
+    if normalizer:
+        call = call.model_copy(update={"transcript": normalizer.normalize(call.transcript)})
+    if (normalizer or role_resolver) and archive:
+        archive.save_text(os.path.join(call.output_dir, "normalized_transcription.txt"), call.transcript.to_text())
+    fillers_removed = bool(normalizer and normalizer.filler_phrases)
+    if not window_turns:
+        new_nodes, new_edges = await extract_nodes_and_edges(
+            openai_api_key, call, nodes, edges, parse_model, extract_model, archive, extraction_mode, tree.label_index,
+            fillers_removed=fillers_removed
+        )
+        new_nodes, new_edges = new_nodes or [], new_edges or []
+        # parse_tree drops what is already in the tree from new_nodes and new_edges
+        parse_tree(tree, new_nodes, new_edges)
+        yield new_nodes, new_edges
+        return
+
+    known_nodes, known_edges = list(nodes), list(edges)
+
+    async def parse_window(window: TurnWindow, context: Optional[str]):
+        part = call.model_copy(update={
+            "transcript": Transcript(utterances=window.utterances, channels=call.transcript.channels),
+            "output_dir": os.path.join(call.output_dir, f"window_{window.number}")
+        })
+        return await extract_nodes_and_edges(
+            openai_api_key, part, known_nodes, known_edges, parse_model, extract_model, archive, extraction_mode,
+            tree.label_index, context, fillers_removed
+        )
+
+    async for new_nodes, new_edges in parse_windows(
+        parse_window, call.transcript.utterances, tree, window_turns, overlap_turns, max_concurrent_windows
+    ):
+        known_nodes.extend(new_nodes)
+        known_edges.extend(new_edges)
+        yield new_nodes, new_edges
+
+async def run_round(
+    openai_api_key: str,
+    hamming_api_key: str,
+    deepgram_api_key: str,
+    number_to_call: str,
+    business_description: str,
+    tree: DecisionTree,
+    nodes: list[dict],
+    edges: list[dict],
+    calls_per_round: int = 3,
+    max_concurrent_calls: int = 3,
+    prompt_model: str = "o1-preview",
+    parse_model: str = "o1-preview",
+    extract_model: str = "gpt-4o",
+    webhook_server: Optional[CallWebhookServer] = None,
+    polling_policy: Optional[PollingPolicy] = None,
+    archive: Optional[TranscriptArchive] = None,
+    extraction_mode: str = "single",
+    tree_store: Optional[TreeStore] = None,
+    scheduler: Optional[FrontierScheduler] = None,
+    parse_window_turns: Optional[int] = None,
+    parse_window_overlap: int = 3,
+    normalizer: Optional[TranscriptNormalizer] = None,
+    role_resolver: Optional[SpeakerRoleResolver] = None,
+    preprocessor: Optional[AudioPreprocessor] = None
+) -> tuple[list[dict], list[dict], DecisionTree, bool]:
+    """
+    Runs one exploration round: generates calls_per_round prompts, places the calls concurrently
+    and merges every transcription into the decision tree before returning.
+
+    Transcripts are parsed one after the other so that each parse sees the nodes added by the previous one.
+    Every call is aimed at a goal from the scheduler, which records what each call found. Calls whose prompt
+    generation or call failed give their goal's sample back.
+
+    Args:
+        openai_api_key (str): OpenAI API key.
+        hamming_api_key (str): Hamming API key.
+        deepgram_api_key (str): DeepGram API key.
+        number_to_call (str): The phone number to call.
+        business_description (str): Description of the business being tested.
+        tree (DecisionTree): The decision tree to update.
+        nodes (list[dict]): Nodes found so far.
+        edges (list[dict]): Edges found so far.
+        calls_per_round (int): Number of calls placed in this round.
+        max_concurrent_calls (int): Maximum number of calls in flight.
+        prompt_model (str): Model used to generate the caller prompts.
+        parse_model (str): Model used to parse the transcriptions.
+        extract_model (str): Model used for the structured extraction, or to extract nodes and edges from the parsed text.
+        webhook_server (Optional[CallWebhookServer]): Server receiving the call completion webhooks.
+        polling_policy (Optional[PollingPolicy]): Polling delays and per-call deadline.
+        archive (Optional[TranscriptArchive]): Sink the transcripts and parsed texts are written to in the background.
+        extraction_mode (str): "single" for one structured-output request per call, "chain" for the three-request chain.
+        tree_store (Optional[TreeStore]): Store every tree update is committed to.
+        scheduler (Optional[FrontierScheduler]): Scheduler of the call goals, keep one across rounds so
+            its convergence test sees every call. A new one for tree by default.
+        parse_window_turns (Optional[int]): Parse the transcripts in overlapping windows of this many turns, None for whole transcripts.
+        parse_window_overlap (int): Turns every window repeats from the previous one.
+        normalizer (Optional[TranscriptNormalizer]): Clean-up applied to the transcripts before they are parsed.
+        role_resolver (Optional[SpeakerRoleResolver]): Tags the utterances with the callee and caller roles.
+        preprocessor (Optional[AudioPreprocessor]): Trims and compresses the recordings before they are uploaded.
+
+    Returns:
+        tuple[list[dict], list[dict], DecisionTree, bool]: The updated nodes, edges and tree,
+        and whether any call of the round found new nodes or edges.
+    """
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    round_dir = os.path.join("logs", "calls", timestamp)
+    os.makedirs(round_dir, exist_ok=True)
+
+    scheduler = scheduler or FrontierScheduler(tree)
+    try:
+        goals = [scheduler.next_goal() for _ in range(calls_per_round)]
+        prompts = await generate_prompts(openai_api_key, prompt_model, business_description, nodes, edges, calls_per_round, goals)
+        logger.info(f"Generated {len(prompts)} prompts for round {timestamp}")
+        prompted = {id(goal) for goal, _ in prompts}
+        for goal in goals:
+            if id(goal) not in prompted:
+                scheduler.release(goal)
+        calls = await run_calls(
+            hamming_api_key, deepgram_api_key, number_to_call, [prompt for _, prompt in prompts], max_concurrent_calls, round_dir,
+            webhook_server, polling_policy, archive, preprocessor
+        )
+
+        found_new = False
+        for (goal, _), call in zip(prompts, calls):
+            if call is None:
+                scheduler.release(goal)
+                continue
+            found = 0
+            try:
+                async for new_nodes, new_edges in tree_updates(
+                    openai_api_key, call, tree, nodes, edges, parse_model, extract_model, archive, extraction_mode,
+                    parse_window_turns, parse_window_overlap, normalizer=normalizer, role_resolver=role_resolver
+                ):
+                    if not new_nodes and not new_edges:
+                        continue
+                    found_new = True
+                    found += len(new_nodes)
+                    if tree_store:
+                        tree_store.append_batch(new_nodes, new_edges, call.call_id)
+                    nodes = nodes + new_nodes
+                    edges = edges + new_edges
+            except Exception as e:
+                logger.error(f"Parsing of call {call.call_id} failed: {e}")
+                scheduler.release(goal)
+                continue
+            scheduler.record(goal, found)
+        return nodes, edges, tree, found_new
+    finally:
+        # The clients belong to this round's event loop, which asyncio.run closes after it
+        await llm_clients.aclose()
@@ -0,0 +1,211 @@
+import asyncio, datetime, logging
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, Optional, Union
+from pydantic import BaseModel
+from DecisionTree import DecisionTree
+from transcript import Utterance
+from tree_helpers import parse_tree
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/chunked_parse_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+class TurnWindow(BaseModel):
+    """Model representing consecutive turns of a call, a turn being the consecutive utterances of one speaker."""
+    number: int  # Position of the window in the call, from 0
+    first_turn: int  # Index of the window's first turn in the call
+    overlap: int  # Number of leading turns that were also in the previous window
+    turns: list[list[Utterance]]
+
+    @property
+    def utterances(self) -> list[Utterance]:
+        """All utterances of the window in order."""
+        return [utterance for turn in self.turns for utterance in turn]
+
+    @property
+    def last_turn(self) -> int:
+        """Index of the window's last turn in the call."""
+        return self.first_turn + len(self.turns) - 1
+
+async def _aiter(utterances: Union[Iterable[Utterance], AsyncIterable[Utterance]]) -> AsyncIterator[Utterance]:
+    if hasattr(utterances, "__aiter__"):
+        async for utterance in utterances:
+            yield utterance
+    else:
+        for utterance in utterances:
+            yield utterance
+
+async def turn_windows(
+    utterances: Union[Iterable[Utterance], AsyncIterable[Utterance]],
+    window_turns: int = 12,
+    overlap_turns: int = 3
+) -> AsyncIterator[TurnWindow]:
+    """
+    Groups utterances into turns and yields overlapping windows of turns as soon as each window is complete.
+
+    Args:
+        utterances (Union[Iterable[Utterance], AsyncIterable[Utterance]]): The utterances in call order,
+            e.g. a list or a generator fed while the call is transcribed.
+        window_turns (int): Turns per window.
+        overlap_turns (int): Turns every window repeats from the end of the previous one, so an exchange
+            cut by a window boundary is seen whole once.
+
+    Yields:
+        TurnWindow: The windows in call order.
+    """
+    window_turns = max(1, window_turns)
+    overlap_turns = min(max(0, overlap_turns), window_turns - 1)
+    buffer: list[list[Utterance]] = []
+    first_turn = 0
+    number = 0
+    overlap = 0
+    fresh = 0  # Turns in the buffer no window has contained yet
+
+    async for utterance in _aiter(utterances):
+        if buffer and buffer[-1][-1].channel == utterance.channel:
+            buffer[-1].append(utterance)
+            continue
+        if len(buffer) == window_turns:
+            yield TurnWindow(number=number, first_turn=first_turn, overlap=overlap, turns=buffer)
+            number += 1
+            kept = buffer[len(buffer) - overlap_turns:] if overlap_turns else []
+            first_turn += len(buffer) - len(kept)
+            buffer, overlap, fresh = [list(turn) for turn in kept], len(kept), 0
+        buffer.append([utterance])
+        fresh += 1
+    if fresh:
+        yield TurnWindow(number=number, first_turn=first_turn, overlap=overlap, turns=buffer)
+
+def window_context(window: TurnWindow, anchor: Optional[tuple[str, str]]) -> Optional[str]:
+    """
+    Describes where a window stands in its call for the parse prompt.
+
+    Args:
+        window (TurnWindow): The window.
+        anchor (Optional[tuple[str, str]]): Id and label of the last node the windows merged so far reached.
+
+    Returns:
+        Optional[str]: The context, None for a first window.
+    """
+    if window.number == 0:
+        return None
+    context = f"This is part {window.number + 1} of a longer call, turns {window.first_turn + 1} to {window.last_turn + 1}."
+    if window.overlap:
+        context += f" Its first {window.overlap} turns were already parsed with the previous part."
+    if anchor:
+        context += f' The parts parsed so far reached node {anchor[0]} "{anchor[1]}", connect the first new node to it.'
+    return context
+
+def stitch(
+    tree: DecisionTree,
+    anchor: Optional[tuple[str, str]],
+    new_nodes: Optional[list[dict]],
+    new_edges: Optional[list[dict]]
+) -> tuple[list[dict], list[dict], Optional[tuple[str, str]]]:
+    """
+    Adds one window's nodes and edges to the tree. If nothing in the window connects to the tree,
+    its first node without a parent is connected to the anchor, the last node the previous windows reached.
+
+    Args:
+        tree (DecisionTree): The decision tree.
+        anchor (Optional[tuple[str, str]]): Id and label of the last node reached so far.
+        new_nodes (Optional[list[dict]]): The window's nodes.
+        new_edges (Optional[list[dict]]): The window's edges.
+
+    Returns:
+        tuple[list[dict], list[dict], Optional[tuple[str, str]]]: The nodes and edges added to the tree,
+        and the new anchor.
+    """
+    new_nodes, new_edges = new_nodes or [], new_edges or []
+    batch_ids = {str(node["id"]) for node in new_nodes}
+    connected = any(
+        str(edge["target_id"]) in batch_ids and str(edge["source_id"]) not in batch_ids for edge in new_edges
+    )
+    targets = {str(edge["target_id"]) for edge in new_edges}
+    entry = next((node for node in new_nodes if str(node["id"]) not in targets), None) if not connected else None
+
+    # parse_tree rewrites the ids of the node dicts it remaps, so entry holds its final id afterwards
+    parse_tree(tree, new_nodes, new_edges)
+    reached = str(new_edges[-1]["target_id"]) if new_edges else (str(new_nodes[-1]["id"]) if new_nodes else None)
+    if anchor and entry is not None and any(node is entry for node in new_nodes):
+        edge = {"source_id": anchor[0], "target_id": str(entry["id"]), "condition": None}
+        if tree.add_edge(edge["source_id"], edge["target_id"], edge["condition"]):
+            logger.debug(f"Connected window entry node {entry['id']} to anchor {anchor[0]}")
+            new_edges.append(edge)
+
+    if reached is not None and tree.has_node(reached):
+        anchor = (reached, tree.get_node(reached).label)
+    return new_nodes, new_edges, anchor
+
+async def parse_windows(
+    parse_window: Callable[[TurnWindow, Optional[str]], Awaitable[tuple[Optional[list[dict]], Optional[list[dict]]]]],
+    utterances: Union[Iterable[Utterance], AsyncIterable[Utterance]],
+    tree: DecisionTree,
+    window_turns: int = 12,
+    overlap_turns: int = 3,
+    max_concurrent_windows: int = 3
+) -> AsyncIterator[tuple[list[dict], list[dict]]]:
+    """
+    Parses a call window by window and merges the windows into the tree in call order.
+
+    Windows are parsed concurrently, at most max_concurrent_windows at a time, each as soon as its turns are
+    available and a slot is free. A slot is held until the window is merged, not just parsed, so a window
+    started in a freed slot sees the anchor of every window merged so far: with N slots, window i carries
+    the last node reached by window i - N or a later one. Every window is merged as soon as it and all
+    earlier windows are parsed, so the first nodes are in the tree long before a long call is fully parsed.
+
+    Args:
+        parse_window (Callable[[TurnWindow, Optional[str]], Awaitable[tuple[Optional[list[dict]], Optional[list[dict]]]]]):
+            Parses one window given its context, returning its new nodes and edges.
+        utterances (Union[Iterable[Utterance], AsyncIterable[Utterance]]): The call's utterances in order.
+        tree (DecisionTree): The decision tree to merge into.
+        window_turns (int): Turns per window.
+        overlap_turns (int): Turns every window repeats from the previous one.
+        max_concurrent_windows (int): Maximum number of windows parsed at once.
+
+    Yields:
+        tuple[list[dict], list[dict]]: The nodes and edges each window added to the tree, in call order.
+    """
+    limit = max(1, max_concurrent_windows)
+    anchor: Optional[tuple[str, str]] = None
+    waiting: deque[TurnWindow] = deque()  # Windows whose turns are in, waiting for a free slot
+    pending: deque[tuple[TurnWindow, asyncio.Task]] = deque()
+
+    def start_waiting():
+        # A slot only frees up when a window is merged, so every window but the first few starts
+        # right after a merge and its context carries the anchor that merge left
+        while waiting and len(pending) < limit:
+            window = waiting.popleft()
+            pending.append((window, asyncio.create_task(parse_window(window, window_context(window, anchor)))))
+
+    async def merge_next() -> tuple[list[dict], list[dict]]:
+        nonlocal anchor
+        window, task = pending.popleft()
+        try:
+            new_nodes, new_edges = await task
+        except Exception as e:
+            logger.error(f"Parsing of window {window.number} failed: {e}")
+            new_nodes, new_edges = None, None
+        added_nodes, added_edges, anchor = stitch(tree, anchor, new_nodes, new_edges)
+        logger.info(f"Window {window.number} added {len(added_nodes)} nodes and {len(added_edges)} edges")
+        start_waiting()
+        return added_nodes, added_edges
+
+    try:
+        async for window in turn_windows(utterances, window_turns, overlap_turns):
+            waiting.append(window)
+            start_waiting()
+            while pending and pending[0][1].done():
+                yield await merge_next()
+        while pending:
+            yield await merge_next()
+    finally:
+        for _, task in pending:
+            task.cancel()
@@ -0,0 +1,133 @@
+import datetime, gzip, json, logging, os, tempfile, threading
+from typing import Any, Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/disk_cache_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+class DiskCache:
+    """
+    A directory of gzip-compressed JSON entries keyed by content hashes, evicted least recently used
+    first once the directory grows beyond max_bytes.
+
+    The modification time of an entry doubles as its last-use time, so recency survives restarts.
+
+    Attributes:
+        directory (str): Directory holding the entries.
+        max_bytes (int): Size budget for all entries together.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json.gz")
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json.gz"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns a cached value and marks it as recently used.
+
+        Args:
+            key (str): The entry's key.
+
+        Returns:
+            Optional[Any]: The cached value, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+            logger.debug(f"Cache hit: {key}")
+            return value
+        except FileNotFoundError:
+            logger.debug(f"Cache miss: {key}")
+        except Exception as e:
+            logger.error(f"Error reading cache entry {path}: {e}")
+        return None
+
+    def set(self, key: str, value: Any):
+        """
+        Stores a value, evicting the least recently used entries if the cache outgrows max_bytes.
+
+        Args:
+            key (str): The entry's key.
+            value (Any): A JSON-serializable value.
+        """
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+                f.write(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+            logger.debug(f"Cached {key} ({size} bytes)")
+        except Exception as e:
+            logger.error(f"Error writing cache entry {path}: {e}")
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += size - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Deletes the least recently used entries until the cache fits in max_bytes. Called with the lock held."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                logger.debug(f"Evicted cache entry {path}")
+            except FileNotFoundError:
+                pass
+        self._total_bytes = total
+
+    def delete(self, key: str):
+        """
+        Removes an entry if it exists.
+
+        Args:
+            key (str): The entry's key.
+        """
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            with self._lock:
+                if self._total_bytes is not None:
+                    self._total_bytes -= size
+        except FileNotFoundError:
+            pass
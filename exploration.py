@@ -0,0 +1,133 @@
+import asyncio, datetime, logging
+from typing import Callable, Optional
+from DecisionTree import DecisionTree
+from call_runner import run_round
+from pipeline import ExplorationPipeline
+from webhook_server import CallWebhookServer
+from polling import PollingPolicy
+from transcript import TranscriptArchive
+from telemetry import get_telemetry
+from tree_store import TreeStore
+from frontier_scheduler import FrontierScheduler
+from transcript_normalizer import TranscriptNormalizer
+from speaker_roles import SpeakerRoleResolver
+from audio_preprocessing import AudioPreprocessor
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/exploration_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+EXPLORATION_MODES = ("pipeline", "rounds")
+
+def explore(
+    openai_api_key: str,
+    hamming_api_key: str,
+    deepgram_api_key: str,
+    number_to_call: str,
+    business_description: str,
+    tree: DecisionTree,
+    nodes: list[dict],
+    edges: list[dict],
+    mode: str = "pipeline",
+    calls_per_round: int = 3,
+    max_concurrent_calls: int = 3,
+    max_calls: Optional[int] = None,
+    scheduler: Optional[FrontierScheduler] = None,
+    on_update: Optional[Callable[[DecisionTree], None]] = None,
+    webhook_server: Optional[CallWebhookServer] = None,
+    polling_policy: Optional[PollingPolicy] = None,
+    archive: Optional[TranscriptArchive] = None,
+    extraction_mode: str = "single",
+    tree_store: Optional[TreeStore] = None,
+    parse_window_turns: Optional[int] = None,
+    parse_window_overlap: int = 3,
+    normalizer: Optional[TranscriptNormalizer] = None,
+    role_resolver: Optional[SpeakerRoleResolver] = None,
+    preprocessor: Optional[AudioPreprocessor] = None
+) -> tuple[list[dict], list[dict], DecisionTree, int, Optional[str]]:
+    """
+    Explores the agent until the scheduler converges or gives up on failing calls, the telemetry budget is
+    exhausted or max_calls calls were placed. This is the exploration loop of main.py, shared with bench.py
+    so both stop on the same conditions.
+
+    Args:
+        openai_api_key (str): OpenAI API key.
+        hamming_api_key (str): Hamming API key.
+        deepgram_api_key (str): DeepGram API key.
+        number_to_call (str): The phone number to call.
+        business_description (str): Description of the business being tested.
+        tree (DecisionTree): The decision tree to update.
+        nodes (list[dict]): Nodes found so far.
+        edges (list[dict]): Edges found so far.
+        mode (str): "pipeline" for the staged pipeline, "rounds" for rounds of calls_per_round calls.
+        calls_per_round (int): Number of calls placed per round in "rounds" mode.
+        max_concurrent_calls (int): Maximum number of calls in flight.
+        max_calls (Optional[int]): Stop placing calls after this many, None for no limit.
+        scheduler (Optional[FrontierScheduler]): Scheduler of the call goals and convergence, one for tree by default.
+        on_update (Optional[Callable[[DecisionTree], None]]): Called after the tree was updated, e.g. to redraw it.
+        webhook_server (Optional[CallWebhookServer]): Server receiving the call completion webhooks.
+        polling_policy (Optional[PollingPolicy]): Polling delays and per-call deadline.
+        archive (Optional[TranscriptArchive]): Sink the transcripts and parsed texts are written to in the background.
+        extraction_mode (str): "single" for one structured-output request per call, "chain" for the three-request chain.
+        tree_store (Optional[TreeStore]): Store every tree update is committed to.
+        parse_window_turns (Optional[int]): Parse the transcripts in overlapping windows of this many turns, None for whole transcripts.
+        parse_window_overlap (int): Turns every window repeats from the previous one.
+        normalizer (Optional[TranscriptNormalizer]): Clean-up applied to the transcripts before they are parsed.
+        role_resolver (Optional[SpeakerRoleResolver]): Tags the utterances with the callee and caller roles.
+        preprocessor (Optional[AudioPreprocessor]): Trims and compresses the recordings before they are uploaded.
+
+    Returns:
+        tuple[list[dict], list[dict], DecisionTree, int, Optional[str]]: The final nodes, edges and tree,
+        the number of calls placed, and why the exploration stopped, None if it reached max_calls.
+    """
+    if mode not in EXPLORATION_MODES:
+        raise ValueError(f"Unknown exploration mode: {mode}")
+    scheduler = scheduler or FrontierScheduler(tree)
+
+    if mode == "pipeline":
+        pipeline = ExplorationPipeline(
+            openai_api_key, hamming_api_key, deepgram_api_key, number_to_call, business_description,
+            tree, nodes, edges, max_concurrent_calls=max_concurrent_calls, max_calls=max_calls,
+            scheduler=scheduler, on_update=on_update, webhook_server=webhook_server, polling_policy=polling_policy,
+            archive=archive, extraction_mode=extraction_mode, tree_store=tree_store,
+            parse_window_turns=parse_window_turns, parse_window_overlap=parse_window_overlap,
+            normalizer=normalizer, role_resolver=role_resolver, preprocessor=preprocessor
+        )
+        nodes, edges, tree = asyncio.run(pipeline.run())
+        calls = pipeline.calls_placed
+    else:
+        calls = 0
+        while max_calls is None or calls < max_calls:
+            if get_telemetry().budget_exhausted():
+                break
+            round_calls = calls_per_round if max_calls is None else min(calls_per_round, max_calls - calls)
+            nodes, edges, tree, found_new = asyncio.run(run_round(
+                openai_api_key, hamming_api_key, deepgram_api_key, number_to_call, business_description,
+                tree, nodes, edges, calls_per_round=round_calls, max_concurrent_calls=max_concurrent_calls,
+                webhook_server=webhook_server, polling_policy=polling_policy, archive=archive,
+                extraction_mode=extraction_mode, tree_store=tree_store, scheduler=scheduler,
+                parse_window_turns=parse_window_turns, parse_window_overlap=parse_window_overlap,
+                normalizer=normalizer, role_resolver=role_resolver, preprocessor=preprocessor
+            ))
+            calls += round_calls
+            if found_new and on_update:
+                on_update(tree)
+            if scheduler.converged() or scheduler.failing():
+                break
+
+    if scheduler.converged():
+        reason = f"exploration converged, recent calls found new nodes at a rate of at most {scheduler.yield_rate_bound():.2f}"
+    elif scheduler.failing():
+        reason = f"the last {scheduler.consecutive_failures} calls failed before they were parsed"
+    else:
+        reason = get_telemetry().budget_exhausted()
+    if reason:
+        logger.info(f"Stopping exploration, {reason}")
+    return nodes, edges, tree, calls, reason
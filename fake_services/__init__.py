@@ -0,0 +1,4 @@
+from fake_services.hamming import FakeHamming
+from fake_services.deepgram import FakeDeepgram, load_transcripts
+from fake_services.openai_api import FakeOpenAI
+from fake_services.server import FakeServices, EXAMPLES_DIR
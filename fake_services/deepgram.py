@@ -0,0 +1,108 @@
+import datetime, glob, hashlib, io, logging, os, re, threading, uuid, wave
+from typing import Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/fake_deepgram_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+SPEAKER_LINE = re.compile(r"^\[Speaker (\d+)\]\s*(.*)$")
+
+def load_transcripts(examples_dir: str) -> list[list[tuple[int, str]]]:
+    """
+    Loads the example transcripts in the "[Speaker <channel>] <text>" format.
+
+    Args:
+        examples_dir (str): Directory holding the transcription_*.txt files.
+
+    Returns:
+        list[list[tuple[int, str]]]: The (channel, text) utterances of each transcript, sorted by file name.
+    """
+    transcripts = []
+    for path in sorted(glob.glob(os.path.join(examples_dir, "transcription_*.txt"))):
+        utterances = []
+        with open(path) as f:
+            for line in f:
+                match = SPEAKER_LINE.match(line.strip())
+                if match and match.group(2):
+                    utterances.append((int(match.group(1)), match.group(2)))
+        if utterances:
+            transcripts.append(utterances)
+    if not transcripts:
+        raise ValueError(f"No example transcripts found in {examples_dir}")
+    return transcripts
+
+def _wav_duration(audio: bytes) -> Optional[float]:
+    try:
+        with wave.open(io.BytesIO(audio), "rb") as wav:
+            return wav.getnframes() / wav.getframerate()
+    except Exception:
+        return None
+
+class FakeDeepgram:
+    """
+    Stands in for DeepGram's /v1/listen endpoint, answering with the utterances of an example transcript
+    spread evenly over the length of the uploaded recording.
+
+    Recordings registered by the fake Hamming are transcribed with their call's transcript, any other
+    upload with a transcript picked by its hash.
+
+    Attributes:
+        transcripts (list[list[tuple[int, str]]]): The example transcripts.
+    """
+
+    def __init__(self, transcripts: list[list[tuple[int, str]]]):
+        self.transcripts = transcripts
+        self._lock = threading.Lock()
+        self._recordings: dict[str, int] = {}
+
+    def register_recording(self, audio_sha256: str, transcript_index: int):
+        """
+        Maps a recording to the transcript it should be transcribed as.
+
+        Args:
+            audio_sha256 (str): Hex SHA-256 of the recording.
+            transcript_index (int): Index into transcripts.
+        """
+        with self._lock:
+            self._recordings[audio_sha256] = transcript_index
+
+    def listen(self, audio: bytes) -> dict:
+        """
+        Transcribes an upload.
+
+        Args:
+            audio (bytes): The uploaded recording.
+
+        Returns:
+            dict: A DeepGram-style response with metadata and utterances.
+        """
+        digest = hashlib.sha256(audio).hexdigest()
+        with self._lock:
+            index = self._recordings.get(digest)
+        if index is None:
+            index = int(digest, 16) % len(self.transcripts)
+        transcript = self.transcripts[index]
+        duration = _wav_duration(audio) or float(len(transcript))
+        step = duration / len(transcript)
+        utterances = [
+            {
+                "channel": channel,
+                "start": round(i * step, 3),
+                "end": round((i + 1) * step, 3),
+                "transcript": text,
+                "confidence": 0.99
+            }
+            for i, (channel, text) in enumerate(transcript)
+        ]
+        channels = max(channel for channel, _ in transcript) + 1
+        return {
+            "metadata": {"request_id": uuid.uuid4().hex, "duration": duration, "channels": channels},
+            "results": {"channels": [{} for _ in range(channels)], "utterances": utterances}
+        }
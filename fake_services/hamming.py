@@ -0,0 +1,129 @@
+import datetime, hashlib, io, logging, random, threading, time, uuid, wave
+from typing import Callable, Optional
+import requests
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/fake_hamming_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 8000
+
+def silent_wav(seconds: float, channels: int = 2, seed: int = 0) -> bytes:
+    """
+    Builds an 8 kHz, 8-bit WAV recording of the given length.
+    The samples carry a little seeded noise so recordings of different calls never hash the same.
+
+    Args:
+        seconds (float): Length of the recording.
+        channels (int): Number of channels, one per speaker.
+        seed (int): Seed of the noise.
+
+    Returns:
+        bytes: The WAV file.
+    """
+    frames = max(1, int(seconds * SAMPLE_RATE))
+    noise = random.Random(seed).randbytes(64)
+    samples = bytes(128 + (noise[i % 64] % 3) - 1 for i in range(frames * channels))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(1)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples)
+    return buffer.getvalue()
+
+class FakeHamming:
+    """
+    Stands in for Hamming's start-call and media endpoints.
+
+    Every started call picks the next example transcript, round robin, and a duration from call_seconds.
+    Its recording is unavailable (404) until the duration has passed, then its completion webhook is posted
+    and the media endpoint serves a WAV of that length.
+
+    Attributes:
+        call_seconds (tuple[float, float]): Range the call durations are drawn from, in seconds.
+        transcript_count (int): Number of example transcripts the calls cycle through.
+        on_recording (Optional[Callable[[str, int], None]]): Called with the SHA-256 of each recording and
+            its transcript index, so the fake DeepGram can transcribe it accordingly.
+        seed (int): Seed of the call durations.
+    """
+
+    def __init__(
+        self,
+        call_seconds: tuple[float, float] = (2.0, 5.0),
+        transcript_count: int = 1,
+        on_recording: Optional[Callable[[str, int], None]] = None,
+        seed: int = 0
+    ):
+        self.call_seconds = call_seconds
+        self.transcript_count = max(1, transcript_count)
+        self.on_recording = on_recording
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls: dict[str, dict] = {}
+        self._started = 0
+
+    def start_call(self, payload: dict) -> dict:
+        """
+        Starts a fake call.
+
+        Args:
+            payload (dict): The start-call request body with phone_number, prompt and webhook_url.
+
+        Returns:
+            dict: The response body with the call id.
+        """
+        with self._lock:
+            call_id = uuid.uuid4().hex
+            duration = self._random.uniform(*self.call_seconds)
+            call = {
+                "id": call_id,
+                "transcript_index": self._started % self.transcript_count,
+                "duration": duration,
+                "ready_at": time.monotonic() + duration,
+                "seed": self._started,
+                "recording": None
+            }
+            self._calls[call_id] = call
+            self._started += 1
+        webhook_url = payload.get("webhook_url")
+        # Without a webhook server the start-call URL itself is passed, and only polling is used
+        if webhook_url and not webhook_url.endswith("/start-call"):
+            timer = threading.Timer(duration, self._post_webhook, (webhook_url, call_id))
+            timer.daemon = True
+            timer.start()
+        logger.debug(f"Fake call {call_id} started, lasting {duration:.1f} s")
+        return {"id": call_id, "status": "started"}
+
+    def _post_webhook(self, webhook_url: str, call_id: str):
+        try:
+            requests.post(webhook_url, json={"id": call_id, "status": "completed"}, timeout=5)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Fake webhook for call {call_id} failed: {e}")
+
+    def media(self, call_id: str) -> Optional[bytes]:
+        """
+        Returns the recording of a call once it has ended.
+
+        Args:
+            call_id (str): The call id.
+
+        Returns:
+            Optional[bytes]: The WAV recording, None while the call is running or if it is unknown.
+        """
+        with self._lock:
+            call = self._calls.get(call_id)
+            if call is None or time.monotonic() < call["ready_at"]:
+                return None
+            if call["recording"] is None:
+                call["recording"] = silent_wav(call["duration"], seed=call["seed"])
+                if self.on_recording:
+                    self.on_recording(hashlib.sha256(call["recording"]).hexdigest(), call["transcript_index"])
+            return call["recording"]
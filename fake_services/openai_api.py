@@ -0,0 +1,159 @@
+import datetime, json, logging, re, time, uuid
+from typing import Optional
+from disk_cache import DiskCache
+from llm_cache import LLMResponseCache
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/fake_openai_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+SPEAKER_LINE = re.compile(r"\[(?:Speaker (\d+)|(Callee|Caller))\]\s*([^\n\[]*)")
+
+def _content(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def _json_object(text: str) -> Optional[dict]:
+    start = text.find("{")
+    while start != -1:
+        try:
+            value, _ = json.JSONDecoder().raw_decode(text[start:])
+            if isinstance(value, dict):
+                return value
+        except json.JSONDecodeError:
+            pass
+        start = text.find("{", start + 1)
+    return None
+
+class FakeOpenAI:
+    """
+    Stands in for OpenAI's /v1/chat/completions endpoint with deterministic answers, so the exploration
+    loop can be run without an account:
+
+        prompt creation: a caller prompt naming the frontier nodes of the encoded tree
+        parsing and structured extraction: one question node per business question in the conversation
+            whose label is not in the tree yet, chained by the caller's answers
+        node and edge extraction: tool calls for the nodes or edges in the parsed text
+
+    Requests found in the recordings, an LLM response cache directory, are answered with the recorded response.
+
+    Attributes:
+        latency (dict[str, float]): Seconds every request to a model is delayed by.
+        default_latency (float): Delay of models not in latency.
+        recordings (Optional[DiskCache]): Recorded responses keyed like LLMResponseCache.
+        business_channel (int): Channel of the business agent in conversations not tagged with roles.
+    """
+
+    def __init__(
+        self,
+        latency: Optional[dict[str, float]] = None,
+        default_latency: float = 0.0,
+        recordings: Optional[DiskCache] = None,
+        business_channel: int = 0
+    ):
+        self.latency = dict(latency or {})
+        self.default_latency = default_latency
+        self.recordings = recordings
+        self.business_channel = business_channel
+
+    def _recorded(self, request: dict) -> Optional[dict]:
+        if self.recordings is None or isinstance(request.get("response_format"), dict):
+            return None
+        key = LLMResponseCache.key({name: request[name] for name in ("model", "messages", "tools", "tool_choice") if name in request})
+        entry = self.recordings.get(key)
+        return entry["response"] if entry else None
+
+    def _tree_update(self, text: str) -> dict:
+        conversation, _, tree = text.split("The conversation is", 1)[-1].partition("current decision tree:")
+        known = {label.lower() for label in re.findall(r'"((?:[^"\\]|\\.)*)"', tree)}
+        next_id = int(match.group(1)) if (match := re.search(r"next_id: (\d+)", tree)) else 1
+        nodes, edges = [], []
+        previous_id, answer = None, None
+        for channel, role, utterance in SPEAKER_LINE.findall(conversation):
+            utterance = utterance.strip()
+            business = role == "Callee" if role else int(channel) == self.business_channel
+            if not business:
+                answer = answer or utterance[:60] or None
+                continue
+            if not utterance.endswith("?") or len(utterance.split()) < 3:
+                continue
+            label = utterance.split(". ")[-1]
+            if label.lower() in known:
+                continue
+            known.add(label.lower())
+            node_id = str(next_id)
+            next_id += 1
+            nodes.append({"id": node_id, "label": label, "type": "question"})
+            if previous_id is not None:
+                edges.append({"source_id": previous_id, "target_id": node_id, "condition": answer})
+            previous_id, answer = node_id, None
+        return {"nodes": nodes, "edges": edges}
+
+    def _prompt(self, text: str, variant: str) -> str:
+        frontier = re.findall(r'^\s*\S+ q ("(?:[^"\\]|\\.)*"|\$\d+).*\*$', text, re.MULTILINE)
+        scenarios = "\n".join(f"- Answer {label} differently than before" for label in frontier) or "- Ask about the available services"
+        return f"# Role\nYou are a customer calling the business.\n\n# Scenarios ({variant})\n{scenarios}\n"
+
+    def chat_completion(self, request: dict) -> dict:
+        """
+        Answers a chat completion request, after the model's latency.
+
+        Args:
+            request (dict): The request body.
+
+        Returns:
+            dict: A chat.completion response body.
+        """
+        model = request.get("model", "fake")
+        time.sleep(self.latency.get(model, self.default_latency))
+        recorded = self._recorded(request)
+        if recorded is not None:
+            return recorded
+
+        text = "\n".join(_content(message) for message in request.get("messages", []))
+        message = {"role": "assistant", "content": None}
+        finish_reason = "stop"
+        if request.get("tools"):
+            name = request["tools"][0]["function"]["name"]
+            update = _json_object(text.split("The text is", 1)[-1]) or {}
+            items = update.get("edges" if "Edge" in name else "nodes", [])
+            message["tool_calls"] = [
+                {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function", "function": {"name": name, "arguments": json.dumps(item)}}
+                for item in items
+            ]
+            finish_reason = "tool_calls" if items else "stop"
+            if not items:
+                message["content"] = "Nothing to extract."
+        elif "<prompt requirements>" in text:
+            variant = re.search(r"This is prompt (\d+) of (\d+)", text)
+            message["content"] = self._prompt(text, f"{variant.group(1)}/{variant.group(2)}" if variant else "1/1")
+        else:
+            message["content"] = json.dumps(self._tree_update(text))
+
+        completion_text = message["content"] or json.dumps(message.get("tool_calls"))
+        prompt_tokens, completion_tokens = _tokens(text), _tokens(completion_text)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "completion_tokens_details": {"reasoning_tokens": 0}
+            }
+        }
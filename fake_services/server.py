@@ -0,0 +1,167 @@
+import datetime, json, logging, os, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+from fake_services.hamming import FakeHamming
+from fake_services.deepgram import FakeDeepgram, load_transcripts
+from fake_services.openai_api import FakeOpenAI
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/fake_services_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+class _FakeServicesHandler(BaseHTTPRequestHandler):
+    """Routes /hamming/..., /deepgram/... and /openai/... requests to the fakes of the owning FakeServices."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            return self.rfile.read(length)
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        return b""
+
+    def _send(self, status: int, body: bytes = b"", content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict):
+        self._send(status, json.dumps(payload).encode("utf-8"))
+
+    def do_GET(self):
+        services = self.server.services
+        url = urlsplit(self.path)
+        if url.path == "/hamming/api/media/exercise":
+            call_id = parse_qs(url.query).get("id", [""])[0]
+            recording = services.hamming.media(call_id)
+            if recording is None:
+                self._send_json(404, {"error": "Recording not available"})
+            else:
+                self._send(200, recording, "audio/wav")
+        else:
+            self._send_json(404, {"error": f"Unknown path {url.path}"})
+
+    def do_POST(self):
+        services = self.server.services
+        path = urlsplit(self.path).path
+        body = self._body()
+        try:
+            if path == "/hamming/api/rest/exercise/start-call":
+                self._send_json(200, services.hamming.start_call(json.loads(body)))
+            elif path == "/deepgram/v1/listen":
+                self._send_json(200, services.deepgram.listen(body))
+            elif path == "/openai/v1/chat/completions":
+                self._send_json(200, services.openai.chat_completion(json.loads(body)))
+            else:
+                self._send_json(404, {"error": f"Unknown path {path}"})
+        except Exception as e:
+            logger.error(f"Fake service error on {path}: {e}", exc_info=True)
+            self._send_json(500, {"error": str(e)})
+
+    def log_message(self, format: str, *args):
+        logger.debug(f"Fake services request: {format % args}")
+
+class FakeServices:
+    """
+    Local stand-ins for the Hamming, DeepGram and OpenAI APIs behind one HTTP server, so the exploration
+    loop can be run and benchmarked without accounts. Point the clients at them with env():
+
+        HAMMING_BASE_URL, DEEPGRAM_BASE_URL and OPENAI_BASE_URL
+
+    Attributes:
+        hamming (FakeHamming): The fake Hamming API.
+        deepgram (FakeDeepgram): The fake DeepGram API.
+        openai (FakeOpenAI): The fake OpenAI API.
+        host (str): Interface the server listens on.
+        port (int): Port the server listens on, 0 picks a free port.
+    """
+
+    def __init__(
+        self,
+        hamming: Optional[FakeHamming] = None,
+        deepgram: Optional[FakeDeepgram] = None,
+        openai: Optional[FakeOpenAI] = None,
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        self.deepgram = deepgram or FakeDeepgram(load_transcripts(EXAMPLES_DIR))
+        self.hamming = hamming or FakeHamming(transcript_count=len(self.deepgram.transcripts))
+        if self.hamming.on_recording is None:
+            self.hamming.on_recording = self.deepgram.register_recording
+        self.openai = openai or FakeOpenAI()
+        self.host = host
+        self.port = port
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """The server's base URL."""
+        return f"http://{self.host}:{self.port}"
+
+    def env(self) -> dict[str, str]:
+        """
+        Returns the environment variables pointing the API clients at the fakes.
+
+        Returns:
+            dict[str, str]: HAMMING_BASE_URL, DEEPGRAM_BASE_URL and OPENAI_BASE_URL.
+        """
+        return {
+            "HAMMING_BASE_URL": f"{self.base_url}/hamming",
+            "DEEPGRAM_BASE_URL": f"{self.base_url}/deepgram",
+            "OPENAI_BASE_URL": f"{self.base_url}/openai/v1",
+        }
+
+    def start(self) -> "FakeServices":
+        """
+        Starts serving in a background thread.
+
+        Returns:
+            FakeServices: The services themselves, for chaining.
+        """
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _FakeServicesHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.services = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        logger.info(f"Fake services listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        """Stops the server and its background thread."""
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+            logger.info("Fake services stopped.")
+
+if __name__ == "__main__":
+    services = FakeServices(port=int(os.environ.get("FAKE_SERVICES_PORT", "8790"))).start()
+    for name, value in services.env().items():
+        print(f"{name}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        services.stop()
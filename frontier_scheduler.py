@@ -0,0 +1,235 @@
+import datetime, heapq, logging, math
+from typing import Optional
+from pydantic import BaseModel
+from DecisionTree import DecisionTree
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/frontier_scheduler_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+def wilson_upper_bound(successes: int, trials: int, z: float) -> float:
+    """
+    Returns the upper end of the Wilson score interval of a success rate.
+
+    Args:
+        successes (int): Number of successes.
+        trials (int): Number of trials, at least 1.
+        z (float): Standard normal quantile of the confidence level, e.g. 1.28 for 90% one-sided.
+
+    Returns:
+        float: The upper bound of the success rate.
+    """
+    p = successes / trials
+    z2 = z * z
+    center = p + z2 / (2 * trials)
+    margin = z * math.sqrt(p * (1 - p) / trials + z2 / (4 * trials * trials))
+    return (center + margin) / (1 + z2 / trials)
+
+class ExplorationGoal(BaseModel):
+    """Model representing the decision node one call is sent to explore."""
+    node_id: str
+    label: str
+    depth: int
+    score: float
+    path: list[str]
+    explored_conditions: list[Optional[str]]
+
+    def describe(self) -> str:
+        """Renders the goal as an instruction for the caller prompt."""
+        route = " -> ".join(f'"{label}"' for label in self.path)
+        explored = ", ".join(f'"{condition}"' for condition in self.explored_conditions if condition)
+        text = f'Get the agent to ask "{self.label}"'
+        if route:
+            text += f" (it comes after {route})"
+        text += " and answer it in a way that leads somewhere new."
+        if explored:
+            text += f" Answers already explored: {explored}."
+        return text
+
+class FrontierScheduler:
+    """
+    Chooses the decision node each call explores, and decides when exploring further is no longer worth it.
+
+    Question nodes with fewer than min_branches explored branches, or that were targeted fewer than
+    target_samples times, are kept in a priority queue. They are scored by the expected number of new branches
+    a call aimed at them finds: the node's smoothed yield times one more than its missing branches. The score is
+    discounted by depth, because deep nodes take a longer conversation to reach. Scores are recomputed when
+    a node is popped, and a node that went stale goes back into the queue with its current score.
+
+    Every parsed call records its yield, the number of new nodes it found. Exploration has converged once
+    the upper confidence bound of the share of recent calls that found anything drops below min_yield_rate,
+    instead of after the first call that found nothing. Calls that fail before they are parsed record no yield,
+    so a run whose calls keep failing, e.g. on a bad API key or an unreachable number, stops once
+    max_consecutive_failures calls in a row were not parsed.
+
+    Attributes:
+        tree (DecisionTree): The tree being explored.
+        min_branches (int): Branches a question node needs to no longer be unexplored.
+        target_samples (int): Calls a question node gets before only its unexplored branches keep it queued.
+        depth_weight (float): How strongly deeper nodes are discounted.
+        window (int): Number of most recent calls convergence is judged on.
+        min_calls (int): Calls needed in the window before exploration can converge.
+        min_yield_rate (float): Share of calls finding something new below which exploration has converged.
+        z (float): Standard normal quantile of the confidence of the convergence test.
+        max_consecutive_failures (int): Calls in a row that were not parsed after which exploration gives up.
+        yields (list[int]): New nodes found by every recorded call, in order.
+        consecutive_failures (int): Calls not parsed since the last parsed one.
+    """
+
+    def __init__(
+        self,
+        tree: DecisionTree,
+        min_branches: int = 2,
+        target_samples: int = 2,
+        depth_weight: float = 0.25,
+        window: int = 8,
+        min_calls: int = 4,
+        min_yield_rate: float = 0.3,
+        z: float = 1.28,
+        max_consecutive_failures: int = 5
+    ):
+        self.tree = tree
+        self.min_branches = min_branches
+        self.target_samples = target_samples
+        self.depth_weight = depth_weight
+        self.window = window
+        self.min_calls = min_calls
+        self.min_yield_rate = min_yield_rate
+        self.z = z
+        self.max_consecutive_failures = max_consecutive_failures
+        self.yields: list[int] = []
+        self.consecutive_failures = 0
+        self._samples: dict[str, int] = {}
+        self._successes: dict[str, int] = {}
+        self._heap: list[tuple[float, int, str]] = []
+        self._pushes = 0
+        self._synced_nodes = 0
+
+    def _score(self, node_id: str) -> float:
+        if self.tree.get_node_type(node_id) != "question":
+            return 0.0
+        samples = self._samples.get(node_id, 0)
+        missing = max(0, self.min_branches - len(self.tree.get_children(node_id)))
+        if not missing and samples >= self.target_samples:
+            return 0.0
+        # Laplace-smoothed chance that a call aimed at the node finds something new
+        expected_yield = (self._successes.get(node_id, 0) + 1) / (samples + 2)
+        depth = self.tree.layout.levels.get(node_id, 0)
+        return expected_yield * (missing + 1) / (1 + self.depth_weight * depth)
+
+    def _push(self, node_id: str):
+        score = self._score(node_id)
+        if score > 0:
+            self._pushes += 1
+            heapq.heappush(self._heap, (-score, self._pushes, node_id))
+
+    def _sync(self):
+        # Nodes added to the tree since the last call join the queue
+        for node in self.tree.nodes[self._synced_nodes:]:
+            self._push(node.id)
+        self._synced_nodes = len(self.tree.nodes)
+
+    def _path(self, node_id: str, max_length: int = 6) -> list[str]:
+        labels, seen = [], {node_id}
+        parents = self.tree.get_parents(node_id)
+        while parents and len(labels) < max_length and parents[0] not in seen:
+            parent = parents[0]
+            seen.add(parent)
+            labels.append(self.tree.get_node(parent).label)
+            parents = self.tree.get_parents(parent)
+        return labels[::-1]
+
+    def next_goal(self) -> Optional[ExplorationGoal]:
+        """
+        Picks the most promising decision node for the next call and counts the call against it, so calls
+        placed at the same time are spread over different nodes.
+
+        Returns:
+            Optional[ExplorationGoal]: The goal, or None if no decision node is worth a targeted call.
+        """
+        self._sync()
+        while self._heap:
+            negative_score, _, node_id = heapq.heappop(self._heap)
+            score = self._score(node_id)
+            if score <= 0:
+                continue
+            if not math.isclose(score, -negative_score):
+                self._push(node_id)
+                continue
+            self._samples[node_id] = self._samples.get(node_id, 0) + 1
+            self._push(node_id)
+            goal = ExplorationGoal(
+                node_id=node_id,
+                label=self.tree.get_node(node_id).label,
+                depth=self.tree.layout.levels.get(node_id, 0),
+                score=score,
+                path=self._path(node_id),
+                explored_conditions=self.tree.get_edge_conditions(node_id)
+            )
+            logger.info(f"Next call explores node {node_id} '{goal.label}' (score {score:.3f})")
+            return goal
+        logger.info("No decision node left to target, the call explores freely")
+        return None
+
+    def release(self, goal: Optional[ExplorationGoal], failed: bool = True):
+        """
+        Gives back the sample next_goal counted for a call that never got parsed, e.g. because its prompt
+        generation, the call or its transcription failed, so failures do not use up a node's target_samples.
+
+        Args:
+            goal (Optional[ExplorationGoal]): The goal the call was given, None for an untargeted call.
+            failed (bool): Whether the call failed and counts towards max_consecutive_failures,
+                False for a call that was skipped because exploration is stopping.
+        """
+        if failed:
+            self.consecutive_failures += 1
+        if goal is None or not self._samples.get(goal.node_id):
+            return
+        self._samples[goal.node_id] -= 1
+        self._push(goal.node_id)
+        logger.info(f"Call aimed at node {goal.node_id} was not parsed, its sample is released")
+
+    def record(self, goal: Optional[ExplorationGoal], new_nodes: int):
+        """
+        Records what a parsed call found.
+
+        Args:
+            goal (Optional[ExplorationGoal]): The goal the call was given, None for an untargeted call.
+            new_nodes (int): Number of nodes the call added to the tree.
+        """
+        self.yields.append(new_nodes)
+        self.consecutive_failures = 0
+        if goal is not None and new_nodes > 0:
+            self._successes[goal.node_id] = self._successes.get(goal.node_id, 0) + 1
+            self._push(goal.node_id)
+        logger.info(f"Call yielded {new_nodes} new nodes, recent yield rate bound {self.yield_rate_bound():.2f}")
+
+    def yield_rate_bound(self) -> float:
+        """Returns the upper confidence bound of the share of recent calls that found new nodes, 1 without calls."""
+        recent = self.yields[-self.window:]
+        if not recent:
+            return 1.0
+        return wilson_upper_bound(sum(1 for found in recent if found > 0), len(recent), self.z)
+
+    def converged(self) -> bool:
+        """
+        Returns whether further calls are unlikely to find anything new.
+
+        Returns:
+            bool: True once at least min_calls calls were recorded and the upper confidence bound of the share
+            of the last window calls that found new nodes is below min_yield_rate.
+        """
+        if len(self.yields[-self.window:]) < self.min_calls:
+            return False
+        return self.yield_rate_bound() < self.min_yield_rate
+
+    def failing(self) -> bool:
+        """Returns whether the last max_consecutive_failures calls all failed before they were parsed."""
+        return self.consecutive_failures >= self.max_consecutive_failures
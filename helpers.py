@@ -1,6 +1,16 @@
-import logging, requests, json, time, os, datetime
-from typing import Optional
-from openai import OpenAI
+import logging, requests, json, time, os, datetime, asyncio, hashlib, itertools, threading
+from urllib.parse import urlencode
+from typing import Optional, Iterable, Iterator
+from llm_clients import llm_clients
+from llm_cache import get_llm_cache, LLMCacheMiss
+from webhook_server import CallWebhookServer
+from polling import PollingPolicy, parse_retry_after
+from disk_cache import DiskCache
+from http_sessions import http_sessions
+from transcript import Transcript, CallResult, TranscriptArchive
+from tree_encoding import encode_tree, ENCODING_LEGEND
+from telemetry import get_telemetry, http_retries, DEEPGRAM_PRICE_PER_MINUTE
+from audio_preprocessing import AudioPreprocessor, detect_audio_format, detect_file_format
 
 # Configure logging
 logging.basicConfig(
@@ -13,7 +23,43 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def agent_call(api_token: str, number_to_call: str, prompt: str) -> Optional[requests.Response]:
+DEEPGRAM_OPTIONS = {
+    "multichannel": "true",
+    "punctuate": "true",
+    "utterances": "true",
+    "model": "nova-2",
+    "smart_format": "true"
+}
+
+def hamming_base_url() -> str:
+    """Returns the Hamming API root, HAMMING_BASE_URL if set so the pipeline can run against fake_services."""
+    return os.environ.get("HAMMING_BASE_URL", "https://app.hamming.ai").rstrip("/")
+
+def deepgram_base_url() -> str:
+    """Returns the DeepGram API root, DEEPGRAM_BASE_URL if set. The OpenAI SDK reads OPENAI_BASE_URL itself."""
+    return os.environ.get("DEEPGRAM_BASE_URL", "https://api.deepgram.com").rstrip("/")
+
+_transcription_cache: Optional[DiskCache] = None
+_transcription_cache_lock = threading.Lock()
+
+def get_transcription_cache() -> DiskCache:
+    """
+    Returns the shared cache of DeepGram responses, created on first use from TRANSCRIPTION_CACHE_DIR
+    and TRANSCRIPTION_CACHE_MAX_BYTES, so the values loaded by load_dotenv in main.py are seen.
+
+    Returns:
+        DiskCache: The shared cache.
+    """
+    global _transcription_cache
+    with _transcription_cache_lock:
+        if _transcription_cache is None:
+            _transcription_cache = DiskCache(
+                os.environ.get("TRANSCRIPTION_CACHE_DIR", ".cache/transcriptions"),
+                max_bytes=int(os.environ.get("TRANSCRIPTION_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+            )
+        return _transcription_cache
+
+def agent_call(api_token: str, number_to_call: str, prompt: str, webhook_url: Optional[str] = None) -> Optional[requests.Response]:
     """
     Initiates a call using the Hamming API.
 
@@ -21,11 +67,12 @@ def agent_call(api_token: str, number_to_call: str, prompt: str) -> Optional[req
         api_token (str): Bearer token for authorization.
         number_to_call (str): The phone number to call.
         prompt (str): The prompt to be used in the call.
+        webhook_url (Optional[str]): URL Hamming notifies when the call completes.
 
     Returns:
         Optional[requests.Response]: The response from the API call if successful, else None.
     """
-    url = "https://app.hamming.ai/api/rest/exercise/start-call"
+    url = f"{hamming_base_url()}/api/rest/exercise/start-call"
     headers = {
         "Authorization": f"Bearer {api_token}",
         "Content-Type": "application/json"
@@ -33,13 +80,18 @@ def agent_call(api_token: str, number_to_call: str, prompt: str) -> Optional[req
     data = {
         "phone_number": number_to_call,
         "prompt": prompt,
-        "webhook_url": url  # This might need to be another endpoint
+        "webhook_url": webhook_url or url  # Without a webhook server the completion is only found by polling
     }
 
     logger.debug(f"Initiating call to {number_to_call}")
     print(f"Initiating call to {number_to_call}")
     try:
-        response = requests.post(url, headers=headers, json=data)
+        started = time.monotonic()
+        response = http_sessions.session("hamming").post(url, headers=headers, json=data)
+        get_telemetry().record(
+            "hamming", "start_call", time.monotonic() - started, status=response.status_code,
+            retries=http_retries(response), bytes_sent=len(response.request.body or b""), bytes_received=len(response.content)
+        )
         response.raise_for_status()
         logger.info(f"Call started successfully: {response.json()}")
         print(f"Call started successfully: {response.json()}")
@@ -52,44 +104,137 @@ def agent_call(api_token: str, number_to_call: str, prompt: str) -> Optional[req
         logger.error(f"An unexpected error occurred while starting call: {err}")
     return None
 
-def retrieve_audio(api_token: str, call_id: str) -> Optional[requests.Response]:
+AUDIO_CHUNK_SIZE = 64 * 1024
+
+def open_audio_stream(api_token: str, call_id: str) -> Optional[requests.Response]:
     """
-    Retrieves the audio recording of a call using the Hamming API.
+    Requests the audio recording of a call using the Hamming API without downloading the body yet.
 
     Parameters:
         api_token (str): Bearer token for authorization.
         call_id (str): The unique identifier of the call.
 
     Returns:
-        Optional[requests.Response]: The response containing audio content if successful, else None.
+        Optional[requests.Response]: The open streaming response if the recording is available,
+        the throttled response on 429/503 so its Retry-After can be honoured, else None.
+        The caller must close the response.
     """
-    url = f"https://app.hamming.ai/api/media/exercise?id={call_id}"
+    url = f"{hamming_base_url()}/api/media/exercise?id={call_id}"
     headers = {
         "Authorization": f"Bearer {api_token}"
     }
 
     logger.info(f"Retrieving audio for call ID: {call_id}")
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        with open("call_recording.wav", "wb") as audio_file:
-            audio_file.write(response.content)
-        logger.info("Audio file downloaded successfully as 'call_recording.wav'")
+        started = time.monotonic()
+        response = http_sessions.session("hamming").get(url, headers=headers, stream=True)
+        get_telemetry().record("hamming", "poll_audio", time.monotonic() - started, status=response.status_code, retries=http_retries(response))
+        if response.status_code in (429, 503):
+            logger.warning(f"Audio retrieval throttled with status {response.status_code}, "
+                           f"Retry-After: {response.headers.get('Retry-After')}")
+            response.close()
+            return response
+        if not response.ok:
+            logger.error(f"HTTP error occurred while retrieving audio: {response.status_code} - Response: {response.text[:500]}")
+            response.close()
+            return None
         return response
-    except requests.exceptions.HTTPError as http_err:
-        logger.error(f"HTTP error occurred while retrieving audio: {http_err} - Response: {response.text}")
     except requests.exceptions.RequestException as req_err:
         logger.error(f"Request exception occurred while retrieving audio: {req_err}")
     except Exception as err:
         logger.error(f"An unexpected error occurred while retrieving audio: {err}")
     return None
 
+def tee_audio_chunks(response: requests.Response, output_path: str, chunk_size: int = AUDIO_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yields the body of a streaming audio response chunk by chunk while writing it to output_path,
+    so the recording can be saved and uploaded without ever being held in memory as a whole.
+
+    Parameters:
+        response (requests.Response): An open streaming response from open_audio_stream.
+        output_path (str): Where to save the recording.
+        chunk_size (int): Number of bytes read per chunk.
+
+    Yields:
+        bytes: The next chunk of the recording.
+    """
+    size = 0
+    started = time.monotonic()
+    try:
+        with open(output_path, "wb") as audio_file:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if not chunk:
+                    continue
+                audio_file.write(chunk)
+                size += len(chunk)
+                yield chunk
+        logger.info(f"Audio file downloaded successfully as '{output_path}' ({size} bytes)")
+    finally:
+        get_telemetry().record("hamming", "download_audio", time.monotonic() - started, bytes_received=size)
+        response.close()
+
+def retrieve_audio(api_token: str, call_id: str, output_path: str = "call_recording.wav") -> Optional[requests.Response]:
+    """
+    Retrieves the audio recording of a call using the Hamming API, streaming it to disk in chunks.
+
+    Parameters:
+        api_token (str): Bearer token for authorization.
+        call_id (str): The unique identifier of the call.
+        output_path (str): Where to save the recording.
+
+    Returns:
+        Optional[requests.Response]: The (consumed) response if successful,
+        the throttled response on 429/503 so its Retry-After can be honoured, else None.
+    """
+    response = open_audio_stream(api_token, call_id)
+    if response is None or response.status_code != 200:
+        return response
+    try:
+        for _ in tee_audio_chunks(response, output_path):
+            pass
+        return response
+    except requests.exceptions.RequestException as req_err:
+        logger.error(f"Request exception occurred while downloading audio: {req_err}")
+    except Exception as err:
+        logger.error(f"An unexpected error occurred while downloading audio: {err}")
+    return None
+
+def transcription_cache_key(audio_sha256: str, options: dict) -> str:
+    """
+    Builds the transcription cache key from the hash of the audio bytes and the DeepGram query options.
+
+    Parameters:
+        audio_sha256 (str): Hex SHA-256 of the audio bytes.
+        options (dict): DeepGram query options.
+
+    Returns:
+        str: The cache key.
+    """
+    canonical_options = json.dumps(options, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{audio_sha256}:{canonical_options}".encode("utf-8")).hexdigest()
+
+def _hash_file(path: str, chunk_size: int = AUDIO_CHUNK_SIZE) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def _hash_chunks(chunks: Iterable[bytes], hasher) -> Iterator[bytes]:
+    for chunk in chunks:
+        hasher.update(chunk)
+        yield chunk
+
 def transcribe_audio(
     api_key: str,
     audio_file_path: str,
     save_as_txt: bool = True,
     save_as_json: bool = True,
-    save_as_json_no_words: bool = True
+    save_as_json_no_words: bool = True,
+    output_dir: str = ".",
+    audio_stream: Optional[Iterable[bytes]] = None,
+    cache: Optional[DiskCache] = None,
+    content_type: Optional[str] = None
 ) -> Optional[dict]:
     """
     Transcribes audio using the DeepGram API and saves the results in various formats.
@@ -100,55 +245,98 @@ def transcribe_audio(
         save_as_txt (bool): Whether to save the transcription as a text file.
         save_as_json (bool): Whether to save the entire transcription as a JSON file.
         save_as_json_no_words (bool): Whether to save the transcription sans 'words' key as a JSON file.
+        output_dir (str): Directory the transcription files are written to, one per call when calls run concurrently.
+        audio_stream (Optional[Iterable[bytes]]): Chunks to upload instead of reading audio_file_path,
+            e.g. tee_audio_chunks so the download goes straight into the request body.
+        cache (Optional[DiskCache]): Cache of DeepGram responses keyed by audio content and options,
+            get_transcription_cache() by default.
+            A file that was transcribed before is answered without any network I/O.
+            Streamed audio cannot be looked up before it is uploaded, but its response is stored.
+        content_type (Optional[str]): Content-Type of the audio, detected from its first bytes by default.
 
     Returns:
         Optional[dict]: JSON response from DeepGram if successful, else None.
     """
-    url = (
-        "https://api.deepgram.com/v1/listen?"
-        "multichannel=true&punctuate=true&utterances=true&"
-        "model=nova-2&smart_format=true"
-    )
+    url = f"{deepgram_base_url()}/v1/listen?" + urlencode(DEEPGRAM_OPTIONS)
+    cache = cache if cache is not None else get_transcription_cache()
+    if content_type is None:
+        if audio_stream is not None:
+            audio_stream = iter(audio_stream)
+            first_chunk = next(audio_stream, b"")
+            content_type = detect_audio_format(first_chunk)[1]
+            audio_stream = itertools.chain([first_chunk], audio_stream)
+        else:
+            content_type = detect_file_format(audio_file_path)[1]
     headers = {
         "Authorization": f"Token {api_key}",
-        "Content-Type": "audio/mp3"
+        "Content-Type": content_type
     }
 
     logger.info(f"Starting transcription for file: {audio_file_path}")
     try:
-        with open(audio_file_path, "rb") as audio_file:
-            response = requests.post(url, headers=headers, data=audio_file)
-        response.raise_for_status()
-        data = response.json()
+        data = None
+        cache_key = None
+        if cache is not None and audio_stream is None:
+            cache_key = transcription_cache_key(_hash_file(audio_file_path), DEEPGRAM_OPTIONS)
+            data = cache.get(cache_key)
+            if data is not None:
+                logger.info(f"Transcription for {audio_file_path} served from cache")
+                get_telemetry().record("deepgram", "transcribe", cached=True, audio_seconds=data.get("metadata", {}).get("duration") or 0.0)
+
+        if data is None:
+            started = time.monotonic()
+            if audio_stream is not None:
+                hasher = hashlib.sha256()
+                response = http_sessions.session("deepgram").post(url, headers=headers, data=_hash_chunks(audio_stream, hasher))
+            else:
+                with open(audio_file_path, "rb") as audio_file:
+                    response = http_sessions.session("deepgram").post(url, headers=headers, data=audio_file)
+            data = response.json() if response.ok else None
+            audio_seconds = (data or {}).get("metadata", {}).get("duration") or 0.0
+            get_telemetry().record(
+                "deepgram", "transcribe", time.monotonic() - started, status=response.status_code,
+                retries=http_retries(response), audio_seconds=audio_seconds,
+                bytes_sent=os.path.getsize(audio_file_path) if os.path.exists(audio_file_path) else 0,
+                bytes_received=len(response.content), dollars=audio_seconds / 60 * DEEPGRAM_PRICE_PER_MINUTE
+            )
+            response.raise_for_status()
+            if cache is not None:
+                if cache_key is None:
+                    cache_key = transcription_cache_key(hasher.hexdigest(), DEEPGRAM_OPTIONS)
+                cache.set(cache_key, data)
         utterances = data.get("results", {}).get("utterances", [])
 
         if save_as_txt:
             timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-            with open(f"logs/transcription_output_{timestamp}.txt", "w") as txt_file:
+            suffix = "" if output_dir == "." else f"_{os.path.basename(os.path.abspath(output_dir))}"
+            with open(f"logs/transcription_output_{timestamp}{suffix}.txt", "w") as txt_file:
                 for utterance in utterances:
                     channel = utterance.get("channel", "Unknown")
                     transcript = utterance.get("transcript", "")
                     txt_file.write(f"[Speaker {channel}] {transcript}\n")
-            with open(f"transcription_output.txt", "w") as txt_file:
+            txt_path = os.path.join(output_dir, "transcription_output.txt")
+            with open(txt_path, "w") as txt_file:
                 for utterance in utterances:
                     channel = utterance.get("channel", "Unknown")
                     transcript = utterance.get("transcript", "")
                     txt_file.write(f"[Speaker {channel}] {transcript}\n")
-            logger.info("Transcription with speaker diarization saved to 'transcription_output.txt'")
+            logger.info(f"Transcription with speaker diarization saved to '{txt_path}'")
 
         if save_as_json:
-            with open("transcription_output.json", "w") as json_file:
+            json_path = os.path.join(output_dir, "transcription_output.json")
+            with open(json_path, "w") as json_file:
                 json.dump(utterances, json_file, indent=4)
-            logger.info("Transcription data saved to 'transcription_output.json'")
+            logger.info(f"Transcription data saved to '{json_path}'")
 
         if save_as_json_no_words:
             utterances_without_words = [
                 {key: value for key, value in utterance.items() if key != "words"}
                 for utterance in utterances
             ]
-            with open("transcription_output_no_words.json", "w") as json_no_words_file:
+            json_no_words_path = os.path.join(output_dir, "transcription_output_no_words.json")
+            with open(json_no_words_path, "w") as json_no_words_file:
                 json.dump(utterances_without_words, json_no_words_file, indent=4)
-            logger.info("Transcription data without 'words' saved to 'transcription_output_no_words.json'")
+            logger.info(f"Transcription data without 'words' saved to '{json_no_words_path}'")
 
         print("transcription successful")
         return data
@@ -164,12 +352,233 @@ def transcribe_audio(
         logger.error(f"An unexpected error occurred during transcription: {err}")
     return None
 
+async def _wait_for_completion(
+    webhook_server: Optional[CallWebhookServer],
+    token: Optional[str],
+    timeout: float,
+    completed: bool = False
+) -> bool:
+    """
+    Sleeps for up to timeout seconds, returning early when the call's completion webhook arrives.
+    Once the webhook has been seen this is a plain sleep, so the polling fallback keeps its cadence.
+
+    Parameters:
+        webhook_server (Optional[CallWebhookServer]): The webhook server, None to only sleep.
+        token (Optional[str]): The call's webhook token.
+        timeout (float): Maximum number of seconds to wait.
+        completed (bool): Whether the webhook was already received.
+
+    Returns:
+        bool: Whether the call's completion webhook has been received.
+    """
+    if webhook_server is None or completed:
+        await asyncio.sleep(timeout)
+        return completed
+    payload = await webhook_server.wait(token, timeout)
+    if payload is not None:
+        logger.info(f"Completion webhook received: {payload}")
+        return True
+    return False
+
+async def place_call_and_wait_for_audio(
+    hamming_api_key: str,
+    number_to_call: str,
+    initial_prompt: str,
+    output_dir: str = ".",
+    webhook_server: Optional[CallWebhookServer] = None,
+    polling_policy: Optional[PollingPolicy] = None,
+    stream_to_transcription: bool = True
+) -> Optional[tuple[CallResult, requests.Response]]:
+    """
+    Places a call via Hamming and waits until its recording is available.
+
+    Parameters:
+        hamming_api_key (str): Hamming API key.
+        number_to_call (str): The phone number to call.
+        initial_prompt (str): The initial prompt for the call.
+        output_dir (str): Directory for this call's recording.
+        webhook_server (Optional[CallWebhookServer]): Server whose webhook ends the wait as soon as
+            the call completes. Polling stays on as the fallback.
+        polling_policy (Optional[PollingPolicy]): Delays and deadline for polling the recording.
+            When the deadline passes the call is given up and its concurrency slot freed.
+        stream_to_transcription (bool): Whether to leave the recording undownloaded, so that
+            transcribe_call_audio can upload it to DeepGram while it downloads.
+
+    Returns:
+        Optional[tuple[CallResult, requests.Response]]: The call, not yet transcribed, and the open streaming
+        response if stream_to_transcription, else the consumed response after the recording was saved
+        to output_dir. None if the call failed.
+    """
+    policy = polling_policy or PollingPolicy()
+    logger.debug(f"place_call_and_wait_for_audio - Parameters: hamming_api_key=<hidden>, "
+                 f"number_to_call={number_to_call}, initial_prompt=<hidden>, output_dir={output_dir}")
+
+    token, webhook_url = webhook_server.register() if webhook_server else (None, None)
+    try:
+        response = await asyncio.to_thread(agent_call, hamming_api_key, number_to_call, initial_prompt, webhook_url)
+        if not response:
+            logger.error("Failed to initiate call. Aborting transcription process.")
+            return None
+
+        call_id = response.json().get("id")
+        if not call_id:
+            logger.error("Call ID not found in response. Aborting transcription process.")
+            return None
+
+        call = CallResult(
+            call_id=str(call_id), prompt=initial_prompt, output_dir=output_dir, placed_at=time.time(), number=number_to_call
+        )
+        audio_path = os.path.join(output_dir, "call_recording.wav")
+        logger.info(f"Call initiated with ID: {call_id}. Waiting for audio to become available...")
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(policy.deadline):
+                completed = await _wait_for_completion(webhook_server, token, policy.initial_delay())
+                attempt = 0
+                retry_after = None
+                while True:
+                    if attempt > 0 or not completed:
+                        delay = policy.next_delay(attempt, retry_after)
+                        completed = await _wait_for_completion(webhook_server, token, delay, completed)
+                    logger.info(f"Checking if audio is available for call {call_id}...")
+                    print(f"Checking if audio is available for call {call_id}...")
+                    if stream_to_transcription:
+                        response = await asyncio.to_thread(open_audio_stream, hamming_api_key, call_id)
+                    else:
+                        response = await asyncio.to_thread(retrieve_audio, hamming_api_key, call_id, audio_path)
+                    if response and response.status_code == 200:
+                        logger.info("Audio is now available for transcription.")
+                        print("Audio is now available for transcription.")
+                        break
+                    logger.info("Audio not yet available. Continuing to wait...")
+                    print("Audio not yet available. Continuing to wait...")
+                    retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+                    attempt += 1
+        except TimeoutError:
+            logger.error(f"Audio for call {call_id} not available within {policy.deadline} s. Aborting transcription process.")
+            return None
+        policy.record_duration(time.monotonic() - started)
+        call.audio_available_at = time.time()
+        return call, response
+    finally:
+        if webhook_server:
+            webhook_server.unregister(token)
+
+async def transcribe_call_audio(
+    deepgram_api_key: str,
+    call: CallResult,
+    response: requests.Response,
+    stream_to_transcription: bool = True,
+    archive: Optional[TranscriptArchive] = None,
+    preprocessor: Optional[AudioPreprocessor] = None
+) -> Optional[CallResult]:
+    """
+    Transcribes a call's recording, uploading it while it downloads if the response is still open.
+
+    Parameters:
+        deepgram_api_key (str): DeepGram API key.
+        call (CallResult): The call returned by place_call_and_wait_for_audio.
+        response (requests.Response): The response returned by place_call_and_wait_for_audio.
+        stream_to_transcription (bool): Whether the response is still open and should be teed into the upload,
+            as opposed to already saved in the call's output directory.
+        archive (Optional[TranscriptArchive]): Sink the transcript is written to in the background.
+        preprocessor (Optional[AudioPreprocessor]): Trims and compresses the recording before it is uploaded.
+            Silence can only be found in the whole recording, so it is downloaded before it is uploaded.
+            The transcript's times are mapped back to the original recording.
+
+    Returns:
+        Optional[CallResult]: The call with its transcript if successful, else None.
+    """
+    audio_path = os.path.join(call.output_dir, "call_recording.wav")
+    processed = None
+    try:
+        if preprocessor:
+            if stream_to_transcription:
+                def download():
+                    for _ in tee_audio_chunks(response, audio_path):
+                        pass
+                await asyncio.to_thread(download)
+                stream_to_transcription = False
+            processed = await asyncio.to_thread(preprocessor.process, audio_path)
+        transcription = await asyncio.to_thread(
+            transcribe_audio, deepgram_api_key, processed.path if processed else audio_path,
+            save_as_txt=False, save_as_json=False, save_as_json_no_words=False, output_dir=call.output_dir,
+            audio_stream=tee_audio_chunks(response, audio_path) if stream_to_transcription else None,
+            content_type=processed.content_type if processed else None
+        )
+    finally:
+        response.close()
+    if transcription and processed:
+        processed.remap(transcription)
+    duration = (transcription or {}).get("metadata", {}).get("duration")
+    get_telemetry().record("hamming", "call", call.wait_seconds or 0.0, audio_seconds=duration or call.wait_seconds or 0.0)
+    if not transcription:
+        logger.error("Transcription failed.")
+        return None
+    logger.info("Transcription completed successfully.")
+    print("Transcription completed successfully.")
+    call.transcript = Transcript.from_deepgram(transcription)
+    call.transcribed_at = time.time()
+    if archive:
+        archive.save_call(call)
+    return call
+
+async def call_hamming_and_transcribe_async(
+    hamming_api_key: str,
+    deepgram_api_key: str,
+    number_to_call: str,
+    initial_prompt: str,
+    output_dir: str = ".",
+    webhook_server: Optional[CallWebhookServer] = None,
+    polling_policy: Optional[PollingPolicy] = None,
+    stream_to_transcription: bool = True,
+    archive: Optional[TranscriptArchive] = None,
+    preprocessor: Optional[AudioPreprocessor] = None
+) -> Optional[CallResult]:
+    """
+    Coroutine version of call_hamming_and_transcribe, so several calls can be waited on at once.
+    The blocking HTTP helpers run in worker threads and the waits do not hold the event loop.
+
+    Parameters:
+        hamming_api_key (str): Hamming API key.
+        deepgram_api_key (str): DeepGram API key.
+        number_to_call (str): The phone number to call.
+        initial_prompt (str): The initial prompt for the call.
+        output_dir (str): Directory for this call's recording and transcription files.
+        webhook_server (Optional[CallWebhookServer]): Server whose webhook ends the wait as soon as
+            the call completes. Polling stays on as the fallback.
+        polling_policy (Optional[PollingPolicy]): Delays and deadline for polling the recording.
+            When the deadline passes the call is given up and its concurrency slot freed.
+        stream_to_transcription (bool): Whether to upload the recording to DeepGram while it downloads
+            instead of downloading it first.
+        archive (Optional[TranscriptArchive]): Sink the transcript is written to in the background.
+        preprocessor (Optional[AudioPreprocessor]): Trims and compresses the recording before it is uploaded.
+
+    Returns:
+        Optional[CallResult]: The call with its transcript if successful, else None.
+    """
+    logger.info("Starting Hamming call and transcription process")
+    placed = await place_call_and_wait_for_audio(
+        hamming_api_key, number_to_call, initial_prompt, output_dir,
+        webhook_server, polling_policy, stream_to_transcription
+    )
+    if placed is None:
+        return None
+    call, response = placed
+    return await transcribe_call_audio(deepgram_api_key, call, response, stream_to_transcription, archive, preprocessor)
+
 def call_hamming_and_transcribe(
     hamming_api_key: str,
     deepgram_api_key: str,
     number_to_call: str,
-    initial_prompt: str
-) -> None:
+    initial_prompt: str,
+    output_dir: str = ".",
+    webhook_server: Optional[CallWebhookServer] = None,
+    polling_policy: Optional[PollingPolicy] = None,
+    stream_to_transcription: bool = True,
+    archive: Optional[TranscriptArchive] = None,
+    preprocessor: Optional[AudioPreprocessor] = None
+) -> Optional[CallResult]:
     """
     Orchestrates the process of making a call via Hamming, retrieving the audio, and transcribing it.
 
@@ -178,56 +587,107 @@ def call_hamming_and_transcribe(
         deepgram_api_key (str): DeepGram API key.
         number_to_call (str): The phone number to call.
         initial_prompt (str): The initial prompt for the call.
+        output_dir (str): Directory for the recording and transcription files.
+        webhook_server (Optional[CallWebhookServer]): Server receiving the call completion webhook.
+        polling_policy (Optional[PollingPolicy]): Delays and deadline for polling the recording.
+        stream_to_transcription (bool): Whether to upload the recording to DeepGram while it downloads.
+        archive (Optional[TranscriptArchive]): Sink the transcript is written to in the background.
+        preprocessor (Optional[AudioPreprocessor]): Trims and compresses the recording before it is uploaded.
 
     Returns:
-        None
+        Optional[CallResult]: The call with its transcript if successful, else None.
     """
-    logger.debug(f"call_hamming_and_transcribe - Parameters: hamming_api_key=<hidden>, "
-                 f"deepgram_api_key=<hidden>, number_to_call={number_to_call}, initial_prompt=<hidden>")
-    logger.info("Starting Hamming call and transcription process")
-    
-    response = agent_call(hamming_api_key, number_to_call, initial_prompt)
-    if not response:
-        logger.error("Failed to initiate call. Aborting transcription process.")
-        return
-
-    call_id = response.json().get("id")
-    if not call_id:
-        logger.error("Call ID not found in response. Aborting transcription process.")
-        return
-
-    logger.info(f"Call initiated with ID: {call_id}. Waiting for audio to become available...")
-    time.sleep(30)  # Initial wait before checking for audio
-    audio_available = False
-    max_retries = 600  # Total wait time: 30 + (10 * 600) = 6300 seconds
-    retries = 0
-
-    while not audio_available and retries < max_retries:
-        time.sleep(10)
-        retries += 1
-        logger.info("Checking if audio is available...")
-        print("Checking if audio is available...")
-        response = retrieve_audio(hamming_api_key, call_id)
-        if response and response.status_code == 200:
-            audio_available = True
-            logger.info("Audio is now available for transcription.")
-            print("Audio is now available for transcription.")
-        else:
-            logger.info("Audio not yet available. Continuing to wait...")
-            print("Audio not yet available. Continuing to wait...")
-
-    if not audio_available:
-        logger.error("Audio not available after multiple attempts. Aborting transcription process.")
-        return
-
-    transcription = transcribe_audio(deepgram_api_key, f"call_recording.wav", save_as_txt=True, save_as_json=False, save_as_json_no_words=False)
-    if transcription:
-        logger.info("Transcription completed successfully.")
-        print("Transcription completed successfully.")
-    else:
-        logger.error("Transcription failed.")
+    return asyncio.run(call_hamming_and_transcribe_async(
+        hamming_api_key, deepgram_api_key, number_to_call, initial_prompt, output_dir,
+        webhook_server, polling_policy, stream_to_transcription, archive, preprocessor
+    ))
+
+def _prompt_creator_instruction(
+    business_description: str,
+    nodes: list[dict],
+    edges: list[dict],
+    variant: int,
+    num_variants: int,
+    goal: Optional[str] = None
+) -> str:
+    system_instruction = f"""
+        <instructions>
+        You are a prompt engineer specializing in creating system prompts for AI Voice Agents that will call and test businesses.
+        The agent you are prompting for will be the caller, initiating conversations with the business to test their AI system.
+        The business description is: {business_description}
+        Create a comprehensive system prompt that will help test all possible conversation paths and scenarios.
+        You are given the nodes and edges of the current conversation tree, use them to assign tasks to the caller agent.
+        </instructions>
+
+        <prompt requirements>
+        The prompt should:
+        1. Define the agent's role as a caller testing the business's AI system
+        2. Do not ask too many questions, only ask questions that are necessary to explore the conversation paths
+        3. Specify various test scenarios to try (based on the nodes and edges)
+        4. You do not need to repeat the existing scenarios from the nodes and edges, just add more.
+        5. For each decision node, explore different responses that is not explored according to the edges
+        6. The caller agent should not disclose that it is a tester agent, it should not say that it is testing the business's AI system.
+        7. The prompt should be in markdown format.
+
+        Format the response as a clear, structured system prompt that can be used directly with an AI model.
+        Do not talk to me at all.
+        </prompt requirements>
+
+        <current decision tree>
+        {ENCODING_LEGEND}
+        Nodes marked with * are the ones with unexplored branches, focus the test scenarios on them.
+
+        {encode_tree(nodes, edges)}
+        </current decision tree>
+    """
+    if num_variants > 1:
+        system_instruction += f"""
+        <parallel calls>
+        This is prompt {variant + 1} of {num_variants}, all of them are used for calls placed at the same time.
+        Pick scenarios for this prompt that the other prompts are unlikely to pick, do not try to cover every path in one call.
+        </parallel calls>
+    """
+    if goal:
+        system_instruction += f"""
+        <call goal>
+        This call has one goal, build the test scenario around it and only cover other paths on the way there:
+        {goal}
+        </call goal>
+    """
+    return system_instruction
+
+def _validate_prompt_creator_inputs(api_key: str, model_name: str, business_description: str, nodes: list[dict], edges: list[dict]):
+    logger.info("Generating system prompt for AI Voice Agent")
+    print("Generating system prompt for AI Voice Agent")
+    logger.debug(f"Parameters: model_name={model_name}, business_description={business_description}, "
+                f"nodes_count={len(nodes)}, edges_count={len(edges)}")
+
+    if not api_key:
+        logger.error("Missing OpenAI API key")
+        raise ValueError("OpenAI API key is required")
 
-def prompt_creator(api_key: str, model_name: str, business_description: str, nodes: list[dict], edges: list[dict]) -> str:
+    if not business_description:
+        logger.error("Missing business description")
+        raise ValueError("Business description is required")
+
+def _save_system_prompt(content: str, variant: int):
+    logger.info("Successfully generated system prompt")
+    # Save the generated prompt to a file
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    with open(f"logs/system_prompt_{timestamp}_{variant}.txt", "w") as f:
+        f.write(content)
+    print("prompt created")
+
+def prompt_creator(
+    api_key: str,
+    model_name: str,
+    business_description: str,
+    nodes: list[dict],
+    edges: list[dict],
+    variant: int = 0,
+    num_variants: int = 1,
+    goal: Optional[str] = None
+) -> str:
     """
     Creates a system prompt for an AI Voice Agent to test business conversations.
 
@@ -237,6 +697,9 @@ def prompt_creator(api_key: str, model_name: str, business_description: str, nod
         business_description (str): Description of the business being tested
         nodes (list[dict]): List of existing conversation nodes
         edges (list[dict]): List of existing conversation edges/paths
+        variant (int): Index of this prompt among the prompts generated for the same round
+        num_variants (int): Number of prompts generated for the same round, each placed as a separate call
+        goal (Optional[str]): What this call should explore, e.g. an ExplorationGoal's description
 
     Returns:
         str: Generated system prompt for the AI Voice Agent
@@ -245,65 +708,80 @@ def prompt_creator(api_key: str, model_name: str, business_description: str, nod
         ValueError: If required parameters are missing or invalid
         Exception: For OpenAI API errors or other unexpected issues
     """
-    logger.info("Generating system prompt for AI Voice Agent")
-    print("Generating system prompt for AI Voice Agent")
-    logger.debug(f"Parameters: model_name={model_name}, business_description={business_description}, "
-                f"nodes_count={len(nodes)}, edges_count={len(edges)}")
-
-    if not api_key:
-        logger.error("Missing OpenAI API key")
-        raise ValueError("OpenAI API key is required")
-
-    if not business_description:
-        logger.error("Missing business description")
-        raise ValueError("Business description is required")
+    _validate_prompt_creator_inputs(api_key, model_name, business_description, nodes, edges)
 
     try:
-        client = OpenAI(api_key=api_key)
-        system_instruction = f"""
-            <instructions>
-            You are a prompt engineer specializing in creating system prompts for AI Voice Agents that will call and test businesses.
-            The agent you are prompting for will be the caller, initiating conversations with the business to test their AI system.
-            The business description is: {business_description}
-            Create a comprehensive system prompt that will help test all possible conversation paths and scenarios.
-            You are given the nodes and edges of the current conversation tree, use them to assign tasks to the caller agent.
-            </instructions>
-
-            <prompt requirements>
-            The prompt should:
-            1. Define the agent's role as a caller testing the business's AI system
-            2. Do not ask too many questions, only ask questions that are necessary to explore the conversation paths
-            3. Specify various test scenarios to try (based on the nodes and edges)
-            4. You do not need to repeat the existing scenarios from the nodes and edges, just add more.
-            5. For each decision node, explore different responses that is not explored according to the edges
-            6. The caller agent should not disclose that it is a tester agent, it should not say that it is testing the business's AI system.
-            7. The prompt should be in markdown format.
-
-            Format the response as a clear, structured system prompt that can be used directly with an AI model.
-            Do not talk to me at all.
-            </prompt requirements>
-
-            <current decision tree>
-            the nodes are: {nodes}
-            the edges are: {edges}
-            </current decision tree>
-        """
+        client = llm_clients.client(api_key)
+        system_instruction = _prompt_creator_instruction(business_description, nodes, edges, variant, num_variants, goal)
 
         logger.debug("Sending request to OpenAI API")
-        response = client.chat.completions.create(
+        response = get_llm_cache().complete(
+            client, llm_clients.thread_semaphore(model_name),
+            # A reused prompt would place a duplicate paid call, so one is generated for every call
+            reuse=False,
             model=model_name,
             messages=[{"role": "user", "content": system_instruction}]
         )
         
-        logger.info("Successfully generated system prompt")
-        # Save the generated prompt to a file
-        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        with open(f"logs/system_prompt_{timestamp}.txt", "w") as f:
-            f.write(response.choices[0].message.content)
-    
-        print("prompt created")
+        _save_system_prompt(response.choices[0].message.content, variant)
+        return response.choices[0].message.content
+
+    except LLMCacheMiss:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating system prompt: {str(e)}")
+        raise Exception(f"Failed to generate system prompt: {str(e)}")
+
+async def prompt_creator_async(
+    api_key: str,
+    model_name: str,
+    business_description: str,
+    nodes: list[dict],
+    edges: list[dict],
+    variant: int = 0,
+    num_variants: int = 1,
+    goal: Optional[str] = None
+) -> str:
+    """
+    Async version of prompt_creator, using the shared AsyncOpenAI client.
+
+    Args:
+        api_key (str): OpenAI API key
+        model_name (str): Name of the OpenAI model to use
+        business_description (str): Description of the business being tested
+        nodes (list[dict]): List of existing conversation nodes
+        edges (list[dict]): List of existing conversation edges/paths
+        variant (int): Index of this prompt among the prompts generated for the same round
+        num_variants (int): Number of prompts generated for the same round, each placed as a separate call
+        goal (Optional[str]): What this call should explore, e.g. an ExplorationGoal's description
+
+    Returns:
+        str: Generated system prompt for the AI Voice Agent
+
+    Raises:
+        ValueError: If required parameters are missing or invalid
+        Exception: For OpenAI API errors or other unexpected issues
+    """
+    _validate_prompt_creator_inputs(api_key, model_name, business_description, nodes, edges)
+
+    try:
+        client = llm_clients.async_client(api_key)
+        system_instruction = _prompt_creator_instruction(business_description, nodes, edges, variant, num_variants, goal)
+
+        logger.debug("Sending async request to OpenAI API")
+        response = await get_llm_cache().complete_async(
+            client, llm_clients.semaphore(model_name),
+            # A reused prompt would place a duplicate paid call, so one is generated for every call
+            reuse=False,
+            model=model_name,
+            messages=[{"role": "user", "content": system_instruction}]
+        )
+
+        await asyncio.to_thread(_save_system_prompt, response.choices[0].message.content, variant)
         return response.choices[0].message.content
 
+    except LLMCacheMiss:
+        raise
     except Exception as e:
         logger.error(f"Error generating system prompt: {str(e)}")
         raise Exception(f"Failed to generate system prompt: {str(e)}")
@@ -0,0 +1,115 @@
+import datetime, logging, threading
+from typing import Optional, Union
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/http_sessions_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+Timeout = Union[float, tuple[float, float]]
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """An HTTPAdapter that applies a default (connect, read) timeout to every request sent through it."""
+
+    def __init__(self, *args, timeout: Timeout = (5, 60), **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+class ApiSessionConfig:
+    """
+    Connection settings for one external API.
+
+    Attributes:
+        timeout (Timeout): Default (connect, read) timeout in seconds.
+        max_connections (int): Maximum number of pooled connections per host. Requests beyond it wait for a free one.
+        retry (Retry): urllib3 retry policy for connection errors and retryable status codes.
+    """
+
+    def __init__(self, timeout: Timeout, max_connections: int, retry: Retry):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retry = retry
+
+DEFAULT_API_CONFIGS = {
+    # Starting a call is not idempotent, so only GETs are retried; 429/503 are left to the polling policy's Retry-After handling
+    "hamming": ApiSessionConfig(
+        timeout=(5, 30),
+        max_connections=16,
+        retry=Retry(total=3, connect=3, read=2, status=2, backoff_factor=0.5,
+                    status_forcelist=(502, 504), allowed_methods=frozenset({"GET"}), raise_on_status=False)
+    ),
+    # Uploads may be streamed from a one-shot iterator, so only failures before the body is sent are retried
+    "deepgram": ApiSessionConfig(
+        timeout=(5, 600),
+        max_connections=8,
+        retry=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.5, raise_on_status=False)
+    ),
+}
+
+class SessionManager:
+    """
+    Hands out one keep-alive requests.Session per external API, so repeated requests reuse
+    connections instead of paying a new TCP and TLS handshake each time.
+
+    Attributes:
+        configs (dict[str, ApiSessionConfig]): Connection settings per API name.
+    """
+
+    def __init__(self, configs: Optional[dict[str, ApiSessionConfig]] = None):
+        self.configs = dict(configs or DEFAULT_API_CONFIGS)
+        self._sessions: dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def session(self, api: str) -> requests.Session:
+        """
+        Returns the shared session for an API, creating it on first use.
+
+        Args:
+            api (str): Name of the API, e.g. "hamming" or "deepgram".
+
+        Returns:
+            requests.Session: The pooled session.
+        """
+        with self._lock:
+            session = self._sessions.get(api)
+            if session is None:
+                config = self.configs.get(api)
+                if config is None:
+                    raise ValueError(f"No session configuration for API: {api}")
+                adapter = TimeoutHTTPAdapter(
+                    timeout=config.timeout,
+                    pool_connections=4,
+                    pool_maxsize=config.max_connections,
+                    pool_block=True,
+                    max_retries=config.retry
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._sessions[api] = session
+                logger.info(f"Created HTTP session for {api} with {config.max_connections} connections per host")
+            return session
+
+    def close(self):
+        """Closes all sessions and their pooled connections."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+        logger.info("Closed all HTTP sessions.")
+
+http_sessions = SessionManager()
@@ -0,0 +1,212 @@
+import datetime, logging, random, re, zlib
+from collections import Counter, defaultdict
+from typing import Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/label_index_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Words that do not change what a node means, e.g. "existing customer?" and "existing customer with us?"
+STOPWORDS = frozenset("""
+a an the is are am be been was were do does did to of for with us we you your our i me my it its this that
+there any please can could would will may might just so and or if then today now their they them he she his her
+""".split())
+# Words that flip what a node means, e.g. "Dispatch a technician" and "Do not dispatch a technician".
+# Contractions are split at the apostrophe, so "don't" gives "don" and "t"
+NEGATIONS = frozenset("""
+not no never none nothing nobody neither nor without cannot t nt don doesn didn won isn aren wasn weren
+shouldn couldn wouldn haven hasn
+""".split())
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def normalize_label(label: str) -> tuple[str, ...]:
+    """
+    Reduces a label to its sorted content words.
+
+    Args:
+        label (str): The label.
+
+    Returns:
+        tuple[str, ...]: The lowercased words of the label without stopwords, sorted and deduplicated.
+    """
+    tokens = _TOKEN.findall((label or "").lower())
+    return tuple(sorted({token for token in tokens if token not in STOPWORDS})) or tuple(sorted(set(tokens)))
+
+def _negated(tokens: tuple[str, ...]) -> bool:
+    return any(token in NEGATIONS for token in tokens)
+
+def _shingles(tokens: tuple[str, ...], size: int) -> set[int]:
+    text = " ".join(tokens).encode("utf-8")
+    if len(text) <= size:
+        return {zlib.crc32(text)}
+    return {zlib.crc32(text[i:i + size]) for i in range(len(text) - size + 1)}
+
+class LabelIndex:
+    """
+    A similarity index over node labels, so near-duplicate nodes are found locally instead of by the LLM
+    comparing against the whole tree.
+
+    Labels are normalized to their content words. Identical normalized labels are found with a dict lookup,
+    similar ones with MinHash signatures of character n-grams bucketed by LSH bands, and candidates are
+    ranked by the exact Jaccard similarity of their n-grams. A negated label never duplicates one that
+    is not negated, however similar their n-grams.
+
+    Attributes:
+        threshold (float): Jaccard similarity from which two labels count as duplicates.
+        type_thresholds (dict[str, float]): Stricter thresholds per node type. Actions default to a higher
+            one, as merging two actions loses a branch while merging two questions only rewords one.
+        shingle_size (int): Length of the character n-grams.
+        bands (int): Number of LSH bands.
+        rows (int): Signature values per band.
+        max_bucket_candidates (int): Most recently added nodes taken from each LSH bucket.
+        max_candidates (int): Candidates sharing the most bands that are compared exactly, so a query stays
+            cheap when many labels share a bucket.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.7,
+        type_thresholds: Optional[dict[str, float]] = None,
+        shingle_size: int = 3,
+        bands: int = 6,
+        rows: int = 3,
+        max_bucket_candidates: int = 32,
+        max_candidates: int = 8,
+        seed: int = 1
+    ):
+        self.threshold = threshold
+        self.type_thresholds = {"action": 0.85} if type_thresholds is None else type_thresholds
+        self.shingle_size = shingle_size
+        self.bands = bands
+        self.rows = rows
+        self.max_bucket_candidates = max_bucket_candidates
+        self.max_candidates = max_candidates
+        self._mask = random.Random(seed).getrandbits(32)
+        self._labels: dict[str, str] = {}
+        self._types: dict[str, Optional[str]] = {}
+        self._shingle_sets: dict[str, set[int]] = {}
+        self._negations: dict[str, bool] = {}
+        self._exact: dict[tuple[str, ...], list[str]] = defaultdict(list)
+        self._last_features: Optional[tuple] = None
+        self._buckets: list[dict[tuple[int, ...], list[str]]] = [defaultdict(list) for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def _signature(self, shingles: set[int]) -> list[int]:
+        # One-permutation hashing: each n-gram lands in one bin and every bin keeps its minimum, which costs
+        # one pass over the n-grams instead of one per signature value. Empty bins borrow the next filled bin's
+        # value, offset by the distance, so equal n-gram sets still get equal signatures.
+        size = self.bands * self.rows
+        signature = [None] * size
+        for shingle in shingles:
+            hashed = shingle ^ self._mask
+            index, value = hashed % size, hashed // size
+            if signature[index] is None or value < signature[index]:
+                signature[index] = value
+        filled = [index for index, value in enumerate(signature) if value is not None]
+        for index in range(size):
+            if signature[index] is None:
+                distance = min((other - index) % size for other in filled)
+                signature[index] = (signature[(index + distance) % size] << 5) + distance
+        return signature
+
+    def _features(self, label: str) -> tuple[tuple[str, ...], set[int], list[int]]:
+        # A label is usually looked up with find_duplicate right before it is added, so the last one is kept
+        if self._last_features is None or self._last_features[0] != label:
+            tokens = normalize_label(label)
+            shingles = _shingles(tokens, self.shingle_size)
+            self._last_features = (label, tokens, shingles, self._signature(shingles))
+        return self._last_features[1:]
+
+    def _bands(self, signature: list[int]) -> list[tuple[int, ...]]:
+        return [tuple(signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def add(self, node_id: str, label: str, node_type: Optional[str] = None):
+        """
+        Indexes a node's label. A node that is already indexed is left as it is.
+
+        Args:
+            node_id (str): The node's id.
+            label (str): The node's label.
+            node_type (Optional[str]): The node's type, to restrict duplicates to nodes of the same type.
+        """
+        if node_id in self._labels:
+            return
+        tokens, shingles, signature = self._features(label)
+        self._labels[node_id] = label
+        self._types[node_id] = node_type
+        self._shingle_sets[node_id] = shingles
+        self._negations[node_id] = _negated(tokens)
+        self._exact[tokens].append(node_id)
+        for band, key in enumerate(self._bands(signature)):
+            self._buckets[band][key].append(node_id)
+
+    def similar(self, label: str, k: int = 5, node_type: Optional[str] = None, min_similarity: float = 0.0) -> list[tuple[str, str, float]]:
+        """
+        Finds the indexed labels most similar to a label.
+
+        Args:
+            label (str): The label to look up.
+            k (int): Maximum number of results.
+            node_type (Optional[str]): Only return nodes of this type, None for any type.
+            min_similarity (float): Leave out results below this similarity.
+
+        Returns:
+            list[tuple[str, str, float]]: (node id, label, similarity) of the best matches, most similar first.
+            Labels with the same normalized words have similarity 1.
+        """
+        tokens, shingles, signature = self._features(label)
+        exact = self._exact.get(tokens, ())
+        band_hits = Counter()
+        for band, key in enumerate(self._bands(signature)):
+            band_hits.update(self._buckets[band].get(key, ())[-self.max_bucket_candidates:])
+        candidates = set(exact) | {node_id for node_id, _ in band_hits.most_common(self.max_candidates)}
+
+        results = []
+        for node_id in candidates:
+            if node_type is not None and self._types[node_id] not in (None, node_type):
+                continue
+            if node_id in exact:
+                similarity = 1.0
+            else:
+                other = self._shingle_sets[node_id]
+                common = len(shingles & other)
+                similarity = common / (len(shingles) + len(other) - common)
+            if similarity >= min_similarity:
+                results.append((node_id, self._labels[node_id], similarity))
+        results.sort(key=lambda result: (-result[2], result[0]))
+        return results[:k]
+
+    def find_duplicate(self, label: str, node_type: Optional[str] = None) -> Optional[tuple[str, float]]:
+        """
+        Finds an indexed node that a new node with this label would duplicate.
+
+        Args:
+            label (str): The new node's label.
+            node_type (Optional[str]): The new node's type, only nodes of the same type are duplicates.
+
+        Returns:
+            Optional[tuple[str, float]]: The existing node's id and the similarity, or None.
+        """
+        tokens, _, _ = self._features(label)
+        for node_id in self._exact.get(tokens, ()):
+            if node_type is None or self._types[node_id] in (None, node_type):
+                logger.debug(f"'{label}' duplicates node {node_id} '{self._labels[node_id]}'")
+                return node_id, 1.0
+        negated = _negated(tokens)
+        threshold = self.type_thresholds.get(node_type, self.threshold)
+        for node_id, existing_label, similarity in self.similar(label, k=self.max_candidates, node_type=node_type, min_similarity=threshold):
+            if self._negations[node_id] != negated:
+                logger.debug(f"'{label}' is not a duplicate of node {node_id} '{existing_label}', only one is negated ({similarity:.2f})")
+                continue
+            logger.debug(f"'{label}' duplicates node {node_id} '{existing_label}' ({similarity:.2f})")
+            return node_id, similarity
+        return None
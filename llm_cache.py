@@ -0,0 +1,205 @@
+import asyncio, contextlib, datetime, hashlib, json, logging, os, threading, time
+from typing import Optional, Union
+from pydantic import BaseModel
+from openai.types.chat import ChatCompletion, ParsedChatCompletion
+from disk_cache import DiskCache
+from telemetry import get_telemetry
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/llm_cache_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+CACHE_MODES = ("off", "readwrite", "replay")
+
+class LLMCacheMiss(Exception):
+    """Raised in replay mode when a request has no cached response."""
+
+class LLMResponseCache:
+    """
+    A disk-backed cache of chat completions, so re-running the exploration or the __main__ blocks against the
+    same inputs replays earlier responses instead of paying for them again.
+
+    Requests are keyed by a hash of the model, messages, tools, tool choice and response format. Entries live in
+    a DiskCache, which evicts the least recently used ones once it outgrows its size budget.
+    Every request is recorded in the telemetry, hits as cached so they do not count against the budget.
+    Requests sent with reuse=False, like the caller prompts whose every response must be a fresh call,
+    always go to the API in readwrite mode, and are only stored so replay mode can serve them.
+
+    Modes:
+        off: every request goes to the API and nothing is cached.
+        readwrite: cached responses are reused, misses go to the API and are cached.
+        replay: only cached responses are used, a miss raises LLMCacheMiss.
+
+    Attributes:
+        cache (DiskCache): Where the responses are stored.
+        ttl (Optional[float]): Seconds a response stays valid, None for no expiry.
+        mode (str): One of CACHE_MODES.
+    """
+
+    def __init__(self, cache: DiskCache, ttl: Optional[float] = None, mode: str = "readwrite"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode: {mode}")
+        self.cache = cache
+        self.ttl = ttl
+        self.mode = mode
+
+    @staticmethod
+    def key(request: dict) -> str:
+        """
+        Hashes a chat completion request.
+
+        Args:
+            request (dict): The request's keyword arguments. A pydantic response_format is hashed by its JSON schema.
+
+        Returns:
+            str: The SHA-256 hex digest of the request.
+        """
+        request = dict(request)
+        response_format = request.get("response_format")
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+            request["response_format"] = response_format.model_json_schema()
+        serialized = json.dumps(request, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def _load(self, key: str, response_format: Optional[type[BaseModel]]) -> Optional[Union[ChatCompletion, ParsedChatCompletion]]:
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.time() - entry.get("created_at", 0) > self.ttl:
+            logger.debug(f"LLM cache entry {key} expired")
+            self.cache.delete(key)
+            return None
+        try:
+            if response_format is not None:
+                return ParsedChatCompletion[response_format].model_validate(entry["response"])
+            return ChatCompletion.model_validate(entry["response"])
+        except Exception as e:
+            logger.error(f"Error loading LLM cache entry {key}: {e}")
+            return None
+
+    def _store(self, key: str, response: Union[ChatCompletion, ParsedChatCompletion]):
+        self.cache.set(key, {"created_at": time.time(), "response": response.model_dump(mode="json")})
+
+    def _miss(self, key: str, model: str):
+        if self.mode == "replay":
+            raise LLMCacheMiss(f"No cached response for {model} request {key}")
+        logger.debug(f"LLM cache miss for {model}: {key}")
+
+    def complete(self, client, semaphore: Optional[threading.BoundedSemaphore] = None, reuse: bool = True, **request) -> ChatCompletion:
+        """
+        Returns the cached response to a chat completion request, or sends it with client.chat.completions.create.
+        A request with a response_format model is sent with client.beta.chat.completions.parse instead.
+
+        Args:
+            client (OpenAI): The client used on a miss.
+            semaphore (Optional[threading.BoundedSemaphore]): Held while the request is sent, not while reading the cache.
+            reuse (bool): False to send the request even if a response is cached, unless in replay mode.
+            **request: The request's keyword arguments.
+
+        Returns:
+            ChatCompletion: The response, a ParsedChatCompletion for structured outputs.
+
+        Raises:
+            LLMCacheMiss: In replay mode, if the request has no cached response.
+        """
+        response_format = request.get("response_format") if isinstance(request.get("response_format"), type) else None
+        key = None
+        started = time.monotonic()
+        if self.mode != "off":
+            key = self.key(request)
+        if key is not None and (reuse or self.mode == "replay"):
+            response = self._load(key, response_format)
+            if response is not None:
+                logger.debug(f"LLM cache hit for {request.get('model')}: {key}")
+                get_telemetry().record_completion(request.get("model"), response, time.monotonic() - started, cached=True)
+                return response
+            self._miss(key, request.get("model"))
+        with semaphore or contextlib.nullcontext():
+            if response_format is not None:
+                response = client.beta.chat.completions.parse(**request)
+            else:
+                response = client.chat.completions.create(**request)
+        get_telemetry().record_completion(request.get("model"), response, time.monotonic() - started)
+        if key is not None:
+            self._store(key, response)
+        return response
+
+    async def complete_async(self, client, semaphore: Optional[asyncio.Semaphore] = None, reuse: bool = True, **request) -> ChatCompletion:
+        """
+        Async version of complete, using an AsyncOpenAI client. Cache reads and writes run in a worker thread.
+
+        Args:
+            client (AsyncOpenAI): The client used on a miss.
+            semaphore (Optional[asyncio.Semaphore]): Held while the request is sent, not while reading the cache.
+            reuse (bool): False to send the request even if a response is cached, unless in replay mode.
+            **request: The request's keyword arguments.
+
+        Returns:
+            ChatCompletion: The response, a ParsedChatCompletion for structured outputs.
+
+        Raises:
+            LLMCacheMiss: In replay mode, if the request has no cached response.
+        """
+        response_format = request.get("response_format") if isinstance(request.get("response_format"), type) else None
+        key = None
+        started = time.monotonic()
+        if self.mode != "off":
+            key = self.key(request)
+        if key is not None and (reuse or self.mode == "replay"):
+            response = await asyncio.to_thread(self._load, key, response_format)
+            if response is not None:
+                logger.debug(f"LLM cache hit for {request.get('model')}: {key}")
+                get_telemetry().record_completion(request.get("model"), response, time.monotonic() - started, cached=True)
+                return response
+            self._miss(key, request.get("model"))
+        async with semaphore or contextlib.nullcontext():
+            if response_format is not None:
+                response = await client.beta.chat.completions.parse(**request)
+            else:
+                response = await client.chat.completions.create(**request)
+        get_telemetry().record_completion(request.get("model"), response, time.monotonic() - started)
+        if key is not None:
+            await asyncio.to_thread(self._store, key, response)
+        return response
+
+def llm_cache_from_env() -> LLMResponseCache:
+    """
+    Creates the LLM response cache from the LLM_CACHE_DIR, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS
+    and LLM_CACHE_MODE environment variables.
+
+    Returns:
+        LLMResponseCache: The configured cache.
+    """
+    ttl = os.environ.get("LLM_CACHE_TTL_SECONDS")
+    return LLMResponseCache(
+        DiskCache(
+            os.environ.get("LLM_CACHE_DIR", ".cache/llm"),
+            max_bytes=int(os.environ.get("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+        ),
+        ttl=float(ttl) if ttl else None,
+        mode=os.environ.get("LLM_CACHE_MODE", "readwrite")
+    )
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMResponseCache:
+    """
+    Returns the process-wide LLM response cache, created from the environment on first use,
+    so LLM_CACHE_MODE and the other settings loaded by load_dotenv in main.py are seen.
+
+    Returns:
+        LLMResponseCache: The shared cache.
+    """
+    global _llm_cache
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = llm_cache_from_env()
+        return _llm_cache
@@ -0,0 +1,141 @@
+import asyncio, datetime, logging, os, threading, weakref
+from typing import Optional
+from openai import OpenAI, AsyncOpenAI
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/llm_clients_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+class LLMClientPool:
+    """
+    Process-wide holder of OpenAI clients, so every LLM call reuses the same connection pool
+    instead of constructing a client per request, and of per-model concurrency limits.
+
+    Async clients and semaphores belong to the event loop they were created on, so they are kept per loop.
+    A loop's clients are closed with aclose before the loop ends, e.g. at the end of every asyncio.run.
+
+    Attributes:
+        default_concurrency (Optional[int]): Maximum number of concurrent requests per model. None reads
+            OPENAI_MAX_CONCURRENCY (default 4) on first use, after main.py has loaded the .env file.
+        model_concurrency (dict[str, int]): Overrides of default_concurrency for specific models.
+    """
+
+    def __init__(self, default_concurrency: Optional[int] = None, model_concurrency: Optional[dict[str, int]] = None):
+        self.default_concurrency = default_concurrency
+        self.model_concurrency = dict(model_concurrency or {})
+        self._lock = threading.Lock()
+        self._clients: dict[str, OpenAI] = {}
+        self._thread_semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._loop_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+    def _limit(self, model_name: str) -> int:
+        if self.default_concurrency is None:
+            self.default_concurrency = int(os.environ.get("OPENAI_MAX_CONCURRENCY") or "4")
+        return max(1, self.model_concurrency.get(model_name, self.default_concurrency))
+
+    def client(self, api_key: str) -> OpenAI:
+        """
+        Returns the shared synchronous client for an API key.
+
+        Args:
+            api_key (str): OpenAI API key.
+
+        Returns:
+            OpenAI: The shared client.
+        """
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                logger.debug("Initializing shared OpenAI client.")
+                client = OpenAI(api_key=api_key)
+                self._clients[api_key] = client
+            return client
+
+    def thread_semaphore(self, model_name: str) -> threading.BoundedSemaphore:
+        """
+        Returns the semaphore limiting concurrent synchronous requests to a model.
+
+        Args:
+            model_name (str): Name of the OpenAI model.
+
+        Returns:
+            threading.BoundedSemaphore: The model's semaphore.
+        """
+        with self._lock:
+            semaphore = self._thread_semaphores.get(model_name)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self._limit(model_name))
+                self._thread_semaphores[model_name] = semaphore
+            return semaphore
+
+    def _state(self) -> dict:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loop_state.get(loop)
+            if state is None:
+                state = {"clients": {}, "semaphores": {}}
+                self._loop_state[loop] = state
+            return state
+
+    def async_client(self, api_key: str) -> AsyncOpenAI:
+        """
+        Returns the shared asynchronous client for an API key on the running event loop.
+
+        Args:
+            api_key (str): OpenAI API key.
+
+        Returns:
+            AsyncOpenAI: The shared client.
+        """
+        clients = self._state()["clients"]
+        client = clients.get(api_key)
+        if client is None:
+            logger.debug("Initializing shared AsyncOpenAI client.")
+            client = AsyncOpenAI(api_key=api_key)
+            clients[api_key] = client
+        return client
+
+    async def aclose(self):
+        """
+        Closes the asynchronous clients of the running event loop and their connection pools.
+        A later async_client call on the same loop creates a new client.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._loop_state.get(loop)
+            clients = list(state["clients"].values()) if state else []
+            if state:
+                state["clients"].clear()
+        for client in clients:
+            try:
+                await client.close()
+            except Exception as e:
+                logger.error(f"Error closing AsyncOpenAI client: {e}")
+        if clients:
+            logger.debug(f"Closed {len(clients)} AsyncOpenAI clients.")
+
+    def semaphore(self, model_name: str) -> asyncio.Semaphore:
+        """
+        Returns the semaphore limiting concurrent asynchronous requests to a model on the running event loop.
+
+        Args:
+            model_name (str): Name of the OpenAI model.
+
+        Returns:
+            asyncio.Semaphore: The model's semaphore.
+        """
+        semaphores = self._state()["semaphores"]
+        semaphore = semaphores.get(model_name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._limit(model_name))
+            semaphores[model_name] = semaphore
+        return semaphore
+
+llm_clients = LLMClientPool()
@@ -1,7 +1,16 @@
 from DecisionTree import DecisionTree
-from helpers import call_hamming_and_transcribe, prompt_creator
-from tree_helpers import parse_nodes_and_edges, get_nodes, get_edges, parse_tree
-import os, datetime
+from exploration import explore
+from webhook_server import webhook_server_from_env
+from polling import polling_policy_from_env
+from http_sessions import http_sessions
+from transcript import TranscriptArchive
+from telemetry import get_telemetry
+from tree_store import tree_store_from_env
+from frontier_scheduler import FrontierScheduler
+from transcript_normalizer import transcript_normalizer_from_env
+from speaker_roles import speaker_role_resolver_from_env
+from audio_preprocessing import audio_preprocessor_from_env
+import os
 import streamlit as st
 from dotenv import load_dotenv
 load_dotenv()
@@ -10,35 +19,54 @@ hamming_api_key = os.environ.get("HAMMING_API_KEY")
 deepgram_api_key = os.environ.get("DEEPGRAM_API_KEY")
 openai_api_key = os.environ.get("OPENAI_API_KEY")
 number_to_call = os.environ.get("NUMBER_TO_CALL")
+calls_per_round = int(os.environ.get("CALLS_PER_ROUND", "3"))
+max_concurrent_calls = int(os.environ.get("MAX_CONCURRENT_CALLS", str(calls_per_round)))
+exploration_mode = os.environ.get("EXPLORATION_MODE", "pipeline")
+extraction_mode = os.environ.get("EXTRACTION_MODE", "single")
+parse_window_turns = int(os.environ.get("PARSE_WINDOW_TURNS") or "0") or None
+parse_window_overlap = int(os.environ.get("PARSE_WINDOW_OVERLAP") or "3")
+archive_transcripts = os.environ.get("ARCHIVE_TRANSCRIPTS", "true").lower() == "true"
 
 business_description = "Air Conditioning and Plumbing Company"
 st.set_page_config(layout="wide")
-tree = DecisionTree()
-nodes = []
-edges = []
+# A Streamlit rerun resumes the session's run, RUN_ID resumes any earlier one
+tree_store = tree_store_from_env(default_run_id=st.session_state.get("run_id"))
+if tree_store:
+    st.session_state["run_id"] = tree_store.run_id
+    tree, nodes, edges = tree_store.load_tree()
+    if nodes:
+        print(f"Resuming run {tree_store.run_id} with {len(nodes)} nodes and {len(edges)} edges")
+        tree.display()
+else:
+    tree = DecisionTree()
+    nodes = []
+    edges = []
+webhook_server = webhook_server_from_env()
+polling_policy = polling_policy_from_env()
+archive = TranscriptArchive(enabled=archive_transcripts)
+normalizer = transcript_normalizer_from_env()
+role_resolver = speaker_role_resolver_from_env()
+preprocessor = audio_preprocessor_from_env()
 
-while True:
-    prompt = prompt_creator(openai_api_key, "o1-preview", business_description, nodes, edges)
-    call_hamming_and_transcribe(hamming_api_key, deepgram_api_key, number_to_call, prompt)
-    conversation = open("transcription_output.txt", "r").read()
-    text = parse_nodes_and_edges(openai_api_key, "o1-preview", conversation, nodes, edges)
-    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"logs/parsed_text_output_{timestamp}.txt"
-    with open(filename, "w") as f:
-        f.write(str(text))
-    with open(filename, "r") as f:
-        text = f.read()
-    new_nodes = get_nodes(openai_api_key, "gpt-4o", text)
-    new_edges = get_edges(openai_api_key, "gpt-4o", text)
-    print('new_nodes', new_nodes)
-    print('new_edges', new_edges)
-    if new_nodes == None and new_edges == None:
-        break
-    if new_nodes == None: new_nodes = []
-    if new_edges == None: new_edges = []
-    nodes = nodes + new_nodes
-    edges = edges + new_edges
-    tree = parse_tree(tree, new_nodes, new_edges)
-    tree.display()
-print('DONE')
+scheduler = FrontierScheduler(tree, max_consecutive_failures=int(os.environ.get("MAX_CONSECUTIVE_FAILURES") or "5"))
 
+nodes, edges, tree, calls, stop_reason = explore(
+    openai_api_key, hamming_api_key, deepgram_api_key, number_to_call, business_description,
+    tree, nodes, edges, mode=exploration_mode, calls_per_round=calls_per_round,
+    max_concurrent_calls=max_concurrent_calls, scheduler=scheduler, on_update=lambda tree: tree.display(),
+    webhook_server=webhook_server, polling_policy=polling_policy, archive=archive,
+    extraction_mode=extraction_mode, tree_store=tree_store,
+    parse_window_turns=parse_window_turns, parse_window_overlap=parse_window_overlap,
+    normalizer=normalizer, role_resolver=role_resolver, preprocessor=preprocessor
+)
+if stop_reason:
+    print(f"Stopping exploration, {stop_reason}")
+if webhook_server:
+    webhook_server.stop()
+http_sessions.close()
+archive.close()
+if tree_store:
+    tree_store.close()
+get_telemetry().close()
+print(get_telemetry().summary())
+print('DONE')
@@ -0,0 +1,286 @@
+import asyncio, datetime, logging, os
+from typing import Callable, Optional
+from DecisionTree import DecisionTree
+from helpers import place_call_and_wait_for_audio, transcribe_call_audio, prompt_creator_async
+from llm_clients import llm_clients
+from call_runner import tree_updates
+from webhook_server import CallWebhookServer
+from polling import PollingPolicy
+from transcript import TranscriptArchive
+from telemetry import get_telemetry
+from tree_store import TreeStore
+from frontier_scheduler import FrontierScheduler, ExplorationGoal
+from transcript_normalizer import TranscriptNormalizer
+from speaker_roles import SpeakerRoleResolver
+from audio_preprocessing import AudioPreprocessor
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/pipeline_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+_DONE = None  # Sentinel passed down the queues once a stage has no more work
+
+class ExplorationPipeline:
+    """
+    Explores the agent with a staged pipeline instead of one call at a time:
+
+        prompt -> call -> transcribe -> parse -> tree
+
+    The stages are connected by bounded queues, so the transcription and LLM parsing of a finished call
+    run while the next call is already ringing, and the tree is updated as soon as each parse lands.
+    Prompts are generated from the tree as it is when a call slot frees up.
+
+    Parsing is a single stage so every parse sees the nodes added by the previous one. Long transcripts can be
+    parsed in overlapping windows of turns, each window updating the tree as soon as it is merged.
+    Each call is given a goal by a FrontierScheduler, which also decides when the exploration has converged.
+
+    Attributes:
+        tree (DecisionTree): The decision tree being built.
+        nodes (list[dict]): Nodes found so far.
+        edges (list[dict]): Edges found so far.
+        calls_placed (int): Number of calls placed so far.
+        empty_streak (int): Number of most recent parsed calls that found nothing new.
+        scheduler (FrontierScheduler): Picks the goal of every call and tracks the yield of the calls.
+    """
+
+    def __init__(
+        self,
+        openai_api_key: str,
+        hamming_api_key: str,
+        deepgram_api_key: str,
+        number_to_call: str,
+        business_description: str,
+        tree: DecisionTree,
+        nodes: list[dict],
+        edges: list[dict],
+        max_concurrent_calls: int = 2,
+        queue_size: int = 1,
+        max_calls: Optional[int] = None,
+        scheduler: Optional[FrontierScheduler] = None,
+        on_update: Optional[Callable[[DecisionTree], None]] = None,
+        webhook_server: Optional[CallWebhookServer] = None,
+        polling_policy: Optional[PollingPolicy] = None,
+        archive: Optional[TranscriptArchive] = None,
+        prompt_model: str = "o1-preview",
+        parse_model: str = "o1-preview",
+        extract_model: str = "gpt-4o",
+        extraction_mode: str = "single",
+        tree_store: Optional[TreeStore] = None,
+        parse_window_turns: Optional[int] = None,
+        parse_window_overlap: int = 3,
+        normalizer: Optional[TranscriptNormalizer] = None,
+        role_resolver: Optional[SpeakerRoleResolver] = None,
+        preprocessor: Optional[AudioPreprocessor] = None
+    ):
+        """
+        Args:
+            openai_api_key (str): OpenAI API key.
+            hamming_api_key (str): Hamming API key.
+            deepgram_api_key (str): DeepGram API key.
+            number_to_call (str): The phone number to call.
+            business_description (str): Description of the business being tested.
+            tree (DecisionTree): The decision tree to update.
+            nodes (list[dict]): Nodes found so far.
+            edges (list[dict]): Edges found so far.
+            max_concurrent_calls (int): Maximum number of calls in flight.
+            queue_size (int): Capacity of each queue between stages.
+            max_calls (Optional[int]): Stop placing calls after this many, None for no limit.
+            scheduler (Optional[FrontierScheduler]): Scheduler of the call goals and convergence, one for tree by default.
+            on_update (Optional[Callable[[DecisionTree], None]]): Called after every tree update, e.g. to redraw it.
+            webhook_server (Optional[CallWebhookServer]): Server receiving the call completion webhooks.
+            polling_policy (Optional[PollingPolicy]): Polling delays and per-call deadline.
+            archive (Optional[TranscriptArchive]): Sink the transcripts and parsed texts are written to in the background.
+            prompt_model (str): Model used to generate the caller prompts.
+            parse_model (str): Model used to parse the transcriptions.
+            extract_model (str): Model used for the structured extraction, or to extract nodes and edges from the parsed text.
+            extraction_mode (str): "single" for one structured-output request per call, "chain" for the three-request chain.
+            tree_store (Optional[TreeStore]): Store every tree update is committed to.
+            parse_window_turns (Optional[int]): Parse the transcripts in overlapping windows of this many turns, None for whole transcripts.
+            parse_window_overlap (int): Turns every window repeats from the previous one.
+            normalizer (Optional[TranscriptNormalizer]): Clean-up applied to the transcripts before they are parsed.
+            role_resolver (Optional[SpeakerRoleResolver]): Tags the utterances with the callee and caller roles.
+            preprocessor (Optional[AudioPreprocessor]): Trims and compresses the recordings before they are uploaded.
+        """
+        self.openai_api_key = openai_api_key
+        self.hamming_api_key = hamming_api_key
+        self.deepgram_api_key = deepgram_api_key
+        self.number_to_call = number_to_call
+        self.business_description = business_description
+        self.tree = tree
+        self.nodes = nodes
+        self.edges = edges
+        self.max_concurrent_calls = max(1, max_concurrent_calls)
+        self.queue_size = queue_size
+        self.max_calls = max_calls
+        self.scheduler = scheduler or FrontierScheduler(tree)
+        self._goals: dict[int, Optional[ExplorationGoal]] = {}
+        self.on_update = on_update
+        self.webhook_server = webhook_server
+        self.polling_policy = polling_policy
+        self.archive = archive
+        self.prompt_model = prompt_model
+        self.parse_model = parse_model
+        self.extract_model = extract_model
+        self.extraction_mode = extraction_mode
+        self.tree_store = tree_store
+        self.parse_window_turns = parse_window_turns
+        self.parse_window_overlap = parse_window_overlap
+        self.normalizer = normalizer
+        self.role_resolver = role_resolver
+        self.preprocessor = preprocessor
+        self.calls_placed = 0
+        self.empty_streak = 0
+        self._stopping = asyncio.Event()
+        self.run_dir = os.path.join("logs", "calls", datetime.datetime.now().strftime('%Y%m%d_%H%M%S'))
+
+    def _release(self, index: int, failed: bool = True):
+        # A call that is not parsed tells nothing about its goal, which gets its sample back
+        self.scheduler.release(self._goals.pop(index, None), failed)
+        if self.scheduler.failing() and not self._stopping.is_set():
+            logger.error(f"Stopping exploration, the last {self.scheduler.consecutive_failures} calls failed before they were parsed")
+            self._stopping.set()
+
+    async def _prompt_stage(self, prompt_queue: asyncio.Queue):
+        index = 0
+        prompt_failures = 0
+        while not self._stopping.is_set() and (self.max_calls is None or index < self.max_calls):
+            exhausted = get_telemetry().budget_exhausted()
+            if exhausted:
+                logger.warning(f"Stopping exploration, {exhausted}")
+                self._stopping.set()
+                break
+            goal = self.scheduler.next_goal()
+            self._goals[index] = goal
+            try:
+                prompt = await prompt_creator_async(
+                    self.openai_api_key, self.prompt_model, self.business_description,
+                    self.nodes, self.edges, index % self.max_concurrent_calls, self.max_concurrent_calls,
+                    goal.describe() if goal else None
+                )
+            except Exception as e:
+                # The prompt is skipped, the scheduler stops the exploration once too many calls failed in a row
+                prompt_failures += 1
+                logger.error(f"Prompt generation failed, skipping it: {e}")
+                self._release(index)
+                if not self._stopping.is_set():
+                    await asyncio.sleep(min(2 ** (prompt_failures - 1), 30))
+                continue
+            prompt_failures = 0
+            await prompt_queue.put((index, prompt))
+            index += 1
+        for _ in range(self.max_concurrent_calls):
+            await prompt_queue.put(_DONE)
+
+    async def _call_stage(self, prompt_queue: asyncio.Queue, audio_queue: asyncio.Queue):
+        while (item := await prompt_queue.get()) is not _DONE:
+            index, prompt = item
+            if self._stopping.is_set():
+                self._release(index, failed=False)
+                continue
+            call_dir = os.path.join(self.run_dir, f"call_{index}")
+            os.makedirs(call_dir, exist_ok=True)
+            self.calls_placed += 1
+            logger.info(f"Placing call {index}")
+            try:
+                # The recording is saved before it is queued, an open download could time out while it waits
+                placed = await place_call_and_wait_for_audio(
+                    self.hamming_api_key, self.number_to_call, prompt, call_dir,
+                    self.webhook_server, self.polling_policy, stream_to_transcription=False
+                )
+            except Exception as e:
+                logger.error(f"Call {index} failed: {e}")
+                placed = None
+            if placed is None:
+                self._release(index)
+                continue
+            await audio_queue.put((index, placed))
+
+    async def _transcribe_stage(self, audio_queue: asyncio.Queue, transcript_queue: asyncio.Queue):
+        while (item := await audio_queue.get()) is not _DONE:
+            index, (call, response) = item
+            try:
+                call = await transcribe_call_audio(
+                    self.deepgram_api_key, call, response, stream_to_transcription=False, archive=self.archive,
+                    preprocessor=self.preprocessor
+                )
+            except Exception as e:
+                logger.error(f"Transcription of call {index} failed: {e}")
+                call = None
+            if call is None:
+                self._release(index)
+                continue
+            await transcript_queue.put((index, call))
+        await transcript_queue.put(_DONE)
+
+    async def _parse_stage(self, transcript_queue: asyncio.Queue):
+        while (item := await transcript_queue.get()) is not _DONE:
+            index, call = item
+            found_nodes, found_edges = 0, 0
+            try:
+                async for new_nodes, new_edges in tree_updates(
+                    self.openai_api_key, call, self.tree, self.nodes, self.edges,
+                    self.parse_model, self.extract_model, self.archive, self.extraction_mode,
+                    self.parse_window_turns, self.parse_window_overlap, normalizer=self.normalizer,
+                    role_resolver=self.role_resolver
+                ):
+                    if not new_nodes and not new_edges:
+                        continue
+                    found_nodes += len(new_nodes)
+                    found_edges += len(new_edges)
+                    if self.tree_store:
+                        self.tree_store.append_batch(new_nodes, new_edges, call.call_id)
+                    self.nodes = self.nodes + new_nodes
+                    self.edges = self.edges + new_edges
+                    if self.on_update:
+                        self.on_update(self.tree)
+            except Exception as e:
+                logger.error(f"Parsing of call {index} failed: {e}")
+                self._release(index)
+                continue
+            self.scheduler.record(self._goals.pop(index, None), found_nodes)
+            if self.scheduler.converged():
+                logger.info("Exploration converged, no more calls will be placed.")
+                self._stopping.set()
+            if not found_nodes and not found_edges:
+                self.empty_streak += 1
+                logger.info(f"Call {index} found nothing new ({self.empty_streak} in a row)")
+                continue
+            self.empty_streak = 0
+
+    async def run(self) -> tuple[list[dict], list[dict], DecisionTree]:
+        """
+        Runs the pipeline until the exploration converges, max_calls have been placed or the telemetry budget is exhausted.
+        Calls already placed when it stops are still transcribed and merged.
+
+        Returns:
+            tuple[list[dict], list[dict], DecisionTree]: The final nodes, edges and tree.
+        """
+        prompt_queue = asyncio.Queue(maxsize=self.queue_size)
+        audio_queue = asyncio.Queue(maxsize=self.queue_size)
+        transcript_queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async def call_workers():
+            await asyncio.gather(*(
+                self._call_stage(prompt_queue, audio_queue) for _ in range(self.max_concurrent_calls)
+            ))
+            await audio_queue.put(_DONE)
+
+        try:
+            await asyncio.gather(
+                self._prompt_stage(prompt_queue),
+                call_workers(),
+                self._transcribe_stage(audio_queue, transcript_queue),
+                self._parse_stage(transcript_queue)
+            )
+        finally:
+            # The clients belong to this run's event loop, which asyncio.run closes after it
+            await llm_clients.aclose()
+        logger.info(f"Pipeline finished after {self.calls_placed} calls with {len(self.nodes)} nodes")
+        return self.nodes, self.edges, self.tree
@@ -0,0 +1,192 @@
+import datetime, email.utils, json, logging, os, random, threading
+from typing import Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/polling_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+class CallDurationHistory:
+    """
+    Remembers how long past calls took until their recording was available.
+
+    Attributes:
+        path (Optional[str]): JSON file the durations are persisted to, None to keep them in memory only.
+        max_samples (int): Number of most recent durations kept.
+    """
+
+    def __init__(self, path: Optional[str] = "logs/call_durations.json", max_samples: int = 50):
+        self.path = path
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.durations: list[float] = []
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.durations = [float(d) for d in json.load(f)][-max_samples:]
+                logger.debug(f"Loaded {len(self.durations)} call durations from {path}")
+            except Exception as e:
+                logger.error(f"Error loading call durations from {path}: {e}")
+
+    def record(self, seconds: float):
+        """
+        Records the duration of a finished call.
+
+        Args:
+            seconds (float): Seconds from placing the call until its recording was available.
+        """
+        with self._lock:
+            self.durations = (self.durations + [seconds])[-self.max_samples:]
+            durations = list(self.durations)
+        if self.path:
+            try:
+                with open(self.path, "w") as f:
+                    json.dump(durations, f)
+            except Exception as e:
+                logger.error(f"Error saving call durations to {self.path}: {e}")
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Returns the q-quantile of the recorded durations.
+
+        Args:
+            q (float): Quantile between 0 and 1.
+
+        Returns:
+            Optional[float]: The quantile, or None if nothing was recorded yet.
+        """
+        with self._lock:
+            durations = sorted(self.durations)
+        if not durations:
+            return None
+        return durations[min(len(durations) - 1, int(q * len(durations)))]
+
+class PollingPolicy:
+    """
+    Decides how long to wait between checks for a call's recording.
+
+    The first check happens around the time the shortest past calls finished, later checks back off
+    exponentially with jitter, and a Retry-After from a throttled response always wins. The whole wait
+    is bounded by a per-call deadline.
+
+    Attributes:
+        history (CallDurationHistory): Durations of past calls, used to learn the initial delay.
+        default_initial_delay (float): Initial delay used until enough calls have been recorded.
+        min_initial_delay (float): Lower bound for the learned initial delay.
+        initial_quantile (float): Quantile of past durations used as the initial delay.
+        min_samples (int): Number of recorded calls needed before the initial delay is learned.
+        base_delay (float): Delay before the first re-check.
+        multiplier (float): Growth factor of the delay per attempt.
+        max_delay (float): Upper bound for a single delay.
+        jitter (float): Fraction of the delay that is randomised, so concurrent calls do not poll in lockstep.
+        deadline (float): Maximum number of seconds to wait for a call's recording.
+        max_retry_after (float): Upper bound for an honoured Retry-After.
+    """
+
+    def __init__(
+        self,
+        history: Optional[CallDurationHistory] = None,
+        default_initial_delay: float = 30,
+        min_initial_delay: float = 5,
+        initial_quantile: float = 0.2,
+        min_samples: int = 3,
+        base_delay: float = 2,
+        multiplier: float = 2,
+        max_delay: float = 60,
+        jitter: float = 0.5,
+        deadline: float = 1800,
+        max_retry_after: float = 300
+    ):
+        self.history = history if history is not None else CallDurationHistory(path=None)
+        self.default_initial_delay = default_initial_delay
+        self.min_initial_delay = min_initial_delay
+        self.initial_quantile = initial_quantile
+        self.min_samples = min_samples
+        self.base_delay = base_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.deadline = deadline
+        self.max_retry_after = max_retry_after
+
+    def initial_delay(self) -> float:
+        """
+        Returns how long to wait after placing a call before the first check.
+
+        Returns:
+            float: Delay in seconds.
+        """
+        if len(self.history.durations) < self.min_samples:
+            return self.default_initial_delay
+        learned = self.history.quantile(self.initial_quantile)
+        delay = max(self.min_initial_delay, min(learned, self.deadline))
+        logger.debug(f"Learned initial delay: {delay:.1f} s from {len(self.history.durations)} calls")
+        return delay
+
+    def next_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Returns how long to wait before the next check.
+
+        Args:
+            attempt (int): Number of checks already made after the initial delay.
+            retry_after (Optional[float]): Seconds requested by the server's Retry-After header.
+
+        Returns:
+            float: Delay in seconds.
+        """
+        if retry_after is not None:
+            return min(max(retry_after, 0.0), self.max_retry_after)
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return delay * (1 - self.jitter * random.random())
+
+    def record_duration(self, seconds: float):
+        """
+        Records how long a finished call took, to refine the initial delay.
+
+        Args:
+            seconds (float): Seconds from placing the call until its recording was available.
+        """
+        self.history.record(seconds)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header given either as seconds or as an HTTP date.
+
+    Args:
+        value (Optional[str]): The header value.
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if the header is missing or malformed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+        return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        logger.warning(f"Malformed Retry-After header: {value}")
+        return None
+
+def polling_policy_from_env() -> PollingPolicy:
+    """
+    Builds the polling policy used by main.py, with the call deadline taken from CALL_DEADLINE_SECONDS.
+
+    Returns:
+        PollingPolicy: The policy, learning from the durations persisted in logs/call_durations.json.
+    """
+    return PollingPolicy(
+        history=CallDurationHistory(),
+        deadline=float(os.environ.get("CALL_DEADLINE_SECONDS", "1800"))
+    )
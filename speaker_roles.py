@@ -0,0 +1,210 @@
+import datetime, json, logging, os, re, threading
+from typing import Optional
+from transcript import Transcript
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/speaker_roles_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+CALLEE = "callee"  # The business AI agent being explored
+CALLER = "caller"  # The tester agent placing the call
+
+# Phrases the business agent uses when it answers or runs its script
+CALLEE_PATTERNS = [re.compile(pattern) for pattern in (
+    r"\bthanks? (you )?for calling\b",
+    r"\byou(?:'ve| have) reached\b",
+    r"\bthis is \w+(?: \w+)? speaking\b",
+    r"\bhow (?:can|may) i (?:help|assist)\b",
+    r"\bwhat can i do for you\b",
+    r"\bare you an existing customer\b",
+    r"\bcould i (?:please )?have your\b",
+    r"\banything else i can (?:help|assist)\b",
+)]
+# Phrases the tester uses when it states why it calls
+CALLER_PATTERNS = [re.compile(pattern) for pattern in (
+    r"\bi(?:'m| am) calling\b",
+    r"\bi(?:'d| would) like to\b",
+    r"\bcould you (?:tell|let) me\b",
+    r"\bi(?:'m| am) (?:interested in|looking for)\b",
+    r"\bi(?:'m| am) (?:not )?an existing customer\b",
+    r"\bi have a question\b",
+    r"\bmy name is\b",
+)]
+
+class SpeakerRoleCache:
+    """
+    Remembers which channel the business answered on, per called number.
+
+    Attributes:
+        path (Optional[str]): JSON file the mapping is persisted to, None to keep it in memory only.
+    """
+
+    def __init__(self, path: Optional[str] = "logs/speaker_roles.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.callee_channels: dict[str, int] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.callee_channels = {number: int(channel) for number, channel in json.load(f).items()}
+                logger.debug(f"Loaded the callee channels of {len(self.callee_channels)} numbers from {path}")
+            except Exception as e:
+                logger.error(f"Error loading speaker roles from {path}: {e}")
+
+    def get(self, number: str) -> Optional[int]:
+        """Returns the channel the business answered on at a number, None if unknown."""
+        with self._lock:
+            return self.callee_channels.get(number)
+
+    def record(self, number: str, channel: int):
+        """
+        Records the channel the business answered on at a number.
+
+        Args:
+            number (str): The called number.
+            channel (int): The business's channel.
+        """
+        with self._lock:
+            if self.callee_channels.get(number) == channel:
+                return
+            self.callee_channels[number] = channel
+            callee_channels = dict(self.callee_channels)
+        if self.path:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "w") as f:
+                    json.dump(callee_channels, f)
+            except Exception as e:
+                logger.error(f"Error saving speaker roles to {self.path}: {e}")
+
+class SpeakerRoleResolver:
+    """
+    Decides locally which channel of a call is the business (callee) and which the tester (caller),
+    replacing an LLM call per transcript.
+
+    Every channel is scored:
+        - The channel that speaks first gets first_speaker_weight, as the business answers the phone.
+        - Every utterance matching a business phrase ("thank you for calling", "how can I help") adds
+          pattern_weight, every one matching a tester phrase ("I'm calling", "I'd like to") subtracts it.
+        - The channel of the known Hamming recording layout gets layout_weight.
+    The highest scoring channel is the business. If it does not lead by min_margin, the channel cached
+    for the called number decides instead. Confident decisions update the cache.
+
+    Attributes:
+        cache (SpeakerRoleCache): The business channel per called number.
+        callee_channel (int): Channel of the business in Hamming's recordings.
+        first_speaker_weight (float): Score of the channel that speaks first.
+        pattern_weight (float): Score of every utterance matching a business or tester phrase.
+        max_pattern_score (float): Cap of a channel's phrase score, so one talkative channel cannot outweigh the rest.
+        layout_weight (float): Score of callee_channel.
+        min_margin (float): Lead of the best channel from which the decision overrides the cache.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[SpeakerRoleCache] = None,
+        callee_channel: int = 0,
+        first_speaker_weight: float = 2.0,
+        pattern_weight: float = 1.0,
+        max_pattern_score: float = 3.0,
+        layout_weight: float = 0.5,
+        min_margin: float = 2.0
+    ):
+        self.cache = cache or SpeakerRoleCache(path=None)
+        self.callee_channel = callee_channel
+        self.first_speaker_weight = first_speaker_weight
+        self.pattern_weight = pattern_weight
+        self.max_pattern_score = max_pattern_score
+        self.layout_weight = layout_weight
+        self.min_margin = min_margin
+
+    def scores(self, transcript: Transcript) -> dict[int, float]:
+        """
+        Scores how likely every channel of a transcript is the business.
+
+        Args:
+            transcript (Transcript): The transcript.
+
+        Returns:
+            dict[int, float]: The score of every channel that speaks, higher for the business.
+        """
+        patterns: dict[int, float] = {}
+        for utterance in transcript.utterances:
+            text = utterance.transcript.lower().replace("’", "'")
+            hits = sum(1 for pattern in CALLEE_PATTERNS if pattern.search(text)) - \
+                sum(1 for pattern in CALLER_PATTERNS if pattern.search(text))
+            patterns[utterance.channel] = patterns.get(utterance.channel, 0.0) + hits * self.pattern_weight
+        scores = {
+            channel: max(-self.max_pattern_score, min(self.max_pattern_score, score)) for channel, score in patterns.items()
+        }
+        if transcript.utterances:
+            scores[transcript.utterances[0].channel] += self.first_speaker_weight
+        if self.callee_channel in scores:
+            scores[self.callee_channel] += self.layout_weight
+        return scores
+
+    def resolve(self, transcript: Transcript, number: Optional[str] = None) -> dict[int, str]:
+        """
+        Decides the role of every channel of a transcript.
+
+        Args:
+            transcript (Transcript): The transcript.
+            number (Optional[str]): The called number, to use and update its cached business channel.
+
+        Returns:
+            dict[int, str]: CALLEE or CALLER for every channel that speaks.
+        """
+        scores = self.scores(transcript)
+        if not scores:
+            return {}
+        ranked = sorted(scores, key=lambda channel: (-scores[channel], channel))
+        margin = scores[ranked[0]] - scores[ranked[1]] if len(ranked) > 1 else 0.0
+        callee = ranked[0]
+        cached = self.cache.get(number) if number else None
+        if margin >= self.min_margin:
+            if number:
+                self.cache.record(number, callee)
+        elif cached is not None and (cached in scores or len(scores) == 1):
+            callee = cached
+        elif len(ranked) == 1:
+            callee = self.callee_channel
+        logger.info(f"Channel {callee} is the business (scores {scores}, cached {cached})")
+        return {channel: CALLEE if channel == callee else CALLER for channel in scores}
+
+    def tag(self, transcript: Transcript, number: Optional[str] = None) -> Transcript:
+        """
+        Tags every utterance of a transcript with its speaker's role.
+
+        Args:
+            transcript (Transcript): The transcript.
+            number (Optional[str]): The called number.
+
+        Returns:
+            Transcript: A tagged copy, the original is left unchanged.
+        """
+        roles = self.resolve(transcript, number)
+        return transcript.model_copy(update={"utterances": [
+            utterance.model_copy(update={"role": roles.get(utterance.channel)}) for utterance in transcript.utterances
+        ]})
+
+def speaker_role_resolver_from_env() -> Optional[SpeakerRoleResolver]:
+    """
+    Builds the resolver used by main.py. TAG_SPEAKER_ROLES (default true) turns it on and CALLEE_CHANNEL
+    sets the business's channel in the recordings. The mapping per number is persisted in logs/speaker_roles.json.
+
+    Returns:
+        Optional[SpeakerRoleResolver]: The resolver, or None if disabled.
+    """
+    if os.environ.get("TAG_SPEAKER_ROLES", "true").lower() != "true":
+        return None
+    return SpeakerRoleResolver(
+        cache=SpeakerRoleCache(),
+        callee_channel=int(os.environ.get("CALLEE_CHANNEL", "0"))
+    )
@@ -0,0 +1,321 @@
+import datetime, json, logging, os, tempfile, threading, time
+from typing import Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/telemetry_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+METRICS = (
+    "wall_seconds", "retries", "prompt_tokens", "completion_tokens", "reasoning_tokens",
+    "audio_seconds", "bytes_sent", "bytes_received", "dollars"
+)
+
+# USD per million (prompt, completion) tokens; reasoning tokens are billed as completion tokens
+MODEL_PRICES = {
+    "o1-preview": (15.0, 60.0),
+    "o1-mini": (3.0, 12.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+}
+DEEPGRAM_PRICE_PER_MINUTE = 0.0043
+
+def http_retries(response) -> int:
+    """
+    Returns how many times urllib3 retried the request behind a requests response.
+
+    Args:
+        response (requests.Response): The response.
+
+    Returns:
+        int: The number of retries, 0 if unknown.
+    """
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    return len(getattr(retries, "history", ()) or ())
+
+class Budget:
+    """
+    Limits on what an exploration run may spend. Cached LLM responses do not count.
+
+    Attributes:
+        max_tokens (Optional[int]): Maximum prompt plus completion tokens.
+        max_dollars (Optional[float]): Maximum estimated spend in USD.
+        max_call_minutes (Optional[float]): Maximum total length of the placed calls in minutes.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, max_dollars: Optional[float] = None, max_call_minutes: Optional[float] = None):
+        self.max_tokens = max_tokens
+        self.max_dollars = max_dollars
+        self.max_call_minutes = max_call_minutes
+
+    def exhausted(self, spent: dict) -> Optional[str]:
+        """
+        Checks the spending so far against the limits.
+
+        Args:
+            spent (dict): The "tokens", "dollars" and "call_minutes" spent so far.
+
+        Returns:
+            Optional[str]: Which limit was reached, None if there is budget left.
+        """
+        if self.max_tokens is not None and spent["tokens"] >= self.max_tokens:
+            return f"token budget of {self.max_tokens} reached"
+        if self.max_dollars is not None and spent["dollars"] >= self.max_dollars:
+            return f"budget of ${self.max_dollars:.2f} reached"
+        if self.max_call_minutes is not None and spent["call_minutes"] >= self.max_call_minutes:
+            return f"budget of {self.max_call_minutes} call minutes reached"
+        return None
+
+class Telemetry:
+    """
+    Records one event per external call (OpenAI, Hamming, DeepGram) with its wall time, retries, tokens,
+    audio seconds and bytes transferred, and keeps running totals per service and operation.
+
+    Events are appended to a JSONL file as they happen. The totals are exported as a Prometheus textfile,
+    rewritten at most every export_interval seconds and on close, for node_exporter's textfile collector.
+
+    Attributes:
+        jsonl_path (Optional[str]): Where the events are appended, None to not write them.
+        prometheus_path (Optional[str]): Where the textfile is written, None to not write it.
+        budget (Budget): Spending limits checked by budget_exhausted.
+        export_interval (float): Minimum seconds between two textfile exports.
+    """
+
+    def __init__(
+        self,
+        jsonl_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        budget: Optional[Budget] = None,
+        export_interval: float = 15.0
+    ):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.budget = budget or Budget()
+        self.export_interval = export_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._totals: dict[tuple[str, str, bool], dict[str, float]] = {}
+        self._spent = {"tokens": 0, "dollars": 0.0, "call_minutes": 0.0}
+        self._last_export = 0.0
+
+    def record(self, service: str, operation: str, wall_seconds: float = 0.0, cached: bool = False, status=None, **metrics) -> dict:
+        """
+        Records an external call.
+
+        Args:
+            service (str): "openai", "hamming" or "deepgram".
+            operation (str): What was done, e.g. "start_call" or the model name.
+            wall_seconds (float): Wall time of the call.
+            cached (bool): Whether it was answered from a local cache instead of the service.
+            status: HTTP status or other outcome, if any.
+            **metrics: Any of METRICS besides wall_seconds.
+
+        Returns:
+            dict: The recorded event.
+        """
+        unknown = set(metrics) - set(METRICS)
+        if unknown:
+            raise ValueError(f"Unknown telemetry metrics: {sorted(unknown)}")
+        event = {
+            "ts": time.time(), "service": service, "operation": operation, "cached": cached, "status": status,
+            "wall_seconds": round(wall_seconds, 4), **metrics
+        }
+        with self._lock:
+            totals = self._totals.setdefault((service, operation, cached), dict.fromkeys(("count",) + METRICS, 0))
+            totals["count"] += 1
+            for name in METRICS:
+                totals[name] += event.get(name) or 0
+            if not cached:
+                self._spent["tokens"] += (metrics.get("prompt_tokens") or 0) + (metrics.get("completion_tokens") or 0)
+                self._spent["dollars"] += metrics.get("dollars") or 0
+            if service == "hamming" and operation == "call":
+                self._spent["call_minutes"] += (metrics.get("audio_seconds") or 0) / 60
+            self._write_event(event)
+            export = self.prometheus_path and time.monotonic() - self._last_export >= self.export_interval
+        if export:
+            self.write_prometheus()
+        return event
+
+    def record_completion(self, model: str, response, wall_seconds: float, cached: bool = False) -> dict:
+        """
+        Records a chat completion with its token usage and estimated cost.
+
+        Args:
+            model (str): The requested model.
+            response (ChatCompletion): The response.
+            wall_seconds (float): Wall time of the request, or of the cache lookup.
+            cached (bool): Whether the response came from the LLM cache.
+
+        Returns:
+            dict: The recorded event.
+        """
+        usage = getattr(response, "usage", None)
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        details = getattr(usage, "completion_tokens_details", None)
+        reasoning_tokens = getattr(details, "reasoning_tokens", 0) or 0
+        prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        dollars = 0.0 if cached else (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+        return self.record(
+            "openai", model, wall_seconds, cached=cached,
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+            reasoning_tokens=reasoning_tokens, dollars=dollars
+        )
+
+    def _write_event(self, event: dict):
+        """Appends an event to the JSONL file. Called with the lock held."""
+        if not self.jsonl_path:
+            return
+        try:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+                self._file = open(self.jsonl_path, "a", buffering=1)
+            self._file.write(json.dumps(event, separators=(",", ":")) + "\n")
+        except Exception as e:
+            logger.error(f"Error writing telemetry event: {e}")
+
+    def totals(self) -> dict[tuple[str, str, bool], dict[str, float]]:
+        """
+        Returns the running totals.
+
+        Returns:
+            dict[tuple[str, str, bool], dict[str, float]]: The call count and summed METRICS per (service, operation, cached).
+        """
+        with self._lock:
+            return {key: dict(values) for key, values in self._totals.items()}
+
+    def spent(self) -> dict:
+        """
+        Returns what counts against the budget so far.
+
+        Returns:
+            dict: The "tokens", "dollars" and "call_minutes" spent.
+        """
+        with self._lock:
+            return dict(self._spent)
+
+    def budget_exhausted(self) -> Optional[str]:
+        """
+        Checks the spending so far against the budget.
+
+        Returns:
+            Optional[str]: Which limit was reached, None if there is budget left.
+        """
+        return self.budget.exhausted(self.spent())
+
+    def write_prometheus(self):
+        """Writes the totals to the Prometheus textfile, replacing it atomically."""
+        if not self.prometheus_path:
+            return
+        totals = self.totals()
+        families = {
+            "count": ("call_explorer_external_calls_total", "External calls made."),
+            "wall_seconds": ("call_explorer_wall_seconds_total", "Wall time spent in external calls."),
+            "retries": ("call_explorer_retries_total", "Retries of external HTTP calls."),
+            "prompt_tokens": ("call_explorer_prompt_tokens_total", "LLM prompt tokens."),
+            "completion_tokens": ("call_explorer_completion_tokens_total", "LLM completion tokens, reasoning tokens included."),
+            "reasoning_tokens": ("call_explorer_reasoning_tokens_total", "LLM reasoning tokens."),
+            "audio_seconds": ("call_explorer_audio_seconds_total", "Seconds of call audio."),
+            "bytes_sent": ("call_explorer_bytes_sent_total", "Bytes uploaded."),
+            "bytes_received": ("call_explorer_bytes_received_total", "Bytes downloaded."),
+            "dollars": ("call_explorer_dollars_total", "Estimated spend in USD."),
+        }
+        lines = []
+        for metric, (name, help_text) in families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (service, operation, cached), values in sorted(totals.items()):
+                labels = f'service="{service}",operation="{operation}",cached="{str(cached).lower()}"'
+                lines.append(f"{name}{{{labels}}} {values[metric]:g}")
+        try:
+            directory = os.path.dirname(self.prometheus_path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                f.write("\n".join(lines) + "\n")
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.prometheus_path)
+        except Exception as e:
+            logger.error(f"Error writing Prometheus textfile {self.prometheus_path}: {e}")
+        with self._lock:
+            self._last_export = time.monotonic()
+
+    def summary(self) -> str:
+        """
+        Summarizes the totals per service and operation, for printing at the end of a run.
+
+        Returns:
+            str: One line per service and operation.
+        """
+        lines = []
+        for (service, operation, cached), values in sorted(self.totals().items()):
+            line = f"{service}/{operation}{' (cached)' if cached else ''}: {values['count']:g} calls, {values['wall_seconds']:.1f} s"
+            if values["prompt_tokens"] or values["completion_tokens"]:
+                line += f", {values['prompt_tokens']:g}+{values['completion_tokens']:g} tokens"
+            if values["audio_seconds"]:
+                line += f", {values['audio_seconds']:.0f} s audio"
+            if values["retries"]:
+                line += f", {values['retries']:g} retries"
+            if values["dollars"]:
+                line += f", ${values['dollars']:.3f}"
+            lines.append(line)
+        spent = self.spent()
+        lines.append(f"total: {spent['tokens']} tokens, ${spent['dollars']:.3f}, {spent['call_minutes']:.1f} call minutes")
+        return "\n".join(lines)
+
+    def close(self):
+        """Exports the totals one last time and closes the JSONL file."""
+        self.write_prometheus()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def _optional_number(name: str, cast):
+    value = os.environ.get(name)
+    return cast(value) if value else None
+
+def telemetry_from_env() -> Telemetry:
+    """
+    Creates the telemetry recorder from the TELEMETRY_DIR, BUDGET_MAX_TOKENS, BUDGET_MAX_DOLLARS
+    and BUDGET_MAX_CALL_MINUTES environment variables. An empty TELEMETRY_DIR disables the exports.
+
+    Returns:
+        Telemetry: The configured recorder.
+    """
+    directory = os.environ.get("TELEMETRY_DIR", os.path.join("logs", "telemetry"))
+    budget = Budget(
+        max_tokens=_optional_number("BUDGET_MAX_TOKENS", int),
+        max_dollars=_optional_number("BUDGET_MAX_DOLLARS", float),
+        max_call_minutes=_optional_number("BUDGET_MAX_CALL_MINUTES", float)
+    )
+    if not directory:
+        return Telemetry(budget=budget)
+    return Telemetry(
+        jsonl_path=os.path.join(directory, f"events_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"),
+        prometheus_path=os.path.join(directory, "call_explorer.prom"),
+        budget=budget
+    )
+
+_telemetry: Optional[Telemetry] = None
+_telemetry_lock = threading.Lock()
+
+def get_telemetry() -> Telemetry:
+    """
+    Returns the process-wide telemetry recorder, created from the environment on first use, so the
+    budget and export settings loaded by load_dotenv in main.py are seen whatever was imported before.
+
+    Returns:
+        Telemetry: The shared recorder.
+    """
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = telemetry_from_env()
+        return _telemetry
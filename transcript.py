@@ -0,0 +1,162 @@
+import datetime, logging, os, queue, threading
+from typing import Optional
+from pydantic import BaseModel
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/transcript_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+class Utterance(BaseModel):
+    """A single utterance of a transcribed call, without DeepGram's per-word details."""
+    channel: int
+    start: float
+    end: float
+    transcript: str
+    confidence: Optional[float] = None
+    role: Optional[str] = None  # "callee" or "caller" once the speakers are identified
+
+class Transcript(BaseModel):
+    """Model representing the transcription of a call."""
+    utterances: list[Utterance]
+    channels: int
+    duration: Optional[float] = None
+    request_id: Optional[str] = None
+
+    @classmethod
+    def from_deepgram(cls, data: dict) -> "Transcript":
+        """
+        Builds a transcript from a DeepGram response with utterances enabled.
+
+        Args:
+            data (dict): The JSON response from DeepGram.
+
+        Returns:
+            Transcript: The compact transcript.
+        """
+        metadata = data.get("metadata", {})
+        utterances = [
+            Utterance(
+                channel=utterance.get("channel", 0),
+                start=utterance.get("start", 0.0),
+                end=utterance.get("end", 0.0),
+                transcript=utterance.get("transcript", ""),
+                confidence=utterance.get("confidence")
+            )
+            for utterance in data.get("results", {}).get("utterances", [])
+        ]
+        channels = metadata.get("channels") or len(data.get("results", {}).get("channels", [])) or \
+            len({utterance.channel for utterance in utterances})
+        return cls(
+            utterances=utterances,
+            channels=channels,
+            duration=metadata.get("duration"),
+            request_id=metadata.get("request_id")
+        )
+
+    def to_text(self) -> str:
+        """
+        Renders the transcript in the "[Speaker <channel>] <text>" format used by the parse prompts,
+        or "[Callee] <text>" and "[Caller] <text>" for utterances tagged with their speaker's role.
+
+        Returns:
+            str: One line per utterance.
+        """
+        return "".join(
+            f"[{utterance.role.capitalize() if utterance.role else f'Speaker {utterance.channel}'}] {utterance.transcript}\n"
+            for utterance in self.utterances
+        )
+
+class CallResult(BaseModel):
+    """Model representing a placed call and, once transcribed, its transcript."""
+    call_id: str
+    prompt: str
+    output_dir: str
+    placed_at: float
+    number: Optional[str] = None
+    audio_available_at: Optional[float] = None
+    transcribed_at: Optional[float] = None
+    transcript: Optional[Transcript] = None
+
+    @property
+    def wait_seconds(self) -> Optional[float]:
+        """Seconds from placing the call until its recording was available."""
+        return None if self.audio_available_at is None else self.audio_available_at - self.placed_at
+
+    @property
+    def transcription_seconds(self) -> Optional[float]:
+        """Seconds spent downloading and transcribing the recording."""
+        if self.transcribed_at is None or self.audio_available_at is None:
+            return None
+        return self.transcribed_at - self.audio_available_at
+
+class TranscriptArchive:
+    """
+    An optional sink that writes call artifacts to disk on a background thread, so archiving
+    never blocks the exploration loop.
+
+    Attributes:
+        enabled (bool): Whether anything is written at all.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            path, content = item
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                with open(path, "w") as f:
+                    f.write(content)
+                logger.debug(f"Archived {path}")
+            except Exception as e:
+                logger.error(f"Error archiving {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def save_text(self, path: str, content: str):
+        """
+        Queues a text file to be written.
+
+        Args:
+            path (str): Where to write the file.
+            content (str): The file content.
+        """
+        if not self.enabled:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="transcript-archive", daemon=True)
+            self._thread.start()
+        self._queue.put((path, content))
+
+    def save_call(self, result: CallResult):
+        """
+        Queues a call's transcript, as text and as JSON, to be written to its output directory.
+
+        Args:
+            result (CallResult): The transcribed call.
+        """
+        if result.transcript is None:
+            return
+        self.save_text(os.path.join(result.output_dir, "transcription_output.txt"), result.transcript.to_text())
+        self.save_text(os.path.join(result.output_dir, "call_result.json"), result.model_dump_json())
+
+    def close(self):
+        """Writes everything still queued and stops the background thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
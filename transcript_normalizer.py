@@ -0,0 +1,215 @@
+import datetime, logging, os, re
+from typing import Iterable, Optional
+from transcript import Transcript, Utterance
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/transcript_normalizer_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Sentences that carry nothing for the decision tree, formerly listed in the parse prompt for the model to ignore
+FILLER_PHRASES = (
+    "I am sorry",
+    "I am not sure",
+    "I do not know",
+    "I do not understand",
+    "how can i help you?",
+    "how can i assist you?",
+    "how can i help you today?",
+    "how can i assist you today?",
+    "Thank you",
+    "Have a great day!",
+    "Goodbye!",
+    "goodbye and thank you",
+    "Is there anything else I can help you with?",
+    "Is there anything else I can help you with today?",
+    "Is there anything else I can assist you with?",
+    "Is there anything else I can assist you with today?",
+    "Thank you for your help",
+)
+CONTRACTIONS = {
+    "i'm": "i am", "don't": "do not", "doesn't": "does not", "didn't": "did not", "can't": "can not",
+    "cannot": "can not", "won't": "will not", "it's": "it is", "that's": "that is", "you're": "you are",
+    "we're": "we are", "i'll": "i will", "i'd": "i would", "i've": "i have", "what's": "what is",
+}
+_WORD = re.compile(r"[a-z0-9']+")
+_SENTENCE = re.compile(r"[^.?!]+[.?!]*")
+_SENTENCE_END = re.compile(r"(?<!\.\.)[.?!][\"')\]]*\s*$")  # A trailing "..." marks a cut-off
+
+def _words(text: str) -> tuple[str, ...]:
+    words = []
+    for word in _WORD.findall(text.lower().replace("’", "'")):
+        words.extend(CONTRACTIONS.get(word, word).split())
+    return tuple(words)
+
+def _sentences(text: str) -> list[str]:
+    return [sentence.strip() for sentence in _SENTENCE.findall(text) if sentence.strip()]
+
+def _starts_with(words: tuple[str, ...], prefix: tuple[str, ...]) -> bool:
+    # The last word of a cut-off utterance may itself be cut off, e.g. "could I plea"
+    if len(words) < len(prefix):
+        return False
+    return words[:len(prefix) - 1] == prefix[:-1] and words[len(prefix) - 1].startswith(prefix[-1])
+
+class TranscriptNormalizer:
+    """
+    A deterministic clean-up of DeepGram transcripts before they are parsed, so the LLM reads fewer tokens.
+
+    Three passes run in order:
+        1. Utterances cut off and then repeated in full by the same speaker right after are dropped,
+           e.g. "Are you an existing" before "Are you an existing customer with us?". An utterance counts
+           as cut off only if it has several words, does not end a sentence, and the speaker's next
+           utterance starts with it and goes on. Complete answers such as "No." are always kept.
+        2. Sentences that are only a filler phrase are removed, and utterances left empty are dropped.
+        3. Consecutive utterances of the same speaker with at most merge_gap_seconds of silence between
+           them are merged into one, so the transcript has one line per turn.
+
+    Phrases are compared on their lowercased words with contractions expanded, ignoring punctuation.
+
+    Attributes:
+        filler_phrases (tuple[str, ...]): Sentences to remove.
+        merge_gap_seconds (float): Longest pause between two fragments of one turn.
+        repeat_window_seconds (float): Longest pause between a cut-off utterance and its full repeat.
+        max_fragment_words (int): Longest utterance that can count as cut off.
+    """
+
+    def __init__(
+        self,
+        filler_phrases: Iterable[str] = FILLER_PHRASES,
+        merge_gap_seconds: float = 2.0,
+        repeat_window_seconds: float = 30.0,
+        max_fragment_words: int = 8
+    ):
+        self.filler_phrases = tuple(filler_phrases)
+        self.merge_gap_seconds = merge_gap_seconds
+        self.repeat_window_seconds = repeat_window_seconds
+        self.max_fragment_words = max_fragment_words
+        self._fillers = {_words(phrase) for phrase in self.filler_phrases}
+
+    def _repeated_later(self, index: int, words: tuple[str, ...], utterances: list[Utterance]) -> bool:
+        # Only the speaker's next utterance counts, and it must go on past the fragment: a later
+        # sentence starting the same way, e.g. "No, it is not urgent." after "No.", is a new answer
+        utterance = utterances[index]
+        for later in utterances[index + 1:]:
+            if later.start - utterance.end > self.repeat_window_seconds:
+                return False
+            if later.channel != utterance.channel:
+                continue
+            sentences = _sentences(later.transcript)
+            sentence_words = _words(sentences[0]) if sentences else ()
+            return len(sentence_words) > len(words) and _starts_with(sentence_words, words)
+        return False
+
+    def _is_truncated(self, utterance: Utterance, words: tuple[str, ...]) -> bool:
+        # A finished sentence, or a single word like "No" or "Yes", is an answer and never a fragment
+        if not 1 < len(words) <= self.max_fragment_words:
+            return False
+        return not _SENTENCE_END.search(utterance.transcript)
+
+    def drop_truncated_repeats(self, utterances: list[Utterance]) -> list[Utterance]:
+        """
+        Drops the empty utterances and the cut-off utterances the same speaker repeated in full right after.
+
+        Args:
+            utterances (list[Utterance]): The utterances in call order.
+
+        Returns:
+            list[Utterance]: The remaining utterances.
+        """
+        kept = []
+        for index, utterance in enumerate(utterances):
+            words = _words(utterance.transcript)
+            if not words:
+                continue
+            if self._is_truncated(utterance, words) and self._repeated_later(index, words, utterances):
+                logger.debug(f"Dropping truncated repeat '{utterance.transcript}' of speaker {utterance.channel}")
+                continue
+            kept.append(utterance)
+        return kept
+
+    def strip_fillers(self, utterances: list[Utterance]) -> list[Utterance]:
+        """
+        Removes the sentences that are only a filler phrase.
+
+        Args:
+            utterances (list[Utterance]): The utterances in call order.
+
+        Returns:
+            list[Utterance]: The utterances without filler sentences, those left empty dropped.
+        """
+        stripped = []
+        for utterance in utterances:
+            sentences = _sentences(utterance.transcript)
+            kept = [sentence for sentence in sentences if _words(sentence) not in self._fillers]
+            if len(kept) == len(sentences):
+                stripped.append(utterance)
+            elif kept:
+                stripped.append(utterance.model_copy(update={"transcript": " ".join(kept)}))
+        return stripped
+
+    def merge_fragments(self, utterances: list[Utterance]) -> list[Utterance]:
+        """
+        Merges consecutive utterances of the same speaker separated by a short pause.
+
+        Args:
+            utterances (list[Utterance]): The utterances in call order.
+
+        Returns:
+            list[Utterance]: The merged utterances, spanning the time of their fragments.
+        """
+        merged: list[Utterance] = []
+        for utterance in utterances:
+            previous = merged[-1] if merged else None
+            if previous is None or previous.channel != utterance.channel or utterance.start - previous.end > self.merge_gap_seconds:
+                merged.append(utterance)
+                continue
+            confidences = [c for c in (previous.confidence, utterance.confidence) if c is not None]
+            merged[-1] = previous.model_copy(update={
+                "end": max(previous.end, utterance.end),
+                "transcript": f"{previous.transcript} {utterance.transcript}",
+                "confidence": min(confidences) if confidences else None
+            })
+        return merged
+
+    def normalize(self, transcript: Transcript) -> Transcript:
+        """
+        Runs the three passes over a transcript.
+
+        Args:
+            transcript (Transcript): The transcript as returned by DeepGram.
+
+        Returns:
+            Transcript: A normalized copy, the original is left unchanged.
+        """
+        utterances = self.drop_truncated_repeats(transcript.utterances)
+        utterances = self.strip_fillers(utterances)
+        utterances = self.merge_fragments(utterances)
+        normalized = transcript.model_copy(update={"utterances": utterances})
+        logger.info(
+            f"Normalized transcript from {len(transcript.utterances)} to {len(utterances)} utterances, "
+            f"{len(transcript.to_text())} to {len(normalized.to_text())} characters"
+        )
+        return normalized
+
+def transcript_normalizer_from_env() -> Optional[TranscriptNormalizer]:
+    """
+    Builds the normalizer used by main.py. NORMALIZE_TRANSCRIPTS (default true) turns it on,
+    TRANSCRIPT_MERGE_GAP_SECONDS sets the longest pause within a turn, and TRANSCRIPT_FILLER_PHRASES
+    replaces the filler phrases with a "|"-separated list.
+
+    Returns:
+        Optional[TranscriptNormalizer]: The normalizer, or None if disabled.
+    """
+    if os.environ.get("NORMALIZE_TRANSCRIPTS", "true").lower() != "true":
+        return None
+    filler_phrases = os.environ.get("TRANSCRIPT_FILLER_PHRASES")
+    return TranscriptNormalizer(
+        filler_phrases=[phrase.strip() for phrase in filler_phrases.split("|") if phrase.strip()] if filler_phrases else FILLER_PHRASES,
+        merge_gap_seconds=float(os.environ.get("TRANSCRIPT_MERGE_GAP_SECONDS", "2"))
+    )
@@ -0,0 +1,177 @@
+import datetime, json, logging
+from collections import Counter
+from typing import Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/tree_encoding_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+TYPE_CODES = {"question": "q", "action": "a", "inquiry": "i"}
+
+ENCODING_LEGEND = """Tree format: one node per line as `<id> <type> <label> -> <child id>[<condition>] ...`.
+Types: q = question asked by the callee, a = action done by the callee, i = inquiry made by the caller.
+`$n` refers to entry n of the `strings` table. `*` marks a frontier node whose branches are not fully explored yet.
+`[explored: n nodes]` stands for a fully explored subtree whose nodes are not listed. New node ids must start at `next_id`."""
+
+def _node_id(node: dict) -> str:
+    return str(node["id"])
+
+def _node_type(node: dict) -> str:
+    node_type = node.get("type", "")
+    return getattr(node_type, "value", node_type)
+
+def _next_id(node_ids: list[str]) -> int:
+    numeric_ids = [int(node_id) for node_id in node_ids if node_id.lstrip("-").isdigit()]
+    return max(numeric_ids, default=0) + 1
+
+def encode_tree(
+    nodes: list[dict],
+    edges: list[dict],
+    min_branches: int = 2,
+    max_frontier: Optional[int] = 40
+) -> str:
+    """
+    Encodes the decision tree compactly for LLM prompts.
+
+    Labels and conditions used more than once are stored once in a string table, edges are written as
+    adjacency lists, and subtrees without any frontier node are collapsed into a one-line summary.
+    Only frontier decision nodes, those with fewer than min_branches explored branches, and the paths
+    leading to them are written out in full, so the prompt size follows the frontier rather than the tree.
+
+    Node ids are kept as they are because the parser refers back to them when it connects new nodes.
+
+    Args:
+        nodes (list[dict]): Nodes of the tree, with "id", "label" and "type". DecisionNode objects are accepted too.
+        edges (list[dict]): Edges of the tree, with "source_id", "target_id" and "condition". DecisionEdge objects are accepted too.
+        min_branches (int): Number of outgoing branches a question node needs to no longer be a frontier node.
+        max_frontier (Optional[int]): Maximum number of frontier nodes written in full, shallowest first.
+            Subtrees holding only frontier nodes beyond it are summarized. None for no limit.
+
+    Returns:
+        str: The encoded tree, an empty-tree marker if there are no nodes.
+    """
+    if not nodes:
+        return "next_id: 1\n(empty tree)"
+    nodes = [node if isinstance(node, dict) else node.model_dump() for node in nodes]
+    edges = [edge if isinstance(edge, dict) else edge.model_dump() for edge in edges]
+
+    node_by_id: dict[str, dict] = {}
+    for node in nodes:
+        node_by_id.setdefault(_node_id(node), node)
+    children: dict[str, list[tuple[str, Optional[str]]]] = {node_id: [] for node_id in node_by_id}
+    has_parent: set[str] = set()
+    for edge in edges:
+        source, target = str(edge["source_id"]), str(edge["target_id"])
+        if source not in node_by_id or target not in node_by_id:
+            continue
+        if (target, edge.get("condition")) in children[source]:
+            continue
+        children[source].append((target, edge.get("condition")))
+        if target != source:
+            has_parent.add(target)
+
+    roots = [node_id for node_id in node_by_id if node_id not in has_parent]
+    # Nodes only reachable through cycles still need a root
+    reachable: set[str] = set()
+    order: list[str] = []
+    depth: dict[str, int] = {}
+
+    def walk(start: str):
+        stack = [(start, 0)]
+        while stack:
+            node_id, level = stack.pop()
+            if node_id in reachable:
+                continue
+            reachable.add(node_id)
+            order.append(node_id)
+            depth[node_id] = level
+            for child_id, _ in reversed(children[node_id]):
+                if child_id not in reachable:
+                    stack.append((child_id, level + 1))
+
+    for root in roots:
+        walk(root)
+    for node_id in node_by_id:
+        if node_id not in reachable:
+            roots.append(node_id)
+            walk(node_id)
+
+    def is_frontier(node_id: str) -> bool:
+        node = node_by_id[node_id]
+        if _node_type(node) == "question":
+            return len(children[node_id]) < min_branches
+        return False
+
+    frontier = [node_id for node_id in order if is_frontier(node_id)]
+    frontier.sort(key=lambda node_id: depth[node_id])
+    detailed_frontier = set(frontier if max_frontier is None else frontier[:max_frontier])
+
+    # Walk the DFS order backwards so every child is settled before its parent
+    subtree_size: dict[str, int] = {}
+    keep: set[str] = set()
+    for node_id in reversed(order):
+        size = 1
+        for child_id, _ in children[node_id]:
+            if child_id in subtree_size and depth.get(child_id, 0) > depth[node_id]:
+                size += subtree_size[child_id]
+                if child_id in keep:
+                    keep.add(node_id)
+        subtree_size[node_id] = size
+        if node_id in detailed_frontier:
+            keep.add(node_id)
+
+    strings = Counter()
+    for node_id in keep:
+        strings[node_by_id[node_id].get("label") or ""] += 1
+        for child_id, condition in children[node_id]:
+            if condition:
+                strings[condition] += 1
+    table = [text for text, count in strings.most_common() if count > 1 and len(text) > 3]
+    table_index = {text: i for i, text in enumerate(table)}
+
+    def ref(text: str) -> str:
+        return f"${table_index[text]}" if text in table_index else json.dumps(text, ensure_ascii=False)
+
+    lines = [f"next_id: {_next_id(list(node_by_id))}"]
+    if table:
+        lines.append("strings: " + " ".join(f"${i}={json.dumps(text, ensure_ascii=False)}" for i, text in enumerate(table)))
+
+    written: set[str] = set()
+    for node_id in order:
+        if node_id in written:
+            continue
+        node = node_by_id[node_id]
+        code = TYPE_CODES.get(_node_type(node), "?")
+        label = ref(node.get("label") or "")
+        is_root = node_id in roots
+        if node_id not in keep and not is_root:
+            continue
+        written.add(node_id)
+        if node_id not in keep:
+            lines.append(f"{node_id} {code} {label} [explored: {subtree_size[node_id] - 1} nodes]")
+            continue
+        branches = []
+        for child_id, condition in children[node_id]:
+            branch = child_id + (f"[{ref(condition)}]" if condition else "")
+            if child_id not in keep and child_id not in written and depth.get(child_id, 0) > depth[node_id]:
+                child = node_by_id[child_id]
+                branch += f"({TYPE_CODES.get(_node_type(child), '?')} {ref(child.get('label') or '')}"
+                branch += f", explored: {subtree_size[child_id] - 1} nodes)" if subtree_size[child_id] > 1 else ")"
+                written.add(child_id)
+            branches.append(branch)
+        marker = " *" if node_id in frontier else ""
+        lines.append(f"{node_id} {code} {label}" + (" -> " + " ".join(branches) if branches else "") + marker)
+
+    skipped_frontier = len(frontier) - len(detailed_frontier)
+    if skipped_frontier > 0:
+        lines.append(f"({skipped_frontier} deeper frontier nodes not shown)")
+    encoded = "\n".join(lines)
+    logger.debug(f"Encoded tree with {len(node_by_id)} nodes into {len(encoded)} characters")
+    return encoded
@@ -1,6 +1,11 @@
-import os, datetime, logging, json
-from DecisionTree import DecisionNode, DecisionEdge, DecisionTree
-from openai import OpenAI
+import os, datetime, logging, json, re
+from typing import Optional
+from DecisionTree import DecisionNode, DecisionEdge, DecisionTree, DecisionTreeUpdate
+from llm_clients import llm_clients
+from llm_cache import get_llm_cache, LLMCacheMiss
+from tree_encoding import encode_tree, ENCODING_LEGEND
+from label_index import LabelIndex
+from transcript_normalizer import FILLER_PHRASES
 import openai
 import streamlit as st
 
@@ -32,7 +37,164 @@ draw_edge_tool["function"]["parameters"]["properties"]["source_id"]["description
 draw_edge_tool["function"]["parameters"]["properties"]["target_id"]["description"] = """The id of the target node."""
 draw_edge_tool["function"]["parameters"]["properties"]["condition"]["description"] = """The condition of the edge."""
 
-def parse_nodes_and_edges(api_key: str, model_name: str, conversation: str, nodes: list[DecisionNode], edges: list[DecisionEdge]) -> list[DecisionNode]:
+PARSE_INSTRUCTION = """
+    <context>
+    We are trying to draw a decision tree for a business AI agent.
+    Each node in the decision tree is either a question or an action.
+    The decision describes the actions that the callee agent can take and the conditions that lead to different actions.
+    Each inquiry is an inquiry made by the caller, they should not be sequential but should be parallel. As in there should be a common node that connects all the inquiries.
+    </context>
+
+    <instructions>
+    You are given a conversation between a business AI agent (callee) and a tester AI agent (caller).
+    Lines tagged [Callee] are said by the business AI agent, lines tagged [Caller] by the tester AI agent.
+    You are also given a list of nodes and edges that represent the current decision tree.
+    Your task is to add new nodes and edges to the decision tree based on the given text if necessary.
+    You should not add duplicate nodes to the decision tree, this includes the same and very similar nodes. If there are nodes with the same meaning, you should not add new ones.
+    Each node should have a single action or question.
+    Each node's label should be in third person or no person.
+    The edges represents the decision path between the nodes.
+    You should only refer to the examples but not copying the content.
+    Do not have duplicate node ids.
+    You can output zero nodes and edges if no new ones are needed.
+    Ignore all phrases that are not related to the business context.
+    </instructions>
+    
+    <description>
+    node: To get a node in the decision tree.
+    'id' of node = The id of the node. It is just a unique integer.
+    'label' of node = The label of the node. It should be summarised and concise.
+    'type' of node = [question: The node is a question asked by the callee agent.
+    action: The node is an action done by the callee agent.
+    inquiry: The node is an inquiry made by the caller.
+    ]
+    edge: To get an edge in the decision tree.
+    'source_id' of edge = The id of the source node.
+    'target_id' of edge = The id of the target node.
+    'condition' of edge = The condition of the edge, it can be a question asked by the caller or a condition that leads to the action.
+    </description>
+
+    <node format>
+    {"id": "_", "label": "_", "type": "_"}
+    </node format>
+
+    <edge format>
+    {"source_id": "_", "target_id": "_", "condition": "_"}
+    </edge format>
+    
+    """
+
+# Only sent when the transcript was not normalized, as TranscriptNormalizer removes these phrases itself
+IGNORE_PHRASES_INSTRUCTION = """
+    <ignore these phrases>
+    Ignore all filler words and phrases.
+""" + "".join(f'    - "{phrase}"\n' for phrase in FILLER_PHRASES) + """    </ignore these phrases>
+    """
+
+SIMILAR_LABELS_PER_SENTENCE = 3
+SIMILAR_LABELS_LIMIT = 12
+SIMILAR_LABELS_MIN_SIMILARITY = 0.3
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.?!])\s+|\n|\[(?:Speaker \d+|Callee|Caller)\]")
+
+def similar_existing_labels(conversation: str, label_index: LabelIndex) -> list[tuple[str, str]]:
+    """
+    Looks up the existing nodes most similar to the sentences of a conversation, the ones the LLM
+    is most likely to add again under a slightly different label.
+
+    Args:
+        conversation (str): The conversation.
+        label_index (LabelIndex): The tree's label index.
+
+    Returns:
+        list[tuple[str, str]]: (node id, label) of at most SIMILAR_LABELS_LIMIT nodes, most similar first.
+    """
+    best: dict[str, tuple[float, str]] = {}
+    for sentence in _SENTENCE_BOUNDARY.split(conversation):
+        if len(sentence.split()) < 2:
+            continue
+        for node_id, label, similarity in label_index.similar(
+            sentence, k=SIMILAR_LABELS_PER_SENTENCE, min_similarity=SIMILAR_LABELS_MIN_SIMILARITY
+        ):
+            if similarity > best.get(node_id, (0.0, ""))[0]:
+                best[node_id] = (similarity, label)
+    ranked = sorted(best.items(), key=lambda item: -item[1][0])[:SIMILAR_LABELS_LIMIT]
+    return [(node_id, label) for node_id, (_, label) in ranked]
+
+def _parse_messages(
+    conversation: str,
+    nodes: list[DecisionNode],
+    edges: list[DecisionEdge],
+    label_index: Optional[LabelIndex] = None,
+    context: Optional[str] = None,
+    fillers_removed: bool = False
+) -> list[dict]:
+    tree_text = f"current decision tree:\n{ENCODING_LEGEND}\n{encode_tree(nodes, edges)}"
+    similar = similar_existing_labels(conversation, label_index) if label_index is not None else []
+    if similar:
+        # The encoding collapses explored subtrees, these are the hidden labels the conversation is closest to
+        listing = "\n".join(f'{node_id} "{label}"' for node_id, label in similar)
+        tree_text += f"\n\nexisting nodes similar to this conversation, reuse their ids instead of adding them again:\n{listing}"
+    return [
+        {
+            "role": "user",
+            "content": PARSE_INSTRUCTION if fillers_removed else PARSE_INSTRUCTION + IGNORE_PHRASES_INSTRUCTION,
+        },
+        {
+            "role": "user",
+            "content": (f"{context}\n\n" if context else "") + f"The conversation is {conversation}\n\n{tree_text}",
+        },
+    ]
+
+STRUCTURED_OUTPUT_INSTRUCTION = """
+    Return the new nodes and edges directly as structured output.
+    Node ids must be unique integers written as strings, and must not reuse the ids of existing nodes.
+    Edges may connect new nodes to existing nodes by their existing ids.
+    Return empty lists if no new nodes and edges are needed.
+    """
+
+def _tree_update_to_dicts(update: DecisionTreeUpdate) -> tuple[Optional[list[dict]], Optional[list[dict]]]:
+    nodes = [node.model_dump(mode="json") for node in update.nodes]
+    edges = [edge.model_dump(mode="json") for edge in update.edges]
+    logger.debug(f"Extracted tree update: nodes={nodes}, edges={edges}")
+    return nodes or None, edges or None
+
+def _nodes_messages(text: str) -> list[dict]:
+    return [
+        {
+            "role": "system",
+            "content": """
+            Extract all the nodes from the given text.
+            The nodes should follow the format of {"id": _, "label": _, "type": _}
+            """,
+        },
+        {
+            "role": "user",
+            "content": f"The text is {text}",
+        },
+    ]
+
+def _edges_messages(text: str) -> list[dict]:
+    return [
+        {
+            "role": "system",
+            "content": """
+            Extract all the edges from the given text.
+            The edges should follow the format of {"source_id": _, "target_id": _, "condition": _}
+            """,
+        },
+        {
+            "role": "user",
+            "content": f"The text is {text}",
+        },
+    ]
+
+def _tool_call_arguments(response) -> Optional[list[dict]]:
+    result = response.choices[0].message.tool_calls
+    if result:
+        return [json.loads(tool_call.function.arguments) for tool_call in result]
+    return None
+
+def parse_nodes_and_edges(api_key: str, model_name: str, conversation: str, nodes: list[DecisionNode], edges: list[DecisionEdge], label_index: Optional[LabelIndex] = None, context: Optional[str] = None, fillers_removed: bool = False) -> list[DecisionNode]:
     """
     Parses a given text into a predefined decision tree JSON structure using the specified generative model.
 
@@ -42,101 +204,64 @@ def parse_nodes_and_edges(api_key: str, model_name: str, conversation: str, node
         conversation (str): The current conversation to be analyzed.
         nodes (list[DecisionNode]): A list of nodes in the decision tree.
         edges (list[DecisionEdge]): A list of edges in the decision tree.
+        label_index (Optional[LabelIndex]): The tree's label index, to list the existing labels most similar to the conversation.
+        context (Optional[str]): Where the conversation stands, when it is one part of a longer call.
+        fillers_removed (bool): Whether a TranscriptNormalizer already removed the filler phrases, else the prompt lists them to ignore.
 
     Returns:
         list[DecisionNode]: A list of nodes in the decision tree.
     """
     try:
-        logger.debug("Initializing OpenAI client.")
-        client = OpenAI(api_key=api_key)
-
-        system_instruction = """
-        <context>
-        We are trying to draw a decision tree for a business AI agent.
-        Each node in the decision tree is either a question or an action.
-        The decision describes the actions that the callee agent can take and the conditions that lead to different actions.
-        Each inquiry is an inquiry made by the caller, they should not be sequential but should be parallel. As in there should be a common node that connects all the inquiries.
-        </context>
-
-        <instructions>
-        You are given a conversation between a business AI agent (callee) and a tester AI agent (caller).
-        You are also given a list of nodes and edges that represent the current decision tree.
-        Your task is to add new nodes and edges to the decision tree based on the given text if necessary.
-        You should not add duplicate nodes to the decision tree, this includes the same and very similar nodes. If there are nodes with the same meaning, you should not add new ones.
-        Each node should have a single action or question.
-        Each node's label should be in third person or no person.
-        The edges represents the decision path between the nodes.
-        You should only refer to the examples but not copying the content.
-        Do not have duplicate node ids.
-        You can output zero nodes and edges if no new ones are needed.
-        </instructions>
-        
-        <description>
-        node: To get a node in the decision tree.
-        'id' of node = The id of the node. It is just a unique integer.
-        'label' of node = The label of the node. It should be summarised and concise.
-        'type' of node = [question: The node is a question asked by the callee agent.
-        action: The node is an action done by the callee agent.
-        inquiry: The node is an inquiry made by the caller.
-        ]
-        edge: To get an edge in the decision tree.
-        'source_id' of edge = The id of the source node.
-        'target_id' of edge = The id of the target node.
-        'condition' of edge = The condition of the edge, it can be a question asked by the caller or a condition that leads to the action.
-        </description>
-
-        <node format>
-        {"id": "_", "label": "_", "type": "_"}
-        </node format>
-
-        <edge format>
-        {"source_id": "_", "target_id": "_", "condition": "_"}
-        </edge format>
-        
-        <duplicate nodes example>
-        - "existing customer?" and "existing customer with us?" are considered duplicate nodes.
-        </duplicate nodes example>
-
-        <ignore these phrases>
-        Ignore all filler words and phrases.
-        Ignore all phrases that are not related to the business context.
-        - "I am sorry"
-        - "I am not sure"
-        - "I do not know"
-        - "I do not understand"
-        - "how can i help you?"
-        - "how can i assist you?"
-        - "how can i help you today?"
-        - "how can i assist you today?"
-        - "Thank you"
-        - "Have a great day!"
-        - "Goodbye!"
-        - "goodbye and thank you"
-        - "Is there anything else I can help you with?"
-        </ignore these phrases>
-        """
-        
+        client = llm_clients.client(api_key)
         logger.debug("Creating chat completion request.")
-        response = client.chat.completions.create(
+        response = get_llm_cache().complete(
+            client, llm_clients.thread_semaphore(model_name),
             model=model_name,
-            messages=[
-                {
-                    "role": "user",
-                    "content": system_instruction,
-                },
-                {
-                    "role": "user",
-                    "content": f"The conversation is {conversation}, current decision tree: [nodes: {nodes}, edges: {edges}]",
-                },
-            ]
+            messages=_parse_messages(conversation, nodes, edges, label_index, context, fillers_removed)
         )
         logger.debug("Chat completion received successfully.")
         return response.choices[0].message.content
     
+    except LLMCacheMiss:
+        raise
     except Exception as e:
         logger.error(f"Error in parse_nodes_and_edges: {e}", exc_info=True)
         return []
 
+async def parse_nodes_and_edges_async(api_key: str, model_name: str, conversation: str, nodes: list[DecisionNode], edges: list[DecisionEdge], label_index: Optional[LabelIndex] = None, context: Optional[str] = None, fillers_removed: bool = False) -> list[DecisionNode]:
+    """
+    Async version of parse_nodes_and_edges, using the shared AsyncOpenAI client.
+
+    Args:
+        api_key (str): The API key for authenticating with the generative model.
+        model_name (str): The name of the generative model to use.
+        conversation (str): The current conversation to be analyzed.
+        nodes (list[DecisionNode]): A list of nodes in the decision tree.
+        edges (list[DecisionEdge]): A list of edges in the decision tree.
+        label_index (Optional[LabelIndex]): The tree's label index, to list the existing labels most similar to the conversation.
+        context (Optional[str]): Where the conversation stands, when it is one part of a longer call.
+        fillers_removed (bool): Whether a TranscriptNormalizer already removed the filler phrases, else the prompt lists them to ignore.
+
+    Returns:
+        list[DecisionNode]: A list of nodes in the decision tree.
+    """
+    try:
+        client = llm_clients.async_client(api_key)
+        logger.debug("Creating async chat completion request.")
+        response = await get_llm_cache().complete_async(
+            client, llm_clients.semaphore(model_name),
+            model=model_name,
+            messages=_parse_messages(conversation, nodes, edges, label_index, context, fillers_removed)
+        )
+        logger.debug("Chat completion received successfully.")
+        return response.choices[0].message.content
+
+    except LLMCacheMiss:
+        raise
+    except Exception as e:
+        logger.error(f"Error in parse_nodes_and_edges_async: {e}", exc_info=True)
+        return []
+
 def get_nodes(api_key: str, model_name: str, text: str) -> list[DecisionNode]:
     """
     Extracts all nodes from the given text using the specified generative model.
@@ -150,44 +275,65 @@ def get_nodes(api_key: str, model_name: str, text: str) -> list[DecisionNode]:
         list[DecisionNode]: A list of extracted nodes or None if no nodes are found.
     """
     try:
-        logger.debug("Initializing OpenAI client for get_nodes.")
-        client = OpenAI(api_key=api_key)
-
+        client = llm_clients.client(api_key)
         logger.debug("Creating chat completion request for nodes extraction.")
-        response = client.chat.completions.create(
+        response = get_llm_cache().complete(
+            client, llm_clients.thread_semaphore(model_name),
             model=model_name,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """
-                    Extract all the nodes from the given text.
-                    The nodes should follow the format of {"id": _, "label": _, "type": _}
-                    """,
-                },
-                {
-                    "role": "user",
-                    "content": f"The text is {text}",
-                },
-            ],
+            messages=_nodes_messages(text),
             tools=[draw_node_tool],
             tool_choice="required",
         )
 
-        result = response.choices[0].message.tool_calls
-        if result:
-            nodes = []
-            for tool_call in result:
-                node_data = json.loads(tool_call.function.arguments)
-                nodes.append(node_data)
+        nodes = _tool_call_arguments(response)
+        if nodes:
             logger.debug(f"Extracted nodes: {nodes}")
             return nodes
         logger.debug("No nodes extracted.")
         return None
 
+    except LLMCacheMiss:
+        raise
     except Exception as e:
         logger.error(f"Error in get_nodes: {e}", exc_info=True)
         return None
 
+async def get_nodes_async(api_key: str, model_name: str, text: str) -> list[DecisionNode]:
+    """
+    Async version of get_nodes, using the shared AsyncOpenAI client.
+
+    Args:
+        api_key (str): The API key for authenticating with the generative model.
+        model_name (str): The name of the generative model to use.
+        text (str): The text to extract nodes from.
+
+    Returns:
+        list[DecisionNode]: A list of extracted nodes or None if no nodes are found.
+    """
+    try:
+        client = llm_clients.async_client(api_key)
+        logger.debug("Creating async chat completion request for nodes extraction.")
+        response = await get_llm_cache().complete_async(
+            client, llm_clients.semaphore(model_name),
+            model=model_name,
+            messages=_nodes_messages(text),
+            tools=[draw_node_tool],
+            tool_choice="required",
+        )
+
+        nodes = _tool_call_arguments(response)
+        if nodes:
+            logger.debug(f"Extracted nodes: {nodes}")
+            return nodes
+        logger.debug("No nodes extracted.")
+        return None
+
+    except LLMCacheMiss:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_nodes_async: {e}", exc_info=True)
+        return None
+
 def get_edges(api_key: str, model_name: str, text: str) -> list[DecisionEdge]:
     """
     Extracts all edges from the given text using the specified generative model.
@@ -201,48 +347,163 @@ def get_edges(api_key: str, model_name: str, text: str) -> list[DecisionEdge]:
         list[DecisionEdge]: A list of extracted edges or None if no edges are found.
     """
     try:
-        logger.debug("Initializing OpenAI client for get_edges.")
-        client = OpenAI(api_key=api_key)
-
+        client = llm_clients.client(api_key)
         logger.debug("Creating chat completion request for edges extraction.")
-        response = client.chat.completions.create(
+        response = get_llm_cache().complete(
+            client, llm_clients.thread_semaphore(model_name),
             model=model_name,
-            messages=[
-                {
-                    "role": "system",
-                    "content": """
-                    Extract all the edges from the given text.
-                    The edges should follow the format of {"source_id": _, "target_id": _, "condition": _}
-                    """,
-                },
-                {
-                    "role": "user",
-                    "content": f"The text is {text}",
-                },
-            ],
+            messages=_edges_messages(text),
             tools=[draw_edge_tool],
             tool_choice="auto",
         )
 
-        result = response.choices[0].message.tool_calls
-        if result:
-            edges = []
-            for tool_call in result:
-                edge_data = json.loads(tool_call.function.arguments)
-                edges.append(edge_data)
+        edges = _tool_call_arguments(response)
+        if edges:
             logger.debug(f"Extracted edges: {edges}")
             return edges
         logger.debug("No edges extracted.")
         return None
 
+    except LLMCacheMiss:
+        raise
     except Exception as e:
         logger.error(f"Error in get_edges: {e}", exc_info=True)
         return None
 
+async def get_edges_async(api_key: str, model_name: str, text: str) -> list[DecisionEdge]:
+    """
+    Async version of get_edges, using the shared AsyncOpenAI client.
+
+    Args:
+        api_key (str): The API key for authenticating with the generative model.
+        model_name (str): The name of the generative model to use.
+        text (str): The text to extract edges from.
+
+    Returns:
+        list[DecisionEdge]: A list of extracted edges or None if no edges are found.
+    """
+    try:
+        client = llm_clients.async_client(api_key)
+        logger.debug("Creating async chat completion request for edges extraction.")
+        response = await get_llm_cache().complete_async(
+            client, llm_clients.semaphore(model_name),
+            model=model_name,
+            messages=_edges_messages(text),
+            tools=[draw_edge_tool],
+            tool_choice="auto",
+        )
+
+        edges = _tool_call_arguments(response)
+        if edges:
+            logger.debug(f"Extracted edges: {edges}")
+            return edges
+        logger.debug("No edges extracted.")
+        return None
+
+    except LLMCacheMiss:
+        raise
+    except Exception as e:
+        logger.error(f"Error in get_edges_async: {e}", exc_info=True)
+        return None
+
+def extract_tree(api_key: str, model_name: str, conversation: str, nodes: list[DecisionNode], edges: list[DecisionEdge], label_index: Optional[LabelIndex] = None, context: Optional[str] = None, fillers_removed: bool = False) -> Optional[tuple[Optional[list[dict]], Optional[list[dict]]]]:
+    """
+    Extracts new nodes and edges from a conversation in a single structured-output request,
+    replacing the parse_nodes_and_edges -> get_nodes / get_edges chain.
+    The response is validated against DecisionTreeUpdate.
+
+    Args:
+        api_key (str): The API key for authenticating with the generative model.
+        model_name (str): The name of the generative model to use, it must support structured outputs.
+        conversation (str): The current conversation to be analyzed.
+        nodes (list[DecisionNode]): A list of nodes in the decision tree.
+        edges (list[DecisionEdge]): A list of edges in the decision tree.
+        label_index (Optional[LabelIndex]): The tree's label index, to list the existing labels most similar to the conversation.
+        context (Optional[str]): Where the conversation stands, when it is one part of a longer call.
+        fillers_removed (bool): Whether a TranscriptNormalizer already removed the filler phrases, else the prompt lists them to ignore.
+
+    Returns:
+        Optional[tuple[Optional[list[dict]], Optional[list[dict]]]]: The new nodes and edges, None where nothing
+        was found, or None altogether if the extraction failed and the chain should be used instead.
+    """
+    try:
+        client = llm_clients.client(api_key)
+        logger.debug("Creating structured chat completion request for tree extraction.")
+        response = get_llm_cache().complete(
+            client, llm_clients.thread_semaphore(model_name),
+            model=model_name,
+            messages=_parse_messages(conversation, nodes, edges, label_index, context, fillers_removed) + [{"role": "user", "content": STRUCTURED_OUTPUT_INSTRUCTION}],
+            response_format=DecisionTreeUpdate,
+        )
+        message = response.choices[0].message
+        if message.parsed is None:
+            logger.warning(f"Structured extraction returned no result: {message.refusal}")
+            return None
+        return _tree_update_to_dicts(message.parsed)
+
+    except LLMCacheMiss:
+        raise
+    except Exception as e:
+        logger.error(f"Error in extract_tree: {e}", exc_info=True)
+        return None
+
+async def extract_tree_async(api_key: str, model_name: str, conversation: str, nodes: list[DecisionNode], edges: list[DecisionEdge], label_index: Optional[LabelIndex] = None, context: Optional[str] = None, fillers_removed: bool = False) -> Optional[tuple[Optional[list[dict]], Optional[list[dict]]]]:
+    """
+    Async version of extract_tree, using the shared AsyncOpenAI client.
+
+    Args:
+        api_key (str): The API key for authenticating with the generative model.
+        model_name (str): The name of the generative model to use, it must support structured outputs.
+        conversation (str): The current conversation to be analyzed.
+        nodes (list[DecisionNode]): A list of nodes in the decision tree.
+        edges (list[DecisionEdge]): A list of edges in the decision tree.
+        label_index (Optional[LabelIndex]): The tree's label index, to list the existing labels most similar to the conversation.
+        context (Optional[str]): Where the conversation stands, when it is one part of a longer call.
+        fillers_removed (bool): Whether a TranscriptNormalizer already removed the filler phrases, else the prompt lists them to ignore.
+
+    Returns:
+        Optional[tuple[Optional[list[dict]], Optional[list[dict]]]]: The new nodes and edges, None where nothing
+        was found, or None altogether if the extraction failed and the chain should be used instead.
+    """
+    try:
+        client = llm_clients.async_client(api_key)
+        logger.debug("Creating async structured chat completion request for tree extraction.")
+        response = await get_llm_cache().complete_async(
+            client, llm_clients.semaphore(model_name),
+            model=model_name,
+            messages=_parse_messages(conversation, nodes, edges, label_index, context, fillers_removed) + [{"role": "user", "content": STRUCTURED_OUTPUT_INSTRUCTION}],
+            response_format=DecisionTreeUpdate,
+        )
+        message = response.choices[0].message
+        if message.parsed is None:
+            logger.warning(f"Structured extraction returned no result: {message.refusal}")
+            return None
+        return _tree_update_to_dicts(message.parsed)
+
+    except LLMCacheMiss:
+        raise
+    except Exception as e:
+        logger.error(f"Error in extract_tree_async: {e}", exc_info=True)
+        return None
+
+def _free_id(tree: DecisionTree, taken: set[str]) -> str:
+    numeric_ids = [int(node_id) for node_id in taken if node_id.isdigit()]
+    candidate = max(numeric_ids, default=0) + 1
+    while tree.has_node(str(candidate)) or str(candidate) in taken:
+        candidate += 1
+    return str(candidate)
+
 def parse_tree(tree: DecisionTree, nodes: list[DecisionNode], edges: list[DecisionEdge]) -> DecisionTree:
     """
     Parses and updates the decision tree with new nodes and edges, ensuring no duplicates.
 
+    A node whose id is already in the tree is merged into the existing node if it has the same label.
+    A node whose label is a near-duplicate of an existing node of the same type, per the tree's label index,
+    is merged into that node. Otherwise a node with a taken id is given a fresh id. The batch's edges are
+    remapped to the merged and fresh ids, and edges already in the tree or turned into self-loops by a merge are dropped.
+    The given lists are updated in place to hold exactly what was added, so callers can append them
+    to their own node and edge lists without duplicating entries.
+
     Args:
         tree (DecisionTree): The decision tree to be updated.
         nodes (list[DecisionNode]): A list of nodes to add to the tree.
@@ -253,36 +514,57 @@ def parse_tree(tree: DecisionTree, nodes: list[DecisionNode], edges: list[Decisi
     """
     try:
         logger.debug("Starting parse_tree process.")
-        # Remove duplicate nodes by creating a set of node IDs that have been seen
+        added_nodes = []
+        remapped_ids = {}
         seen_node_ids = set()
-        unique_nodes = []
-        
+
         for node in nodes:
-            node_id = node["id"]
-            if node_id not in seen_node_ids:
-                seen_node_ids.add(node_id)
-                unique_nodes.append(node)
-            else:
+            node_id = str(node["id"])
+            if node_id in seen_node_ids:
                 logger.debug(f"Duplicate node found and skipped: {node}")
+                continue
+            seen_node_ids.add(node_id)
+            existing = tree.get_node(node_id)
+            if existing is not None and existing.label == node["label"]:
+                logger.debug(f"Node already in the tree, merged: {node}")
+                continue
+            duplicate = tree.label_index.find_duplicate(node["label"], node["type"])
+            if duplicate is not None:
+                logger.debug(f"Near-duplicate of node {duplicate[0]} merged ({duplicate[1]:.2f}): {node}")
+                remapped_ids[node_id] = duplicate[0]
+                continue
+            if existing is not None:
+                new_id = _free_id(tree, seen_node_ids | set(remapped_ids.values()))
+                logger.debug(f"Node id {node_id} already taken, remapped to {new_id}: {node}")
+                remapped_ids[node_id] = new_id
+                node["id"] = node_id = new_id
 
-        nodes = unique_nodes
-        for node in nodes:
             if node["type"] == "question":
-                tree.add_decision_node(node["id"], node["label"])
-                logger.debug(f"Added decision node: {node}")
+                added = tree.add_decision_node(node_id, node["label"])
             elif node["type"] == "action":
-                tree.add_node(node["id"], node["label"])
-                logger.debug(f"Added action node: {node}")
+                added = tree.add_node(node_id, node["label"])
             elif node["type"] == "inquiry":
-                tree.add_inquiry_node(node["id"], node["label"])
-                logger.debug(f"Added inquiry node: {node}")
+                added = tree.add_inquiry_node(node_id, node["label"])
             else:
                 logger.warning(f"Unknown node type encountered: {node}")
+                added = False
+            if added:
+                added_nodes.append(node)
 
+        added_edges = []
         for edge in edges:
-            tree.add_edge(edge["source_id"], edge["target_id"], edge["condition"])
-            logger.debug(f"Added edge: {edge}")
+            edge["source_id"] = remapped_ids.get(str(edge["source_id"]), str(edge["source_id"]))
+            edge["target_id"] = remapped_ids.get(str(edge["target_id"]), str(edge["target_id"]))
+            if edge["source_id"] == edge["target_id"]:
+                logger.debug(f"Self-loop left by a merge skipped: {edge}")
+                continue
+            if tree.add_edge(edge["source_id"], edge["target_id"], edge["condition"]):
+                added_edges.append(edge)
+            else:
+                logger.debug(f"Duplicate edge found and skipped: {edge}")
 
+        nodes[:] = added_nodes
+        edges[:] = added_edges
         logger.debug("parse_tree process completed successfully.")
         return tree
 
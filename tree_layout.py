@@ -0,0 +1,249 @@
+import datetime, logging
+from collections import defaultdict, deque
+from typing import Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/tree_layout_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+class TreeLayout:
+    """
+    A layered tidy-tree layout of a decision tree, computed in Python so the browser only draws fixed positions.
+
+    The layout is kept up to date as nodes and edges are added. Every node hangs below the parent that
+    reaches it in the fewest steps, its BFS parent, which gives its level. Subtree sizes and frontier counts
+    are updated along the path to the root. Positions are placed by a leaf-slot tidy layout: leaves take
+    consecutive slots from left to right, and a parent is centered over its first and last child. They are
+    only recomputed after a change, over the visible nodes.
+
+    Subtrees without frontier nodes are fully explored and, from collapse_min_nodes nodes on, are shown as one
+    aggregate node until expanded.
+
+    Attributes:
+        level_separation (float): Vertical distance between levels.
+        node_spacing (float): Horizontal distance between leaf slots.
+        collapse_min_nodes (int): Size from which an explored subtree is collapsed, 0 to never collapse.
+        levels (dict[str, int]): BFS level of every node, roots are at level 0.
+    """
+
+    def __init__(self, level_separation: float = 150, node_spacing: float = 220, collapse_min_nodes: int = 5):
+        self.level_separation = level_separation
+        self.node_spacing = node_spacing
+        self.collapse_min_nodes = collapse_min_nodes
+        self.levels: dict[str, int] = {}
+        self._parent: dict[str, Optional[str]] = {}
+        self._tree_children: dict[str, list[str]] = defaultdict(list)  # Children in the BFS spanning tree
+        self._out: dict[str, list[str]] = defaultdict(list)  # All edges, for relaxing levels
+        self._size: dict[str, int] = {}
+        self._frontier_below: dict[str, int] = {}
+        self._frontier: set[str] = set()
+        self._expanded: set[str] = set()
+        self._collapsed: set[str] = set()
+        self._version = 0
+        self._cached_version = -1
+        self._positions: dict[str, tuple[float, float]] = {}
+        self._aggregates: dict[str, int] = {}
+
+    @property
+    def version(self) -> int:
+        """Increases with every change that can move or hide a node."""
+        return self._version
+
+    def _changed(self):
+        self._version += 1
+
+    def _ancestors(self, node_id: str):
+        while node_id is not None:
+            yield node_id
+            node_id = self._parent[node_id]
+
+    def _add_to_path(self, node_id: Optional[str], size: int, frontier: int):
+        if node_id is None:
+            return
+        for ancestor in self._ancestors(node_id):
+            self._size[ancestor] += size
+            self._frontier_below[ancestor] += frontier
+
+    def add_node(self, node_id: str, frontier: bool = False):
+        """
+        Adds a node as a root, it moves below its parent once an edge to it is added.
+
+        Args:
+            node_id (str): The node's id.
+            frontier (bool): Whether the node is a frontier node.
+        """
+        if node_id in self.levels:
+            return
+        self.levels[node_id] = 0
+        self._parent[node_id] = None
+        self._size[node_id] = 1
+        self._frontier_below[node_id] = 1 if frontier else 0
+        if frontier:
+            self._frontier.add(node_id)
+        self._changed()
+
+    def set_frontier(self, node_id: str, frontier: bool):
+        """
+        Marks a node as a frontier node or not.
+
+        Args:
+            node_id (str): The node's id.
+            frontier (bool): Whether the node is a frontier node.
+        """
+        if node_id not in self.levels or (node_id in self._frontier) == frontier:
+            return
+        if frontier:
+            self._frontier.add(node_id)
+        else:
+            self._frontier.discard(node_id)
+        self._add_to_path(node_id, 0, 1 if frontier else -1)
+        self._changed()
+
+    def _attach(self, node_id: str, parent_id: str):
+        size, frontier = self._size[node_id], self._frontier_below[node_id]
+        old_parent = self._parent[node_id]
+        if old_parent is not None:
+            self._tree_children[old_parent].remove(node_id)
+            self._add_to_path(old_parent, -size, -frontier)
+        self._parent[node_id] = parent_id
+        self._tree_children[parent_id].append(node_id)
+        self._add_to_path(parent_id, size, frontier)
+
+    def _relevel(self, start: str):
+        # Levels below start follow its new level, and edges leaving the subtree may now give shorter paths
+        queue = deque([start])
+        while queue:
+            node_id = queue.popleft()
+            level = self.levels[node_id] + 1
+            for child_id in self._out[node_id]:
+                if child_id == node_id:
+                    continue
+                if self._parent[child_id] == node_id:
+                    if self.levels[child_id] != level:
+                        self.levels[child_id] = level
+                        queue.append(child_id)
+                elif level < self.levels[child_id]:
+                    self._attach(child_id, node_id)
+                    self.levels[child_id] = level
+                    queue.append(child_id)
+
+    def add_edge(self, source: str, target: str):
+        """
+        Adds an edge. The target moves below the source if it had no parent yet and the edge does not close
+        a cycle, or if the source reaches it in fewer steps than its current parent.
+
+        Args:
+            source (str): Id of the source node.
+            target (str): Id of the target node.
+        """
+        if source not in self.levels or target not in self.levels or source == target:
+            return
+        if target in self._out[source]:
+            return
+        self._out[source].append(target)
+        level = self.levels[source] + 1
+        if self._parent[target] is None:
+            if target in self._ancestors(source):
+                return
+        elif level >= self.levels[target]:
+            return
+        self._attach(target, source)
+        self.levels[target] = level
+        self._relevel(target)
+        self._changed()
+
+    def is_collapsed(self, node_id: str) -> bool:
+        """Returns whether the node is shown as an aggregate of its subtree."""
+        if self._size.get(node_id, 0) <= 1:
+            return False
+        if node_id in self._collapsed:
+            return True
+        if node_id in self._expanded or self._parent.get(node_id) is None or not self.collapse_min_nodes:
+            return False
+        return self._frontier_below[node_id] == 0 and self._size[node_id] >= self.collapse_min_nodes
+
+    def expand(self, node_id: str):
+        """Shows the subtree of a collapsed node."""
+        self._collapsed.discard(node_id)
+        self._expanded.add(node_id)
+        self._changed()
+
+    def collapse(self, node_id: str):
+        """Shows the subtree of a node as one aggregate node."""
+        self._expanded.discard(node_id)
+        self._collapsed.add(node_id)
+        self._changed()
+
+    def _place(self):
+        positions: dict[str, tuple[float, float]] = {}
+        aggregates: dict[str, int] = {}
+        next_slot = 0
+        roots = [node_id for node_id, parent in self._parent.items() if parent is None]
+        for root in roots:
+            # Iterative post-order walk: a node is placed once all its visible children are
+            stack = [(root, False)]
+            while stack:
+                node_id, children_placed = stack.pop()
+                collapsed = self.is_collapsed(node_id)
+                children = [] if collapsed else self._tree_children[node_id]
+                if not children:
+                    positions[node_id] = (next_slot * self.node_spacing, self.levels[node_id] * self.level_separation)
+                    next_slot += 1
+                elif not children_placed:
+                    stack.append((node_id, True))
+                    stack.extend((child_id, False) for child_id in reversed(children))
+                    continue
+                else:
+                    first, last = positions[children[0]][0], positions[children[-1]][0]
+                    positions[node_id] = ((first + last) / 2, self.levels[node_id] * self.level_separation)
+                if collapsed:
+                    aggregates[node_id] = self._size[node_id] - 1
+        self._positions, self._aggregates = positions, aggregates
+        self._cached_version = self._version
+        logger.debug(f"Placed {len(positions)} visible nodes, {len(aggregates)} collapsed subtrees")
+
+    def positions(self) -> dict[str, tuple[float, float]]:
+        """
+        Returns the positions of the visible nodes, computed again only if the tree changed.
+
+        Returns:
+            dict[str, tuple[float, float]]: (x, y) of every visible node, in drawing order.
+        """
+        if self._cached_version != self._version:
+            self._place()
+        return self._positions
+
+    def aggregates(self) -> dict[str, int]:
+        """
+        Returns the collapsed nodes that are visible.
+
+        Returns:
+            dict[str, int]: Number of hidden nodes below every visible collapsed node.
+        """
+        self.positions()
+        return self._aggregates
+
+    def visible_id(self, node_id: str) -> Optional[str]:
+        """
+        Returns the node a node is drawn as: itself if it is visible, otherwise the collapsed node hiding it.
+
+        Args:
+            node_id (str): The node's id.
+
+        Returns:
+            Optional[str]: The visible node's id, None for unknown nodes.
+        """
+        positions = self.positions()
+        if node_id not in self._parent:
+            return None
+        for ancestor in self._ancestors(node_id):
+            if ancestor in positions:
+                return ancestor
+        return None
@@ -0,0 +1,214 @@
+import datetime, logging, os, sqlite3, threading, time
+from typing import Optional
+from DecisionTree import DecisionTree
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/tree_store_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batches (
+    run_id TEXT NOT NULL,
+    batch INTEGER NOT NULL,
+    call_id TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (run_id, batch)
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    run_id TEXT NOT NULL,
+    batch INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    label TEXT,
+    type TEXT NOT NULL,
+    PRIMARY KEY (run_id, id)
+);
+CREATE TABLE IF NOT EXISTS edges (
+    run_id TEXT NOT NULL,
+    batch INTEGER NOT NULL,
+    source_id TEXT NOT NULL,
+    target_id TEXT NOT NULL,
+    condition TEXT
+);
+CREATE INDEX IF NOT EXISTS edges_run ON edges (run_id);
+"""
+
+def new_run_id() -> str:
+    """Returns a run id from the current time, like the log file names."""
+    return datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+
+class TreeStore:
+    """
+    A durable, append-only record of one exploration run's decision tree in SQLite.
+
+    Every batch of nodes and edges that parse_tree added is committed in one transaction, so a crash
+    leaves whole batches only. The database is in WAL mode, so a commit appends to the log instead of
+    rewriting pages, and the tree can be read back while a run is writing it.
+
+    Attributes:
+        path (str): The SQLite database file.
+        run_id (str): The run whose tree is stored.
+    """
+
+    def __init__(self, path: str, run_id: Optional[str] = None):
+        self.path = path
+        self.run_id = run_id or new_run_id()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL still keeps every committed batch across a crash of the process
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        now = time.time()
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO runs (run_id, created_at, updated_at) VALUES (?, ?, ?)", (self.run_id, now, now)
+            )
+        self._next_batch = self._connection.execute(
+            "SELECT COALESCE(MAX(batch), 0) + 1 FROM batches WHERE run_id = ?", (self.run_id,)
+        ).fetchone()[0]
+        logger.info(f"Storing run {self.run_id} in {path}")
+
+    @staticmethod
+    def latest_run_id(path: str) -> Optional[str]:
+        """
+        Returns the most recently updated run in a database.
+
+        Args:
+            path (str): The SQLite database file.
+
+        Returns:
+            Optional[str]: The run id, or None if there is no database or no run.
+        """
+        if not os.path.exists(path):
+            return None
+        connection = sqlite3.connect(path)
+        try:
+            row = connection.execute("SELECT run_id FROM runs ORDER BY updated_at DESC LIMIT 1").fetchone()
+            return row[0] if row else None
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            connection.close()
+
+    def append_batch(self, nodes: list[dict], edges: list[dict], call_id: Optional[str] = None) -> Optional[int]:
+        """
+        Commits the nodes and edges one parse_tree call added, all or nothing.
+
+        Args:
+            nodes (list[dict]): The added nodes, with "id", "label" and "type".
+            edges (list[dict]): The added edges, with "source_id", "target_id" and "condition".
+            call_id (Optional[str]): The call the batch was parsed from.
+
+        Returns:
+            Optional[int]: The batch number, or None if the batch was empty or could not be committed.
+        """
+        if not nodes and not edges:
+            return None
+        with self._lock:
+            batch = self._next_batch
+            now = time.time()
+            try:
+                with self._connection:
+                    self._connection.execute(
+                        "INSERT INTO batches (run_id, batch, call_id, created_at) VALUES (?, ?, ?, ?)",
+                        (self.run_id, batch, call_id, now)
+                    )
+                    self._connection.executemany(
+                        "INSERT INTO nodes (run_id, batch, id, label, type) VALUES (?, ?, ?, ?, ?)",
+                        [(self.run_id, batch, str(node["id"]), node["label"], getattr(node["type"], "value", node["type"])) for node in nodes]
+                    )
+                    self._connection.executemany(
+                        "INSERT INTO edges (run_id, batch, source_id, target_id, condition) VALUES (?, ?, ?, ?, ?)",
+                        [(self.run_id, batch, str(edge["source_id"]), str(edge["target_id"]), edge["condition"]) for edge in edges]
+                    )
+                    self._connection.execute("UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, self.run_id))
+            except sqlite3.Error as e:
+                logger.error(f"Could not store batch {batch} of run {self.run_id}: {e}")
+                return None
+            self._next_batch += 1
+        logger.debug(f"Stored batch {batch} of run {self.run_id}: {len(nodes)} nodes, {len(edges)} edges")
+        return batch
+
+    def load(self) -> tuple[list[dict], list[dict]]:
+        """
+        Reads the run's nodes and edges back, in the order they were added.
+
+        Returns:
+            tuple[list[dict], list[dict]]: The nodes and edges, in the format parse_tree takes.
+        """
+        with self._lock:
+            nodes = [
+                {"id": node_id, "label": label, "type": node_type}
+                for node_id, label, node_type in self._connection.execute(
+                    "SELECT id, label, type FROM nodes WHERE run_id = ? ORDER BY rowid", (self.run_id,)
+                )
+            ]
+            edges = [
+                {"source_id": source_id, "target_id": target_id, "condition": condition}
+                for source_id, target_id, condition in self._connection.execute(
+                    "SELECT source_id, target_id, condition FROM edges WHERE run_id = ? ORDER BY rowid", (self.run_id,)
+                )
+            ]
+        return nodes, edges
+
+    def load_tree(self) -> tuple[DecisionTree, list[dict], list[dict]]:
+        """
+        Rebuilds the run's decision tree. The stored batches were deduplicated when they were added,
+        so they are inserted directly instead of going through parse_tree again.
+
+        Returns:
+            tuple[DecisionTree, list[dict], list[dict]]: The tree and its nodes and edges, empty for a new run.
+        """
+        started = time.perf_counter()
+        nodes, edges = self.load()
+        tree = DecisionTree()
+        add_node = {"question": tree.add_decision_node, "action": tree.add_node, "inquiry": tree.add_inquiry_node}
+        for node in nodes:
+            add_node[node["type"]](node["id"], node["label"])
+        for edge in edges:
+            tree.add_edge(edge["source_id"], edge["target_id"], edge["condition"])
+        logger.info(
+            f"Loaded run {self.run_id}: {len(nodes)} nodes, {len(edges)} edges in {time.perf_counter() - started:.3f} s"
+        )
+        return tree, nodes, edges
+
+    def close(self):
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
+
+def tree_store_from_env(default_run_id: Optional[str] = None) -> Optional[TreeStore]:
+    """
+    Opens the tree store configured by TREE_STORE_PATH (default logs/tree_store.sqlite3, empty to disable).
+    RUN_ID selects the run to resume, "latest" for the most recently updated one. Without it the run is
+    default_run_id, or a new one.
+
+    Args:
+        default_run_id (Optional[str]): Run to use when RUN_ID is not set.
+
+    Returns:
+        Optional[TreeStore]: The store, or None if disabled.
+    """
+    path = os.environ.get("TREE_STORE_PATH", "logs/tree_store.sqlite3")
+    if not path:
+        return None
+    run_id = os.environ.get("RUN_ID") or default_run_id
+    if run_id == "latest":
+        run_id = TreeStore.latest_run_id(path)
+        if run_id is None:
+            logger.warning(f"No run to resume in {path}, starting a new one.")
+    return TreeStore(path, run_id)
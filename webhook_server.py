@@ -0,0 +1,181 @@
+import asyncio, datetime, json, logging, os, threading, uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+# Configure logging
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    handlers=[
+        # logging.FileHandler(f"logs/webhook_server_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        # logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    """Accepts POST /hamming/<token> and hands the payload to the owning CallWebhookServer."""
+
+    def do_POST(self):
+        prefix = "/hamming/"
+        token = self.path.split("?", 1)[0][len(prefix):] if self.path.startswith(prefix) else ""
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        try:
+            payload = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            logger.warning(f"Webhook for token {token} did not contain JSON: {body[:200]!r}")
+            payload = {"raw": body.decode("utf-8", errors="replace")}
+
+        if self.server.webhooks.complete(token, payload):
+            self.send_response(200)
+        else:
+            self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format: str, *args):
+        logger.debug(f"Webhook request: {format % args}")
+
+class CallWebhookServer:
+    """
+    A small HTTP server that receives Hamming's call completion webhooks.
+
+    Every call registers a token before it is placed and passes the matching URL as webhook_url.
+    The coroutine waiting on that call is woken as soon as the webhook arrives, even if it arrived
+    before the coroutine started waiting.
+
+    Attributes:
+        host (str): Interface the server listens on.
+        port (int): Port the server listens on, 0 picks a free port.
+        public_url (str): Base URL Hamming can reach the server on, e.g. a tunnel to this machine.
+    """
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8765, public_url: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.public_url = public_url
+        self._lock = threading.Lock()
+        self._payloads: dict[str, dict] = {}
+        self._waiters: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+        self._registered: set[str] = set()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "CallWebhookServer":
+        """
+        Starts serving in a background thread.
+
+        Returns:
+            CallWebhookServer: The server itself, for chaining.
+        """
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _WebhookHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.webhooks = self
+        self.port = self._httpd.server_address[1]
+        if not self.public_url:
+            self.public_url = f"http://{'127.0.0.1' if self.host == '0.0.0.0' else self.host}:{self.port}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="webhook-server", daemon=True)
+        self._thread.start()
+        logger.info(f"Webhook server listening on {self.host}:{self.port}, public URL {self.public_url}")
+        return self
+
+    def stop(self):
+        """Stops the server and its background thread."""
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+            logger.info("Webhook server stopped.")
+
+    def register(self) -> tuple[str, str]:
+        """
+        Registers a new call before it is placed.
+
+        Returns:
+            tuple[str, str]: The token identifying the call and the webhook URL to hand to Hamming.
+        """
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._registered.add(token)
+        return token, f"{self.public_url.rstrip('/')}/hamming/{token}"
+
+    def unregister(self, token: str):
+        """
+        Forgets a call once it no longer needs its webhook.
+
+        Args:
+            token (str): The token returned by register.
+        """
+        with self._lock:
+            self._registered.discard(token)
+            self._payloads.pop(token, None)
+            self._waiters.pop(token, None)
+
+    def complete(self, token: str, payload: dict) -> bool:
+        """
+        Records a webhook payload and wakes the coroutine waiting for it. Called from the HTTP thread.
+
+        Args:
+            token (str): The token from the webhook URL.
+            payload (dict): The JSON body of the webhook.
+
+        Returns:
+            bool: True if the token belongs to a registered call.
+        """
+        with self._lock:
+            if token not in self._registered:
+                logger.warning(f"Webhook received for unknown token: {token}")
+                return False
+            self._payloads[token] = payload
+            waiter = self._waiters.get(token)
+        logger.info(f"Webhook received for token {token}: {payload}")
+        if waiter:
+            loop, event = waiter
+            loop.call_soon_threadsafe(event.set)
+        return True
+
+    async def wait(self, token: str, timeout: float) -> Optional[dict]:
+        """
+        Waits until the webhook for a call arrives or the timeout expires.
+
+        Args:
+            token (str): The token returned by register.
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            Optional[dict]: The webhook payload if it arrived, else None.
+        """
+        event = asyncio.Event()
+        with self._lock:
+            if token in self._payloads:
+                return self._payloads[token]
+            self._waiters[token] = (asyncio.get_running_loop(), event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._lock:
+            self._waiters.pop(token, None)
+            return self._payloads.get(token)
+
+def webhook_server_from_env() -> Optional[CallWebhookServer]:
+    """
+    Starts a webhook server if WEBHOOK_PUBLIC_URL is set, otherwise calls fall back to polling only.
+
+    Returns:
+        Optional[CallWebhookServer]: The running server, or None.
+    """
+    public_url = os.environ.get("WEBHOOK_PUBLIC_URL")
+    if not public_url:
+        logger.info("WEBHOOK_PUBLIC_URL not set, call completion will be polled.")
+        return None
+    port = int(os.environ.get("WEBHOOK_PORT", "8765"))
+    return CallWebhookServer(port=port, public_url=public_url).start()
+
+if __name__ == "__main__":
+    server = CallWebhookServer(port=int(os.environ.get("WEBHOOK_PORT", "8765"))).start()
+    token, url = server.register()
+    print(f"POST to {url} to complete the call")
+    print(asyncio.run(server.wait(token, 600)))
+    server.stop()